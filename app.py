@@ -19,12 +19,14 @@ import json
 import base64
 from datetime import datetime
 
-# Graceful import for optional internal model (not required to run)
-try:
-    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-    from energy_model import distribute_energy  # noqa: F401
-except Exception:
-    distribute_energy = None
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+from core.battery_sizing import size_batteries
+from core.cities import open_store
+from core.degradation import RainflowCounter
+from core.dispatch import dispatch_batteries
+from core.ev import fleet_demand, fleet_smart_demand
+from core.microgrid import distribute_energy  # noqa: F401
+from core.solar import daily_shape
 
 import numpy as np
 import streamlit as st
@@ -54,10 +56,16 @@ nodes = [
 ]
 
 # -------------------- Hourly Generation Function --------------------
-def hourly_profile(daily_gen):
-    hours = np.arange(24)
-    profile = np.sin((hours - 6) / 12 * np.pi) ** 2  # Peaks at midday
-    profile = profile / profile.sum()  # Normalize to sum=1
+# Spread over the day by the clear-sky irradiance curve of the selected city
+# and month (sunrise to sunset, peaking at solar noon). Cities without
+# coordinates use Madrid's curve.
+def hourly_profile(daily_gen, city=None, month=None):
+    city = city or st.session_state.get("city_selector", "Madrid")
+    month = month or st.session_state.get("month_selector", datetime.now().month)
+    try:
+        profile = daily_shape(city, month)
+    except KeyError:
+        profile = daily_shape("Madrid", month)
     return daily_gen * profile
 
 # -------------------- Function to Generate Figures --------------------
@@ -253,25 +261,18 @@ language = language_map.get(selected_language, "en")
 labels = translations.get(language, translations["en"])
 
 # -------------------------
-# Sidebar: City selector (CSV optional)
+# Sidebar: City selector (cities with coordinates in the city dataset)
 st.sidebar.markdown("### " + labels["location"])
 
-# Path hint (Windows path shared by you); will be ignored if not present:
-default_city_csv_path = r"C:\Users\Carlos H Betancourth\OneDrive\Documents\GitHub\solar-umbrella-project\data\solar_data.csv"
-
-# Try to load cities from CSV; expect a 'city' column.
-cities_from_csv = []
-try:
-    if os.path.exists(default_city_csv_path):
-        df_cities = pd.read_csv(default_city_csv_path)
-        if "city" in df_cities.columns:
-            cities_from_csv = sorted(df_cities["city"].dropna().unique().tolist())
-except Exception:
-    cities_from_csv = []
-
-fallback_cities = ["Madrid", "Barcelona", "Bogotá", "Medellín", "Quito", "Lima", "Lisbon", "Rome"]
-city_options = cities_from_csv if cities_from_csv else fallback_cities
-selected_city = st.sidebar.selectbox("City", city_options, key="city_selector")
+city_options = list(open_store().column_dict("latitude"))
+selected_city = st.sidebar.selectbox(
+    "City", city_options, index=city_options.index("Madrid") if "Madrid" in city_options else 0,
+    key="city_selector",
+)
+selected_month = st.sidebar.selectbox(
+    "Month", list(range(1, 13)), index=datetime.now().month - 1,
+    format_func=lambda m: datetime(2000, m, 1).strftime("%B"), key="month_selector",
+)
 
 # -------------------------
 # Umbrella catalog (types & sizes)
@@ -332,6 +333,10 @@ elif page == labels["configure_run"]:
 
     # This is used in the hourly EV simulation inside each node
     max_charge_power = st.number_input("Max Charging Power per EV (kW)", min_value=1.0, max_value=22.0, value=7.0, step=0.5)
+    ev_charging_mode = st.selectbox(
+        "EV Charging Mode", ["Even over plug-in window", "Follow PV surplus"],
+        help="Follow PV surplus shifts each EV's charging into the sunniest hours of its window.",
+    )
 
     # Number of nodes (umbrellas clusters/terrazas)
     num_nodes = st.number_input("Number of Umbrella Nodes (Terrazas)", min_value=1, max_value=10, value=3, step=1)
@@ -341,6 +346,8 @@ elif page == labels["configure_run"]:
 
     # Storage for node results
     nodes = []
+    hourly_net = []
+    battery_settings = []
 
     for i in range(int(num_nodes)):
         st.subheader(f"Umbrella Node #{i+1}")
@@ -425,46 +432,22 @@ elif page == labels["configure_run"]:
         total_self_consumption = (cooling_cons + lighting_cons + ops_cons) * num_umbrellas
 
         # --- Hourly EV charging demand simulation (per node) ---
-        # Windows for arrival/departure; tweak later by stage if desired
-        arrival_start, arrival_end = 8, 10    # 8–10 AM
-        departure_start, departure_end = 17, 20  # 5–8 PM
-        hours = 24
-        ev_charging_profiles = []
-
-        for ev in range(int(num_evs)):
-            arrival_time = np.random.randint(arrival_start, arrival_end + 1)
-            departure_time = np.random.randint(departure_start, departure_end + 1)
-            if departure_time <= arrival_time:
-                departure_time = arrival_time + 1
-            charging_hours = max(1, departure_time - arrival_time)
-            # Energy per EV per hour (capped by charger power)
-            energy_per_hour = min(avg_kwh_per_ev / charging_hours, max_charge_power)
-            ev_load = np.zeros(hours)
-            ev_load[arrival_time:departure_time] = energy_per_hour
-            ev_charging_profiles.append(ev_load)
-
-        hourly_ev_demand = np.sum(ev_charging_profiles, axis=0) if ev_charging_profiles else np.zeros(hours)
+        # Arrival/departure windows are core.ev's defaults (8–10 AM, 5–8 PM);
+        # seeded per node so reruns show the same fleet.
+        # PV surplus per umbrella before EVs (self-consumption spread evenly)
+        hourly_pv_surplus = hourly_profile(daily_energy_kwh_per_umbrella, selected_city, selected_month) - (cooling_cons + lighting_cons + ops_cons) / 24
+        if ev_charging_mode == "Follow PV surplus":
+            hourly_ev_demand = fleet_smart_demand(int(num_evs), avg_kwh_per_ev, max_charge_power,
+                                                  hourly_pv_surplus, seed=i)
+        else:
+            hourly_ev_demand = fleet_demand(int(num_evs), avg_kwh_per_ev, max_charge_power, seed=i)
+        ev_from_pv = np.minimum(hourly_ev_demand, np.maximum(hourly_pv_surplus, 0.0)).sum() * num_umbrellas
         total_ev_demand = hourly_ev_demand.sum() * num_umbrellas  # daily EV energy per node
 
-        # --- Simple daily battery operation (scalar) ---
-        net_energy = total_daily_generation - total_self_consumption - total_ev_demand
-        battery_soc = 0.5 * battery_capacity  # start SoC (kWh)
-
-        if net_energy > 0:
-            # Charge with surplus (limited by charge rate & capacity)
-            charge_power = min(net_energy, battery_max_charge)
-            charge_energy = charge_power * battery_charge_eff
-            battery_soc = min(battery_capacity, battery_soc + charge_energy)
-            surplus_energy = max(0.0, net_energy - charge_power)
-            deficit_energy = 0.0
-        else:
-            # Discharge to cover deficit (limited by discharge rate & SoC)
-            needed = abs(net_energy)
-            discharge_power = min(needed, battery_max_discharge, battery_soc)
-            discharge_energy = discharge_power / max(1e-6, battery_discharge_eff)
-            battery_soc = max(0.0, battery_soc - discharge_energy)
-            surplus_energy = 0.0
-            deficit_energy = max(0.0, needed - discharge_power)
+        # --- Hourly net energy per node, for the battery dispatch below ---
+        hourly_net.append((hourly_pv_surplus - hourly_ev_demand) * num_umbrellas)
+        battery_settings.append((battery_capacity, battery_charge_eff, battery_discharge_eff,
+                                 battery_max_charge, battery_max_discharge))
 
         # Store per-node results
         node = {
@@ -476,30 +459,64 @@ elif page == labels["configure_run"]:
             "daily_generation": float(total_daily_generation),
             "self_consumption": float(total_self_consumption),
             "ev_demand": float(total_ev_demand),
+            "ev_from_pv": float(ev_from_pv),
             "battery_capacity": float(battery_capacity),
-            "battery_soc_end": float(battery_soc),
-            "surplus": float(surplus_energy),
-            "deficit": float(deficit_energy),
             # keep hourly for future plots
             "hourly_ev_demand": hourly_ev_demand.tolist(),
         }
         nodes.append(node)
 
+    # --- Hourly battery operation, all nodes at once (start at 50% SoC) ---
+    capacity, charge_eff, discharge_eff, max_charge, max_discharge = np.array(battery_settings).T
+    dispatch = dispatch_batteries(
+        np.column_stack(hourly_net), capacity, 0.5 * capacity, charge_eff, discharge_eff,
+        max_charge, max_discharge,
+    )
+    # Battery wear: rainflow cycles in the day's SoC, extrapolated to end of life
+    battery_life = RainflowCounter(capacity, initial_soc=0.5 * capacity).update(
+        dispatch["soc"]
+    ).years_to_end_of_life()
+    # Smallest battery (kWh and kW) that would cover every hour, day after day.
+    # Each node's day is rotated to start at the low point of its stored-energy
+    # balance, where an empty battery is the steady state, so sizing one day
+    # gives the same battery as sizing a year of repeated days.
+    daily_net = np.column_stack(hourly_net)
+    balance = np.cumsum(np.where(daily_net > 0, daily_net * charge_eff, daily_net / discharge_eff), axis=0)
+    start = np.argmin(balance, axis=0) + 1
+    rotated = np.take_along_axis(daily_net, (np.arange(24)[:, None] + start) % 24, axis=0)
+    sizing = size_batteries(rotated, 0.0, charge_eff, discharge_eff)
+    for j, node in enumerate(nodes):
+        node["recommended_battery_kwh"] = float(sizing["capacity"][j])
+        node["recommended_battery_kw"] = float(sizing["power"][j])
+        node["battery_soc_end"] = float(dispatch["final_soc"][j])
+        node["battery_life_years"] = float(battery_life[j])
+        node["surplus"] = float(dispatch["exported"][j])
+        node["deficit"] = float(dispatch["imported"][j])
+        node["battery_cycles"] = float(dispatch["cycles"][j])
+        node["hourly_soc"] = dispatch["soc"][:, j].tolist()
+
     # --- Aggregate results across nodes ---
     total_generation_all = sum(n["daily_generation"] for n in nodes)
     total_self_cons_all = sum(n["self_consumption"] for n in nodes)
     total_ev_demand_all = sum(n["ev_demand"] for n in nodes)
+    total_ev_from_pv_all = sum(n["ev_from_pv"] for n in nodes)
     total_surplus_all = sum(n["surplus"] for n in nodes)
     total_deficit_all = sum(n["deficit"] for n in nodes)
     avg_battery_soc = (sum(n["battery_soc_end"] for n in nodes) / len(nodes)) if nodes else 0.0
+    avg_battery_cycles = (sum(n["battery_cycles"] for n in nodes) / len(nodes)) if nodes else 0.0
+    min_battery_life = min((n["battery_life_years"] for n in nodes), default=float("inf"))
 
     st.markdown("## Microgrid Summary")
     st.write(f"{labels['total_generation']}: **{total_generation_all:.2f} kWh/day**")
     st.write(f"{labels['total_self_consumption']}: **{total_self_cons_all:.2f} kWh/day**")
     st.write(f"{labels['total_ev_demand']}: **{total_ev_demand_all:.2f} kWh/day**")
+    st.write(f"EV Charging Covered Directly by PV: **{total_ev_from_pv_all:.2f} kWh/day**")
     st.write(f"{labels['total_surplus']}: **{total_surplus_all:.2f} kWh/day**")
     st.write(f"{labels['total_deficit']}: **{total_deficit_all:.2f} kWh/day**")
     st.write(f"Average Battery SoC (end of day): **{avg_battery_soc:.2f} kWh**")
+    st.write(f"Average Battery Cycles: **{avg_battery_cycles:.2f} full cycles/day**")
+    if np.isfinite(min_battery_life):
+        st.write(f"Estimated Battery Life (shortest-lived node): **{min_battery_life:.1f} years**")
 
     # Pie chart: Surplus vs Deficit
     surplus_vs_deficit = pd.DataFrame({
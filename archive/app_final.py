@@ -1,26 +1,23 @@
+import os
+import sys
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import numpy as np
 from io import BytesIO
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from core.calculator import calculate_tilted_monthly_energy
+from core.cities import open_store
+
 # --- Page Config ---
 st.set_page_config(page_title="Solar Dashboard", layout="wide")
 
 # --- City Data ---
-city_data = {
-    "Barcelona": 5.5,
-    "Madrid": 6.0,
-    "Berlin": 4.0,
-    "Paris": 4.2,
-    "Rome": 5.2,
-    "Valencia": 5.8,
-    "Amsterdam": 3.2,
-    "Málaga": 6.5,
-    "Seville": 6.7
-}
+city_data = open_store().column_dict(
+    "dashboard_irradiance", ["Barcelona", "Madrid", "Berlin", "Paris", "Rome", "Valencia", "Amsterdam", "Málaga", "Seville"]
+)
 
 # --- Translations ---
 translations = {
@@ -89,13 +86,8 @@ df = pd.DataFrame(list(city_data.items()), columns=["City", "Solar Value"])
 filtered_df = df[df["City"].isin(selected_cities)]
 
 # --- Energy Calculation ---
-def calculate_energy(radiation, tilt, area, count):
-    efficiency = max(0.5, np.cos(np.radians(tilt)))
-    monthly = radiation * area * efficiency * 30
-    return round(monthly * count, 2)
-
 filtered_df["Total Energy"] = filtered_df["Solar Value"].apply(
-    lambda r: calculate_energy(r, tilt_angle, panel_area, num_umbrellas)
+    lambda r: calculate_tilted_monthly_energy(r, tilt_angle, panel_area, num_umbrellas)
 )
 
 # --- Metrics ---
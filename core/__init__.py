@@ -0,0 +1,15 @@
+# core
+# Streamlit-free energy and finance models shared by the apps and batch jobs.
+# Only pure-Python modules are imported here so `import core` stays cheap;
+# the NumPy engines (core.batch, core.sweep, core.annual, ...) are imported
+# explicitly by the code that needs them.
+
+from core.battery import calculate_battery_backup, daily_battery_step
+from core.calculator import (
+    calculate_co2_savings,
+    calculate_cost_savings,
+    calculate_energy_output,
+    calculate_tilted_monthly_energy,
+)
+from core.finance import loan_annuity_payment, payback_years
+from core.microgrid import distribute_energy, simulate_energy_exchange
@@ -0,0 +1,69 @@
+# annual.py
+# Hourly annual yield: turns hourly irradiance series (8760 or 8784 values per
+# site, kWh/m² in each hour) into hourly, monthly and annual energy per unit.
+# Parameters mean exactly what they mean in calculate_energy_output, and each
+# may be a scalar or one value per site.
+
+import numpy as np
+
+DAYS_PER_MONTH = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+LEAP_DAYS_PER_MONTH = (31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+def month_start_hours(hours_in_year):
+    if hours_in_year == 8760:
+        days = DAYS_PER_MONTH
+    elif hours_in_year == 8784:
+        days = LEAP_DAYS_PER_MONTH
+    else:
+        raise ValueError(f"expected 8760 or 8784 hourly values per site, got {hours_in_year}")
+    return np.concatenate(([0], np.cumsum(days[:-1]) * 24))
+
+
+def month_of_hour(hours_in_year=8760):
+    # Month index (0-11) for every hour of the year.
+    starts = month_start_hours(hours_in_year)
+    return np.searchsorted(starts, np.arange(hours_in_year), side="right") - 1
+
+
+def _per_site(value, sites):
+    value = np.asarray(value, dtype=float)
+    if value.ndim == 0:
+        return value
+    if value.shape != (sites,):
+        raise ValueError(f"per-site parameters need {sites} values, got shape {value.shape}")
+    return value[:, None]
+
+
+def annual_yield(hourly_irradiance, width, length, coverage_efficiency, panel_efficiency, system_losses,
+                 num_units=1, hourly=True):
+    # hourly_irradiance: (hours,) for one site or (sites, hours) for many. Returns
+    # a dict with "monthly" (sites, 12) and "annual" (sites,) kWh per site, plus
+    # "hourly" (sites, hours) unless hourly=False, which skips materialising the
+    # full matrix when only the totals are needed. Single-site input returns
+    # single-site shapes.
+    irradiance = np.asarray(hourly_irradiance, dtype=float)
+    single_site = irradiance.ndim == 1
+    irradiance = np.atleast_2d(irradiance)
+    sites, hours_in_year = irradiance.shape
+    starts = month_start_hours(hours_in_year)
+
+    # Same multiplication order as calculate_energy_output
+    surface_area_m2 = _per_site(width, sites) * _per_site(length, sites) * _per_site(coverage_efficiency, sites)
+    factor = surface_area_m2 * _per_site(panel_efficiency, sites)
+    losses = _per_site(system_losses, sites) * _per_site(num_units, sites)
+    factor = np.broadcast_to(factor, (sites, 1))
+    losses = np.broadcast_to(losses, (sites, 1))
+
+    result = {}
+    if hourly:
+        energy = irradiance * factor * losses
+        monthly = np.add.reduceat(energy, starts, axis=1)
+        result["hourly"] = energy[0] if single_site else energy
+    else:
+        monthly = np.add.reduceat(irradiance, starts, axis=1) * factor * losses
+    annual = monthly.sum(axis=1)
+
+    result["monthly"] = monthly[0] if single_site else monthly
+    result["annual"] = annual[0] if single_site else annual
+    return result
@@ -0,0 +1,166 @@
+# batch.py
+# Array-native versions of the calculator formulas. Every function accepts
+# scalars or NumPy arrays (broadcast together) and returns exactly what the
+# scalar function in core.calculator, core.battery or core.finance would
+# return element by element.
+
+from datetime import datetime
+
+import numpy as np
+
+# Clear-sky curve used when a configuration has no location (the apps' choice
+# for a custom location)
+DEFAULT_LOCATION = "Madrid"
+
+_unit_yields = {}
+
+
+def round_like_builtin(values, ndigits=2):
+    # Same scale/rint/unscale steps as np.round, but np.round rounds half to even
+    # on the scaled value, which can disagree with round() for floats sitting on
+    # a .5 tie after scaling. Those elements are rare, so they are re-rounded
+    # with the builtin.
+    values = np.asarray(values, dtype=float)
+    shape = values.shape
+    values = values.reshape(-1)
+    scale = 10.0 ** ndigits
+    with np.errstate(invalid="ignore", over="ignore"):
+        scaled = values * scale
+        rounded = np.rint(scaled)
+        distance = scaled - np.floor(scaled)
+        distance -= 0.5
+        np.abs(distance, out=distance)
+        np.abs(scaled, out=scaled)
+        np.maximum(scaled, 1.0, out=scaled)
+        scaled *= 1e-9
+        ties = distance <= scaled
+    rounded /= scale
+    for i in np.flatnonzero(ties):
+        rounded[i] = round(float(values[i]), ndigits)
+    return rounded.reshape(shape)[()]
+
+
+def calculate_energy_output_batch(width, length, coverage_efficiency, panel_efficiency, solar_irradiance, system_losses,
+                                  shading_loss=0.0):
+    surface_area_m2 = np.asarray(width, dtype=float) * length * coverage_efficiency
+    # shading_loss as in core.calculator.calculate_energy_output
+    daily_energy_output_kWh = surface_area_m2 * panel_efficiency * solar_irradiance * system_losses
+    daily_energy_output_kWh = daily_energy_output_kWh * np.subtract(1.0, shading_loss)
+    return round_like_builtin(daily_energy_output_kWh, 2)
+
+def calculate_co2_savings_batch(kwh, emission_factor):
+    return round_like_builtin(np.asarray(kwh, dtype=float) * emission_factor, 2)
+
+def calculate_cost_savings_batch(kwh, price_per_kwh):
+    return round_like_builtin(np.asarray(kwh, dtype=float) * price_per_kwh, 2)
+
+def calculate_battery_backup_batch(daily_output, battery_capacity, efficiency, days_autonomy):
+    daily_output = np.asarray(daily_output, dtype=float)
+    usable_capacity = np.asarray(battery_capacity, dtype=float) * efficiency
+    with np.errstate(divide="ignore", invalid="ignore"):
+        backup_days = round_like_builtin(usable_capacity / daily_output, 2)
+    backup_days = np.where(daily_output != 0, backup_days, 0.0)
+    meets_autonomy = backup_days >= days_autonomy
+    return usable_capacity, backup_days, meets_autonomy
+
+def loan_annuity_payment_batch(principal, annual_rate_pct, years):
+    principal = np.asarray(principal, dtype=float)
+    r = np.asarray(annual_rate_pct, dtype=float) / 100.0
+    n = np.asarray(years, dtype=float)
+    growth = (1 + r) ** n
+    with np.errstate(divide="ignore", invalid="ignore"):
+        annuity = principal * (r * growth) / (growth - 1)
+    return np.where(r == 0, principal / n, annuity)
+
+
+def unit_yield(location=DEFAULT_LOCATION, year=None):
+    # {"monthly": (12,), "annual"} kWh from 1 kWh/day of daily output, spread
+    # over the location's hourly clear-sky year the way the apps do it
+    # (core.annual.annual_yield over core.solar.hourly_irradiance). That yield
+    # is linear in the daily output, so a configuration's monthly and yearly
+    # output is its unrounded daily output times these. Memoised.
+    key = (location, year)
+    if key not in _unit_yields:
+        from core.annual import annual_yield
+        from core.solar import hourly_irradiance
+
+        result = annual_yield(hourly_irradiance(location, 1.0, year), 1.0, 1.0, 1.0, 1.0, 1.0, hourly=False)
+        _unit_yields[key] = {"monthly": result["monthly"], "annual": float(result["annual"])}
+    return _unit_yields[key]
+
+
+def evaluate_configurations(configs, month=None):
+    # Scores a whole table of site configurations in one pass and returns the same
+    # fields energy_calculator.py exports per configuration. `configs` is a
+    # DataFrame or a dict of equal-length arrays. Energy columns are required;
+    # shading_loss defaults to 0 and num_units to 1; the CO₂, savings and
+    # battery blocks are only computed when co2_factor, price_per_kwh and
+    # battery_capacity are present. Monthly and yearly output follow the
+    # app's hourly year for each row's "location" (default DEFAULT_LOCATION);
+    # monthly is for `month` (1-12), by default the current one as in the app.
+    def column(name, default=None):
+        if name in configs:
+            return np.asarray(configs[name], dtype=float)
+        if default is None:
+            raise KeyError(f"configuration column '{name}' is required")
+        return default
+
+    width, length, coverage_efficiency = column("width"), column("length"), column("coverage_efficiency")
+    panel_efficiency, solar_irradiance = column("panel_efficiency"), column("solar_irradiance")
+    system_losses, shading_loss = column("system_losses"), column("shading_loss", 0.0)
+    num_units = column("num_units", 1.0)
+    energy_output_per = calculate_energy_output_batch(
+        width, length, coverage_efficiency, panel_efficiency, solar_irradiance, system_losses, shading_loss,
+    )
+    total_output = round_like_builtin(energy_output_per * num_units, 2)
+
+    # Unrounded daily output of all units, times each location's unit yield
+    daily = (width * length * coverage_efficiency * panel_efficiency * solar_irradiance * system_losses
+             * np.subtract(1.0, shading_loss) * num_units)
+    if month is None:
+        month = datetime.now().month
+    if "location" in configs:
+        locations, which = np.unique(np.asarray(configs["location"], dtype=str), return_inverse=True)
+        which = which.ravel()
+    else:
+        locations, which = [DEFAULT_LOCATION], 0
+    yields = [unit_yield(str(location)) for location in locations]
+    per_month = np.array([y["monthly"][month - 1] for y in yields])[which]
+    per_year = np.array([y["annual"] for y in yields])[which]
+    monthly_output = round_like_builtin(daily * per_month, 2)
+    yearly_output = round_like_builtin(daily * per_year, 2)
+
+    results = {
+        "energy_output_per": energy_output_per,
+        "total_output": total_output,
+        "monthly_output": monthly_output,
+        "yearly_output": yearly_output,
+    }
+
+    if "co2_factor" in configs:
+        co2_factor = column("co2_factor")
+        results["daily_co2"] = calculate_co2_savings_batch(total_output, co2_factor)
+        results["monthly_co2"] = calculate_co2_savings_batch(monthly_output, co2_factor)
+        results["yearly_co2"] = calculate_co2_savings_batch(yearly_output, co2_factor)
+
+    if "price_per_kwh" in configs:
+        price_per_kwh = column("price_per_kwh")
+        results["daily_savings"] = calculate_cost_savings_batch(total_output, price_per_kwh)
+        results["monthly_savings"] = calculate_cost_savings_batch(monthly_output, price_per_kwh)
+        results["yearly_savings"] = calculate_cost_savings_batch(yearly_output, price_per_kwh)
+
+    if "battery_capacity" in configs:
+        usable_capacity, backup_days, meets_autonomy = calculate_battery_backup_batch(
+            total_output, column("battery_capacity"), column("battery_efficiency"), column("days_autonomy"),
+        )
+        results["usable_capacity"] = usable_capacity
+        results["backup_days"] = backup_days
+        results["meets_autonomy"] = meets_autonomy
+
+    size = max(np.size(v) for v in results.values())
+    results = {k: np.broadcast_to(v, (size,)) if np.ndim(v) == 0 else v for k, v in results.items()}
+
+    if hasattr(configs, "columns"):
+        import pandas as pd
+        return pd.DataFrame(results, index=configs.index)
+    return results
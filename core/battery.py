@@ -0,0 +1,30 @@
+# battery.py
+# Battery storage checks and the simple once-a-day charge/discharge step.
+
+
+def calculate_battery_backup(daily_output, battery_capacity, efficiency, days_autonomy):
+    usable_capacity = battery_capacity * efficiency
+    backup_days = round(usable_capacity / daily_output, 2) if daily_output else 0
+    meets_autonomy = backup_days >= days_autonomy
+    return usable_capacity, backup_days, meets_autonomy
+
+def daily_battery_step(net_energy, battery_capacity, battery_soc, charge_eff, discharge_eff,
+                       max_charge, max_discharge):
+    # One scalar charge or discharge for a whole day. Returns the new state of
+    # charge and what is left over as surplus or deficit (kWh).
+    if net_energy > 0:
+        # Charge with surplus (limited by charge rate & capacity)
+        charge_power = min(net_energy, max_charge)
+        charge_energy = charge_power * charge_eff
+        battery_soc = min(battery_capacity, battery_soc + charge_energy)
+        surplus_energy = max(0.0, net_energy - charge_power)
+        deficit_energy = 0.0
+    else:
+        # Discharge to cover deficit (limited by discharge rate & SoC)
+        needed = abs(net_energy)
+        discharge_power = min(needed, max_discharge, battery_soc)
+        discharge_energy = discharge_power / max(1e-6, discharge_eff)
+        battery_soc = max(0.0, battery_soc - discharge_energy)
+        surplus_energy = 0.0
+        deficit_energy = max(0.0, needed - discharge_power)
+    return battery_soc, surplus_energy, deficit_energy
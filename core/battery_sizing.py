@@ -0,0 +1,119 @@
+# battery_sizing.py
+# Hourly battery sizing: for every node, the smallest power rating and then
+# the smallest capacity that keep a year's unserved energy (grid imports
+# after the battery) within a limit. Unserved energy only falls as either
+# grows, so each is found by bisection, with all nodes bisected together:
+# every probe is one dispatch of the whole portfolio.
+#
+# Probes follow the dispatch_batteries rules, reduced to what sizing needs.
+# Every hour's effect on the stored energy (surplus in at charge_eff,
+# shortfall out at 1 / discharge_eff) is worked out once; a probe clips each
+# row to the power rating, adds it and clips the level to [0, capacity].
+# Whatever either clip cuts off a discharge is unserved.
+
+import numpy as np
+
+
+def _stored_change(net, charge_eff, discharge_eff):
+    # (T, N) change in stored energy per hour with no limits at all
+    return np.where(net > 0, net * charge_eff, net / discharge_eff)
+
+
+def _unserved(change, capacity, initial_soc, charge_eff, discharge_eff, power=None):
+    # kWh unserved per node. Without power, change must already be clipped
+    # to the rating.
+    soc = initial_soc * capacity
+    cut = np.zeros(soc.size)
+    below = np.empty(soc.size)
+    step = np.empty(soc.size)
+    if power is not None:
+        lowest = -power / discharge_eff
+        highest = power * charge_eff
+    for row in change:
+        if power is not None:
+            np.maximum(row, lowest, out=step)
+            np.subtract(step, row, out=below)
+            cut += below
+            np.minimum(step, highest, out=step)
+            soc += step
+        else:
+            soc += row
+        np.minimum(soc, 0.0, out=below)
+        cut -= below
+        np.maximum(soc, 0.0, out=soc)
+        np.minimum(soc, capacity, out=soc)
+    return cut * discharge_eff
+
+
+def _storage_bound(change):
+    # Largest energy a battery could ever have to bridge: the deepest fall of
+    # the stored-energy balance below its running peak. A bigger battery that
+    # starts empty behaves the same.
+    balance = np.cumsum(change, axis=0)
+    return np.max(np.maximum.accumulate(np.maximum(balance, 0.0), axis=0) - balance, axis=0)
+
+
+def size_batteries(net, max_unserved=0.0, charge_eff=1.0, discharge_eff=1.0, c_rate=None,
+                   initial_soc=0.0, tolerance=0.01):
+    # net: (T, N) PV minus load per hour in kWh. max_unserved: kWh over the
+    # whole series, scalar or per node. The power rating limits charging and
+    # discharging alike; with c_rate it is tied to the capacity
+    # (power = c_rate * capacity) and only the capacity is searched.
+    # Batteries start empty unless initial_soc (share of capacity) is given;
+    # a part-full start lets a large battery live off its initial charge.
+    # tolerance is relative to each node's search range. Returns capacity
+    # (kWh), power (kW), unserved (kWh) and feasible per node; nodes no
+    # battery in the search range can serve get nan.
+    net = np.atleast_2d(np.asarray(net, dtype=float))
+    n = net.shape[1]
+    max_unserved = np.broadcast_to(np.asarray(max_unserved, dtype=float), (n,)) + 1e-9
+    charge_eff = np.broadcast_to(np.asarray(charge_eff, dtype=float), (n,))
+    discharge_eff = np.broadcast_to(np.asarray(discharge_eff, dtype=float), (n,))
+
+    # Search ranges: the storage bound (scaled up for a part-full start, so
+    # the initial charge alone can bridge the deepest fall) and the largest
+    # hourly surplus or shortfall, beyond which the rating never binds.
+    change = _stored_change(net, charge_eff, discharge_eff)
+    max_capacity = _storage_bound(change)
+    if initial_soc > 0:
+        max_capacity = max_capacity / initial_soc
+    max_power = np.abs(net).max(axis=0)
+    if c_rate is not None:
+        max_capacity = np.maximum(max_capacity, max_power / c_rate)
+
+    def bisect(upper, probe):
+        # Smallest value in [0, upper] whose probe meets the limit, per node,
+        # to within tolerance * upper; also returns the unserved energy there.
+        lo = np.zeros(n)
+        hi = upper.copy()
+        at_hi = probe(hi)
+        while np.any(hi - lo > tolerance * upper):
+            mid = 0.5 * (lo + hi)
+            at_mid = probe(mid)
+            ok = at_mid <= max_unserved
+            hi = np.where(ok, mid, hi)
+            at_hi = np.where(ok, at_mid, at_hi)
+            lo = np.where(ok, lo, mid)
+        return hi, at_hi
+
+    if c_rate is None:
+        power, _ = bisect(max_power, lambda p: _unserved(change, max_capacity, initial_soc,
+                                                        charge_eff, discharge_eff, p))
+        # The rating is fixed from here on: clip once, so capacity probes
+        # only add and clip the level.
+        over_rating = np.maximum(-net - power, 0.0).sum(axis=0)
+        change = np.clip(change, -power / discharge_eff, power * charge_eff)
+        capacity, result = bisect(max_capacity, lambda e: over_rating + _unserved(
+            change, e, initial_soc, charge_eff, discharge_eff))
+    else:
+        capacity, result = bisect(max_capacity, lambda e: _unserved(change, e, initial_soc,
+                                                                   charge_eff, discharge_eff, c_rate * e))
+        power = c_rate * capacity
+
+    feasible = result <= max_unserved
+    return {
+        "capacity": np.where(feasible, capacity, np.nan),
+        "power": np.where(feasible, power, np.nan),
+        "unserved": result,
+        "feasible": feasible,
+    }
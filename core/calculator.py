@@ -0,0 +1,25 @@
+# calculator.py
+# Scalar formulas behind the energy calculator (one configuration per call).
+
+from math import cos, radians
+
+
+def calculate_energy_output(width, length, coverage_efficiency, panel_efficiency, solar_irradiance, system_losses, ndigits=2,
+                            shading_loss=0.0):
+    # shading_loss: share of the irradiation lost to neighbouring canopies
+    # (core.shading.city_shading's irradiation_loss); 0 = unobstructed
+    surface_area_m2 = width * length * coverage_efficiency
+    daily_energy_output_kWh = surface_area_m2 * panel_efficiency * solar_irradiance * system_losses * (1 - shading_loss)
+    return round(daily_energy_output_kWh, ndigits)
+
+def calculate_co2_savings(kwh, emission_factor):
+    return round(kwh * emission_factor, 2)
+
+def calculate_cost_savings(kwh, price_per_kwh):
+    return round(kwh * price_per_kwh, 2)
+
+def calculate_tilted_monthly_energy(radiation, tilt, area, count):
+    # Dashboard approximation: tilt loss as cos(tilt), floored at 50%, over 30 days
+    efficiency = max(0.5, cos(radians(tilt)))
+    monthly = radiation * area * efficiency * 30
+    return round(monthly * count, 2)
@@ -0,0 +1,233 @@
+# cities.py
+# City climate and tariff data, one store for every app. The source is
+# data/cities.csv (one row per city, blank = unknown); it is built once into
+# a directory of .npy columns (data/cities/) that are opened memory-mapped,
+# so a lookup only reads the pages of the rows and columns it touches and
+# opening the store costs the same for 20 cities as for 50,000.
+# Rows are sorted by name, which makes the name index a binary search; the
+# coordinate index lists rows by 1° latitude/longitude cell for nearest().
+# Columns (NaN where unknown):
+#   latitude, longitude    degrees
+#   utc_offset             standard-time hours
+#   irradiance             kWh/m²/day (energy calculator)
+#   dashboard_irradiance   kWh/m²/day (multi-city dashboard)
+#   co2_factor             kg CO₂ per kWh of grid electricity
+#   electricity_price      €/kWh
+#   sunlight_hours         h/day (microgrid defaults)
+#   num_nodes              umbrellas per microgrid (microgrid defaults)
+
+import csv
+import json
+import os
+
+import numpy as np
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+SOURCE_CSV = os.path.join(DATA_DIR, "cities.csv")
+STORE_DIR = os.path.join(DATA_DIR, "cities")
+EARTH_RADIUS_KM = 6371.0
+
+# Other spellings the apps use. Rows are stored under the canonical name;
+# the apps keep showing their own labels by passing them to column_dict.
+CITY_ALIASES = {
+    "Sevilla": "Seville",
+    "Malaga": "Málaga",
+    "Burkina Faso": "Ouagadougou",
+}
+
+_stores = {}
+
+
+def _cell_keys(latitude, longitude):
+    # 1° cell number, latitude band major; longitude wraps at ±180
+    band = np.clip(np.floor(latitude) + 90, 0, 179).astype(np.int64)
+    return band * 360 + (np.floor(longitude).astype(np.int64) + 180) % 360
+
+
+def _save(directory, name, values):
+    # Written under a temporary name and moved into place, so a reader never
+    # sees half a file
+    path = os.path.join(directory, f"{name}.npy")
+    partial = f"{path}.{os.getpid()}.tmp.npy"
+    np.save(partial, values)
+    os.replace(partial, path)
+
+
+def build_store(source=SOURCE_CSV, directory=STORE_DIR):
+    # data/cities.csv -> one .npy per column, rows sorted by name, plus the
+    # coordinate index and meta.json (written last: its presence marks a
+    # complete store).
+    with open(source, newline="", encoding="utf-8") as f:
+        rows = [row for row in csv.reader(f) if row]
+    header, rows = rows[0], rows[1:]
+    if header[0] != "city":
+        raise ValueError(f"{source}: first column must be 'city', got '{header[0]}'")
+    names = np.array([row[0].strip() for row in rows])
+    unique, counts = np.unique(names, return_counts=True)
+    if np.any(counts > 1):
+        raise ValueError(f"{source}: duplicate cities: {', '.join(unique[counts > 1])}")
+    order = np.argsort(names, kind="stable")
+
+    os.makedirs(directory, exist_ok=True)
+    _save(directory, "names", names[order])
+    columns = {}
+    for k, column in enumerate(header[1:], start=1):
+        values = np.array([float(row[k]) if k < len(row) and row[k].strip() else np.nan for row in rows])
+        columns[column] = values[order]
+        _save(directory, column, columns[column])
+    if "latitude" in columns and "longitude" in columns:
+        located = np.flatnonzero(np.isfinite(columns["latitude"]) & np.isfinite(columns["longitude"]))
+        keys = _cell_keys(columns["latitude"][located], columns["longitude"][located])
+        by_cell = np.argsort(keys, kind="stable")
+        _save(directory, "cell_keys", keys[by_cell])
+        _save(directory, "cell_rows", located[by_cell])
+    meta_path = os.path.join(directory, "meta.json")
+    with open(f"{meta_path}.{os.getpid()}.tmp", "w", encoding="utf-8") as f:
+        json.dump({"count": len(names), "columns": list(columns)}, f)
+    os.replace(f"{meta_path}.{os.getpid()}.tmp", meta_path)
+
+
+def open_store(directory=STORE_DIR, source=SOURCE_CSV):
+    # The CityStore for a directory, (re)built from source first when it is
+    # missing or older than source. One store per directory per process.
+    meta_path = os.path.join(directory, "meta.json")
+    stale = source is not None and os.path.exists(source) and (
+        not os.path.exists(meta_path) or os.path.getmtime(source) > os.path.getmtime(meta_path))
+    if stale:
+        # Drop the old maps first: a mapped file cannot be replaced on Windows
+        _stores.pop(directory, None)
+        build_store(source, directory)
+    if directory not in _stores:
+        _stores[directory] = CityStore(directory)
+    return _stores[directory]
+
+
+class CityStore:
+    def __init__(self, directory=STORE_DIR):
+        # Reads meta.json only; columns are mapped on first use
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.columns = tuple(meta["columns"])
+        self._count = meta["count"]
+        self._arrays = {}
+
+    def _array(self, name):
+        if name not in self._arrays:
+            self._arrays[name] = np.load(os.path.join(self.directory, f"{name}.npy"), mmap_mode="r")
+        return self._arrays[name]
+
+    @property
+    def names(self):
+        return self._array("names")
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, city):
+        return self._find([city])[1].all()
+
+    def _find(self, cities):
+        # Row of each name (aliases resolved) and whether it was found
+        wanted = np.array([CITY_ALIASES.get(city, city) for city in cities], dtype=str)
+        rows = np.minimum(np.searchsorted(self.names, wanted), max(len(self) - 1, 0))
+        found = self.names[rows] == wanted if len(self) else np.zeros(len(wanted), dtype=bool)
+        return rows, found
+
+    def index(self, cities):
+        # Row number of a city, or an array of rows for a list of cities
+        scalar = isinstance(cities, str)
+        cities = [cities] if scalar else list(cities)
+        rows, found = self._find(cities)
+        if not found.all():
+            missing = [city for city, ok in zip(cities, found) if not ok]
+            raise KeyError(f"unknown cities: {', '.join(missing[:10])}{' ...' if len(missing) > 10 else ''}")
+        return int(rows[0]) if scalar else rows
+
+    def canonical(self, city):
+        return str(self.names[self.index(city)])
+
+    def column(self, column, cities=None):
+        # A whole column (memory-mapped, read-only) or its values for the
+        # given cities
+        if column not in self.columns:
+            raise KeyError(f"unknown column '{column}'; columns: {', '.join(self.columns)}")
+        values = self._array(column)
+        return values if cities is None else values[self.index(cities)]
+
+    def select(self, cities, columns=None):
+        # {"city": canonical names, column: values} for the given cities and
+        # columns (default all)
+        rows = self.index(list(cities))
+        result = {"city": np.array(self.names[rows])}
+        for column in columns or self.columns:
+            result[column] = self.column(column)[rows]
+        return result
+
+    def get(self, city, columns=None):
+        # One city's row as {column: float}
+        row = self.index(city)
+        return {column: float(self.column(column)[row]) for column in columns or self.columns}
+
+    def column_dict(self, column, labels=None):
+        # {city: value} for every city with a known value, in name order. With
+        # labels (an app's own spellings, aliases allowed) the keys are those
+        # labels, in their order, for the ones with a known value.
+        if labels is None:
+            values = np.asarray(self.column(column))
+            known = np.flatnonzero(np.isfinite(values))
+            return dict(zip(self.names[known].tolist(), values[known].tolist()))
+        labels = list(labels)
+        values = self.column(column, labels)
+        return {label: float(value) for label, value in zip(labels, values) if np.isfinite(value)}
+
+    def _rows_in_box(self, bands, cells):
+        # Rows in latitude bands x longitude cells (cells taken modulo 360)
+        keys = (np.clip(bands, 0, 179)[:, None] * 360 + np.asarray(cells)[None, :] % 360).ravel()
+        cell_keys = self._array("cell_keys")
+        start = np.searchsorted(cell_keys, keys, side="left")
+        stop = np.searchsorted(cell_keys, keys, side="right")
+        counts = stop - start
+        offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        return np.asarray(self._array("cell_rows")[np.repeat(start, counts) + offset])
+
+    def nearest(self, latitude, longitude):
+        # Name of the city closest to a point (great-circle distance). Cells
+        # around the point are searched in growing boxes until one holds a
+        # city, then every cell within that city's distance is checked.
+        band = int(np.clip(np.floor(latitude) + 90, 0, 179))
+        cell = int(np.floor(longitude)) + 180
+        reach = 0
+        while True:
+            if reach >= 180:
+                rows = np.asarray(self._array("cell_rows"))
+                break
+            rows = self._rows_in_box(np.arange(band - reach, band + reach + 1), np.arange(cell - reach, cell + reach + 1))
+            if rows.size:
+                break
+            reach = 2 * reach + 1
+        if rows.size == 0:
+            raise KeyError("no cities with coordinates")
+        lat = self.column("latitude")
+        lon = self.column("longitude")
+        degrees = np.degrees(_distance_km(latitude, longitude, lat[rows], lon[rows]).min() / EARTH_RADIUS_KM)
+        lat_reach = int(np.ceil(degrees)) + 1
+        shrink = np.cos(np.radians(min(abs(latitude) + degrees, 89.0)))
+        lon_reach = int(np.ceil(degrees / shrink)) + 1
+        if lon_reach >= 180:
+            rows = np.asarray(self._array("cell_rows"))
+        else:
+            rows = self._rows_in_box(np.arange(band - lat_reach, band + lat_reach + 1),
+                                     np.arange(cell - lon_reach, cell + lon_reach + 1))
+        rows = np.unique(rows)
+        best = rows[np.argmin(_distance_km(latitude, longitude, lat[rows], lon[rows]))]
+        return str(self.names[best])
+
+
+def _distance_km(latitude, longitude, latitudes, longitudes):
+    # Haversine distance from one point to many
+    lat1, lat2 = np.radians(latitude), np.radians(latitudes)
+    half_dlat = 0.5 * (lat2 - lat1)
+    half_dlon = 0.5 * np.radians(np.asarray(longitudes) - longitude)
+    a = np.sin(half_dlat) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(half_dlon) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
@@ -0,0 +1,192 @@
+# degradation.py
+# Battery wear from state-of-charge streams. RainflowCounter takes SoC
+# (kWh) in chunks of hourly rows, one column per battery, and counts cycles
+# with the four-point rainflow method as the data arrives: each battery
+# keeps only its last value, direction and a fixed-size stack of open
+# reversals, so a 20-year run costs the same memory as a one-day run.
+# Every closed cycle adds damage by Miner's rule with a depth-of-discharge
+# cycle life, N(DoD) = CYCLE_LIFE * DoD ** -DOD_EXPONENT, and capacity fades
+# linearly with damage down to END_OF_LIFE at damage 1.
+
+import numpy as np
+
+from core.dispatch import dispatch_batteries
+
+CYCLE_LIFE = 3000        # full 100% DoD cycles to end of life
+DOD_EXPONENT = 1.5       # shallower cycles last longer: N grows as DoD ** -1.5
+END_OF_LIFE = 0.8        # remaining capacity share at damage 1
+MAX_REVERSALS = 64       # open reversals kept per battery
+BLOCK_ROWS = 256
+
+
+class RainflowCounter:
+    def __init__(self, battery_capacity, cycle_life=CYCLE_LIFE, dod_exponent=DOD_EXPONENT,
+                 end_of_life=END_OF_LIFE, calendar_fade=0.0, step_hours=1.0, max_reversals=MAX_REVERSALS,
+                 initial_soc=None):
+        # battery_capacity: nominal kWh, scalar or one per battery (the number
+        # of batteries is taken from it). calendar_fade: capacity share lost
+        # per year regardless of use. initial_soc: SoC (kWh) before the first
+        # row, so the first move is counted without adding a step; by default
+        # the first row is the starting point.
+        self.nominal = np.atleast_1d(np.asarray(battery_capacity, dtype=float)).copy()
+        n = self.nominal.size
+        self.cycle_life = cycle_life
+        self.dod_exponent = dod_exponent
+        self.end_of_life = end_of_life
+        self.calendar_fade = calendar_fade
+        self.step_hours = step_hours
+        self.stack = np.zeros((n, max_reversals))
+        self.depth = np.zeros(n, dtype=np.int64)
+        self.last = np.zeros(n)
+        self.direction = np.zeros(n)
+        self.steps = 0
+        self.started = False
+        if initial_soc is not None:
+            self._start(np.broadcast_to(np.asarray(initial_soc, dtype=float), (n,)))
+        self.cycles = np.zeros(n)
+        self.equivalent_cycles = np.zeros(n)
+        self.damage = np.zeros(n)
+        self.fade = np.zeros(n)
+
+    def __len__(self):
+        return self.nominal.size
+
+    def _start(self, soc):
+        self.last = np.array(soc, dtype=float)
+        self.stack[:, 0] = soc
+        self.depth[:] = 1
+        self.started = True
+
+    def capacity(self):
+        # Current capacity (kWh) after cycle and calendar fade
+        return self.nominal * np.maximum(1.0 - self.fade, 0.0)
+
+    def _count(self, rows, ranges, weight):
+        # Adds closed cycles (weight 1) or half cycles (0.5) of the given
+        # ranges (kWh) for the given batteries.
+        capacity = self.capacity()[rows]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            dod = np.where(capacity > 0, np.minimum(ranges / capacity, 1.0), 0.0)
+        self.cycles[rows] += weight
+        self.equivalent_cycles[rows] += weight * dod
+        self.damage[rows] += weight * dod ** self.dod_exponent / self.cycle_life
+
+    def _push(self, rows, values):
+        # Adds a confirmed reversal and closes every cycle it completes.
+        full = rows[self.depth[rows] == self.stack.shape[1]]
+        if full.size:
+            # Stack full: the oldest range is counted as a half cycle
+            self._count(full, np.abs(self.stack[full, 1] - self.stack[full, 0]), 0.5)
+            self.stack[full, :-1] = self.stack[full, 1:]
+            self.depth[full] -= 1
+        self.stack[rows, self.depth[rows]] = values
+        self.depth[rows] += 1
+
+        while rows.size:
+            rows = rows[self.depth[rows] >= 4]
+            top = self.depth[rows]
+            a, b, c, d = (self.stack[rows, top - k] for k in (4, 3, 2, 1))
+            inner = np.abs(c - b)
+            closed = (inner <= np.abs(d - c)) & (inner <= np.abs(b - a))
+            rows = rows[closed]
+            if rows.size:
+                self._count(rows, inner[closed], 1.0)
+                self.stack[rows, self.depth[rows] - 3] = d[closed]
+                self.depth[rows] -= 2
+
+    def update(self, soc):
+        # soc: (T, N) SoC rows in kWh (a (N,) row is one step), in time order
+        # across calls. Long chunks are taken BLOCK_ROWS at a time so the
+        # working arrays stay small.
+        soc = np.atleast_2d(np.asarray(soc, dtype=float))
+        if soc.shape[0] == 0:
+            return self
+        if not self.started:
+            self._start(soc[0])
+        for start in range(0, soc.shape[0], BLOCK_ROWS):
+            self._update_block(soc[start:start + BLOCK_ROWS])
+        self.steps += soc.shape[0]
+        years = self.steps * self.step_hours / 8760
+        self.fade = (1.0 - self.end_of_life) * self.damage + self.calendar_fade * years
+        return self
+
+    def _update_block(self, soc):
+        series = np.vstack((self.last, soc))
+
+        # Direction of every move, carried across flat stretches
+        sign = np.sign(np.diff(series, axis=0)).astype(np.int8)
+        moved = np.where(sign != 0, np.arange(sign.shape[0], dtype=np.int32)[:, None], np.int32(-1))
+        latest = np.maximum.accumulate(moved, axis=0)
+        heading = np.where(latest >= 0, np.take_along_axis(sign, np.maximum(latest, 0), axis=0),
+                           self.direction.astype(np.int8))
+        before = np.vstack((self.direction.astype(np.int8), heading[:-1]))
+        # A move against the previous heading confirms the point it starts
+        # from as a reversal.
+        reversal = (sign != 0) & (before != 0) & (sign != before)
+
+        # Reversals per battery in time order, one row per rank
+        counts = reversal.sum(axis=0)
+        if counts.any():
+            steps, batteries = np.nonzero(reversal.T)[::-1]
+            rank = np.arange(steps.size) - np.repeat(np.cumsum(counts) - counts, counts)
+            points = np.zeros((counts.max(), len(self)))
+            points[rank, batteries] = series[steps, batteries]
+            for k in range(points.shape[0]):
+                rows = np.flatnonzero(counts > k)
+                self._push(rows, points[k, rows])
+
+        self.last = soc[-1].copy()
+        self.direction = heading[-1].astype(float)
+
+    def residue_damage(self):
+        # Damage the open reversals (and the current value) would add if the
+        # run ended now, each range counted as a half cycle (ASTM E1049).
+        damage = np.zeros(len(self))
+        capacity = self.capacity()
+        for i in range(len(self)):
+            points = np.append(self.stack[i, :self.depth[i]], self.last[i])
+            if capacity[i] > 0:
+                dod = np.minimum(np.abs(np.diff(points)) / capacity[i], 1.0)
+                damage[i] = 0.5 * (dod ** self.dod_exponent).sum() / self.cycle_life
+        return damage
+
+    def summary(self):
+        return {
+            "cycles": self.cycles.copy(),
+            "equivalent_cycles": self.equivalent_cycles.copy(),
+            "damage": self.damage.copy(),
+            "fade": self.fade.copy(),
+            "capacity": self.capacity(),
+        }
+
+    def years_to_end_of_life(self, include_residue=True):
+        # At the rate seen so far, including calendar fade
+        years = self.steps * self.step_hours / 8760
+        damage = self.damage + (self.residue_damage() if include_residue else 0.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rate = (1.0 - self.end_of_life) * damage / years + self.calendar_fade
+            return np.where(rate > 0, (1.0 - self.end_of_life) / rate, np.inf)
+
+
+def simulate_degradation(net, years, battery_capacity, charge_eff=1.0, discharge_eff=1.0,
+                         max_charge=np.inf, max_discharge=np.inf, counter=None, **counter_options):
+    # Runs dispatch_batteries over the same net profile (T, N) year after
+    # year, each year with the capacity left by the previous ones, and feeds
+    # the SoC stream to a RainflowCounter. Only one year of SoC is ever held.
+    # Returns {"capacity": (years + 1, N) kWh at the start of each year and
+    # after the last, "counter": the RainflowCounter}.
+    net = np.atleast_2d(np.asarray(net))
+    if counter is None:
+        # Starts from the half-full battery dispatch_batteries assumes
+        capacity = np.broadcast_to(np.asarray(battery_capacity, dtype=float), (net.shape[1],))
+        counter_options.setdefault("initial_soc", 0.5 * capacity)
+        counter = RainflowCounter(capacity, **counter_options)
+    capacity = [counter.capacity()]
+    soc = None
+    for _ in range(years):
+        result = dispatch_batteries(net, counter.capacity(), soc, charge_eff, discharge_eff,
+                                    max_charge, max_discharge)
+        counter.update(result["soc"])
+        soc = np.minimum(result["final_soc"], counter.capacity())
+        capacity.append(counter.capacity())
+    return {"capacity": np.array(capacity), "counter": counter}
@@ -0,0 +1,77 @@
+# dispatch.py
+# Hourly battery dispatch. Every step each node's battery takes the PV surplus
+# or covers the shortfall, within its charge/discharge rate limits (kW, i.e.
+# kWh per hourly step) and with separate charge and discharge efficiencies:
+# charging p kWh stores p * charge_eff, and delivering p kWh draws
+# p / discharge_eff from storage. What the battery cannot take is exported,
+# what it cannot deliver is imported. Vectorised across nodes, one loop over
+# time, so the state of charge carries from step to step.
+
+import numpy as np
+
+RECORDABLE = ("soc", "charge", "discharge", "export", "import")
+
+
+def dispatch_batteries(net, battery_capacity, soc=None, charge_eff=1.0, discharge_eff=1.0,
+                       max_charge=np.inf, max_discharge=np.inf, record=("soc",), dtype=np.float64):
+    # net: (T, N) PV minus load per step in kWh (positive = surplus); a (N,)
+    # row is one step. Battery parameters are scalars or (N,); soc defaults to
+    # half the capacity. `record` picks the (T, N) matrices to keep:
+    #   soc        -- state of charge at the end of each step
+    #   charge     -- kWh taken from PV into the battery
+    #   discharge  -- kWh delivered by the battery to the load
+    #   export / import -- what is left over / still missing after the battery
+    # Per-node totals (charged, discharged, exported, imported, cycles) and
+    # final_soc are always returned; cycles counts full equivalent cycles
+    # (kWh discharged from storage / capacity).
+    unknown = set(record) - set(RECORDABLE)
+    if unknown:
+        raise ValueError(f"cannot record {', '.join(sorted(unknown))}; choose from {', '.join(RECORDABLE)}")
+
+    net = np.atleast_2d(np.asarray(net))
+    steps, n = net.shape
+    capacity = np.broadcast_to(np.asarray(battery_capacity, dtype=float), (n,))
+    if soc is None:
+        soc = 0.5 * capacity
+    soc = np.array(np.broadcast_to(np.asarray(soc, dtype=float), (n,)))
+    charge_eff = np.broadcast_to(np.asarray(charge_eff, dtype=float), (n,))
+    discharge_eff = np.broadcast_to(np.asarray(discharge_eff, dtype=float), (n,))
+    max_charge = np.broadcast_to(np.asarray(max_charge, dtype=float), (n,))
+    max_discharge = np.broadcast_to(np.asarray(max_discharge, dtype=float), (n,))
+
+    recorded = {name: np.empty((steps, n), dtype=dtype) for name in record}
+    totals = {name: np.zeros(n) for name in ("charged", "discharged", "exported", "imported")}
+    drawn = np.zeros(n)
+
+    for t in range(steps):
+        row = net[t].astype(float, copy=False)
+        surplus = np.maximum(row, 0.0)
+        shortfall = np.maximum(-row, 0.0)
+        # Limited by the rate and by the room (charging) or the energy
+        # (discharging) the efficiencies leave.
+        charge = np.minimum(np.minimum(surplus, max_charge), (capacity - soc) / charge_eff)
+        discharge = np.minimum(np.minimum(shortfall, max_discharge), soc * discharge_eff)
+        stored = charge * charge_eff
+        used = discharge / discharge_eff
+        soc += stored
+        soc -= used
+        np.clip(soc, 0.0, capacity, out=soc)
+        export = surplus - charge
+        imported = shortfall - discharge
+
+        totals["charged"] += charge
+        totals["discharged"] += discharge
+        totals["exported"] += export
+        totals["imported"] += imported
+        drawn += used
+        if recorded:
+            for name, values in (("soc", soc), ("charge", charge), ("discharge", discharge),
+                                 ("export", export), ("import", imported)):
+                if name in recorded:
+                    recorded[name][t] = values
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        recorded["cycles"] = np.where(capacity > 0, drawn / capacity, 0.0)
+    recorded.update(totals)
+    recorded["final_soc"] = soc
+    return recorded
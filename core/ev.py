@@ -0,0 +1,118 @@
+# ev.py
+# EV fleet charging profiles. Arrival and departure hours for the whole fleet
+# are drawn in one batch from a seeded np.random.Generator (same seed, same
+# fleet), and each EV charges at a flat rate between them: its daily energy
+# spread over the hours it is plugged in, capped by the charger power. In the
+# PV-following mode each EV's energy is instead shifted into the hours with
+# the most PV surplus in its window (valley filling).
+
+import numpy as np
+
+ARRIVAL_WINDOW = (8, 10)     # 8-10 AM, both ends included
+DEPARTURE_WINDOW = (17, 20)  # 5-8 PM, both ends included
+HOURS = 24
+
+
+def sample_sessions(n, arrival_window=ARRIVAL_WINDOW, departure_window=DEPARTURE_WINDOW, seed=None):
+    # (arrival, departure) hours for n EVs; seed is an int or a Generator.
+    # An EV that would leave before it arrives stays for one hour.
+    rng = np.random.default_rng(seed)
+    arrival = rng.integers(arrival_window[0], arrival_window[1] + 1, size=n)
+    departure = rng.integers(departure_window[0], departure_window[1] + 1, size=n)
+    return arrival, np.maximum(departure, arrival + 1)
+
+
+def charging_rate(arrival, departure, energy_kwh, max_kw):
+    # kW per EV while plugged in
+    return np.minimum(np.asarray(energy_kwh, dtype=float) / (departure - arrival), max_kw)
+
+
+def fleet_profiles(n, energy_kwh, max_kw, arrival_window=ARRIVAL_WINDOW, departure_window=DEPARTURE_WINDOW,
+                   hours=HOURS, seed=None, dtype=np.float64):
+    # (n, hours) kWh per EV per hour. energy_kwh and max_kw: scalar or per EV.
+    arrival, departure = sample_sessions(n, arrival_window, departure_window, seed)
+    rate = charging_rate(arrival, departure, energy_kwh, max_kw).astype(dtype)
+    hour = np.arange(hours)
+    plugged = (hour >= arrival[:, None]) & (hour < departure[:, None])
+    return plugged * rate[:, None]
+
+
+def fleet_demand(n, energy_kwh, max_kw, arrival_window=ARRIVAL_WINDOW, departure_window=DEPARTURE_WINDOW,
+                 hours=HOURS, seed=None):
+    # (hours,) fleet total of fleet_profiles with the same seed, without
+    # building the matrix: EVs are grouped by (arrival, departure) hour, and
+    # each group's summed rate is added over its window once.
+    arrival, departure = sample_sessions(n, arrival_window, departure_window, seed)
+    rate = np.broadcast_to(charging_rate(arrival, departure, energy_kwh, max_kw), arrival.shape)
+    arrival = np.minimum(arrival, hours)
+    departure = np.minimum(departure, hours)
+    group_rate = np.bincount(arrival * (hours + 1) + departure, rate, minlength=(hours + 1) ** 2)
+    demand = np.zeros(hours)
+    for group in np.flatnonzero(group_rate).tolist():
+        start, stop = divmod(group, hours + 1)
+        demand[start:stop] += group_rate[group]
+    return demand
+
+
+def _water_fill(load, cap, energy):
+    # x = clip(level - load, 0, cap) with sum(x) == energy: pours energy into
+    # the lowest hours of `load` first, at most cap per hour.
+    if energy <= 0 or load.size == 0:
+        return np.zeros(load.size)
+    if energy >= cap * load.size:
+        return np.full(load.size, float(cap))
+    # Filled energy is piecewise linear in the level, with breakpoints where
+    # an hour starts or stops filling
+    points = np.sort(np.concatenate((load, load + cap)))
+    filled = np.clip(points[:, None] - load, 0.0, cap).sum(axis=1)
+    # cap * size and filled[-1] can differ in the last bit; at or past the
+    # top every hour is full
+    if energy >= filled[-1]:
+        return np.full(load.size, float(cap))
+    k = max(int(np.searchsorted(filled, energy)), 1)
+    if filled[k] == filled[k - 1]:
+        return np.clip(points[k] - load, 0.0, cap)
+    level = points[k - 1] + (energy - filled[k - 1]) * (points[k] - points[k - 1]) / (filled[k] - filled[k - 1])
+    return np.clip(level - load, 0.0, cap)
+
+
+def _smart_groups(surplus, arrival, departure, energy_kwh, max_kw):
+    # EVs with the same window, energy and charger limit are interchangeable,
+    # so each such group is filled once as one big EV. Groups go in order of
+    # departure, shortest window first (least flexible first), each against
+    # the net load left by the PV surplus and the groups before it.
+    surplus = np.asarray(surplus, dtype=float)
+    hours = surplus.size
+    arrival = np.minimum(arrival, hours)
+    departure = np.minimum(departure, hours)
+    max_kw = np.broadcast_to(np.asarray(max_kw, dtype=float), arrival.shape)
+    energy = np.minimum(np.broadcast_to(np.asarray(energy_kwh, dtype=float), arrival.shape),
+                        max_kw * (departure - arrival))
+    keys = np.column_stack((departure, -arrival, energy, max_kw))
+    groups, inverse, counts = np.unique(keys, axis=0, return_inverse=True, return_counts=True)
+    load = -surplus
+    per_ev = np.zeros((len(groups), hours))
+    for g, (stop, start, group_energy, group_kw) in enumerate(groups.tolist()):
+        start, stop = int(-start), int(stop)
+        fill = _water_fill(load[start:stop], group_kw * counts[g], group_energy * counts[g])
+        load[start:stop] += fill
+        per_ev[g, start:stop] = fill / counts[g]
+    return per_ev, inverse.ravel(), counts
+
+
+def smart_schedule(surplus, arrival, departure, energy_kwh, max_kw):
+    # PV-following charging: (n, hours) kWh per EV per hour. surplus is the
+    # (hours,) PV output minus the other load (negative when short); each EV
+    # gets its energy (capped by max_kw x window, as in the flat mode) in the
+    # hours of its window where the remaining net load is lowest.
+    per_ev, inverse, _ = _smart_groups(surplus, arrival, departure, energy_kwh, max_kw)
+    return per_ev[inverse]
+
+
+def fleet_smart_demand(n, energy_kwh, max_kw, surplus, arrival_window=ARRIVAL_WINDOW,
+                       departure_window=DEPARTURE_WINDOW, seed=None):
+    # (hours,) fleet total of smart_schedule for the fleet fleet_demand would
+    # draw with the same seed, so both modes can be compared EV for EV.
+    arrival, departure = sample_sessions(n, arrival_window, departure_window, seed)
+    per_ev, _, counts = _smart_groups(surplus, arrival, departure, energy_kwh, max_kw)
+    return counts @ per_ev
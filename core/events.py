@@ -0,0 +1,242 @@
+# events.py
+# Discrete-event microgrid simulator. Time is continuous (hours) and every
+# node's power flows are constant between events, so nothing happens between
+# events and cost grows with the number of events, not with timesteps x nodes.
+# Events sit in a heapq priority queue:
+#   ev_arrival / ev_departure / ev_full  EV sessions on a node's charger
+#   sun / cloud                           PV output (grid-wide or per node)
+#   outage_start / outage_end             node islanded from the grid
+#   battery_full / battery_empty          scheduled by the simulator itself
+# A node is only brought up to date when an event touches it; battery limit
+# and ev_full events are rescheduled whenever a node's flows change, and
+# stale ones are skipped via a per-node version number. An islanded node
+# cannot import, so its EVs are cut back first and charge only from what is
+# left after the other load; they are credited only what they get.
+
+import heapq
+from itertools import count
+
+NODE_DEFAULTS = {
+    "pv_kw": 0.0,
+    "load_kw": 0.0,
+    "battery_capacity": 0.0,
+    "stored_energy": 0.0,
+    "max_charge_kw": float("inf"),
+    "max_discharge_kw": float("inf"),
+    "charge_eff": 1.0,
+    "discharge_eff": 1.0,
+}
+
+TOTALS = ("generated", "load", "ev_delivered", "charged", "discharged",
+          "exported", "imported", "curtailed", "unserved")
+
+
+class EventSimulator:
+    def __init__(self, nodes, start=0.0, keep_log=False):
+        # nodes: dicts with "id" plus any of NODE_DEFAULTS (powers in kW,
+        # energies in kWh).
+        self.now = start
+        self.nodes = []
+        self.index = {}
+        for node in nodes:
+            state = dict(NODE_DEFAULTS)
+            state.update({key: float(node[key]) for key in NODE_DEFAULTS if key in node})
+            state.update({
+                "id": node["id"], "cloud": 1.0, "online": True, "evs": {}, "ev_kw": 0.0,
+                "updated": start, "version": 0, "rates": None,
+            })
+            state.update({name: 0.0 for name in TOTALS})
+            self.index[node["id"]] = len(self.nodes)
+            self.nodes.append(state)
+        self.sun = 1.0
+        self.queue = []
+        self.sessions = {}
+        self.log = [] if keep_log else None
+        self.processed = 0
+        self._sequence = count()
+        self._ev_ids = count()
+        for i in range(len(self.nodes)):
+            self._refresh(i)
+
+    # --- scheduling -------------------------------------------------------
+
+    def schedule(self, time, kind, node=None, **data):
+        if time < self.now:
+            raise ValueError(f"cannot schedule {kind} at {time} h, simulation is already at {self.now} h")
+        position = None if node is None else self.index[node]
+        heapq.heappush(self.queue, (time, next(self._sequence), kind, position, data))
+
+    def add_ev(self, arrival, node, energy_kwh, departure, max_kw=7.0):
+        # One charging session; the EV leaves at `departure` or when full.
+        ev_id = next(self._ev_ids)
+        self.sessions[ev_id] = {
+            "node": node, "arrival": arrival, "departure": None,
+            "requested": energy_kwh, "delivered": 0.0, "max_kw": max_kw,
+        }
+        self.schedule(arrival, "ev_arrival", node, ev=ev_id)
+        self.schedule(departure, "ev_departure", node, ev=ev_id)
+        return ev_id
+
+    def set_sun(self, time, level):
+        # Grid-wide share of rated PV output (0 at night, 1 at full sun)
+        self.schedule(time, "sun", level=level)
+
+    def set_cloud(self, time, factor, node=None):
+        # Share of clear-sky output that gets through, for one node or all
+        self.schedule(time, "cloud", node, factor=factor)
+
+    def add_outage(self, start, end, node):
+        self.schedule(start, "outage_start", node)
+        self.schedule(end, "outage_end", node)
+
+    def add_daylight(self, days, sunrise=7.0, sunset=19.0, level=1.0):
+        # Night from now until the first sunrise, then `days` days of daylight
+        self.set_sun(self.now, 0.0)
+        for day in range(days):
+            self.set_sun(self.now + 24.0 * day + sunrise, level)
+            self.set_sun(self.now + 24.0 * day + sunset, 0.0)
+
+    # --- node dynamics ----------------------------------------------------
+
+    def _flows(self, node):
+        # Constant power flows (kW) for the node's current conditions:
+        # (pv, charge, discharge, export, shortfall, battery level change,
+        # share of the EVs' demand supplied)
+        pv = node["pv_kw"] * self.sun * node["cloud"]
+        net = pv - node["load_kw"] - node["ev_kw"]
+        if net > 0:
+            charge = min(net, node["max_charge_kw"]) if node["stored_energy"] < node["battery_capacity"] else 0.0
+            return pv, charge, 0.0, net - charge, 0.0, charge * node["charge_eff"], 1.0
+        discharge = min(-net, node["max_discharge_kw"]) if node["stored_energy"] > 0 else 0.0
+        shortfall = -net - discharge
+        ev_share = 1.0
+        if not node["online"] and node["ev_kw"] > 0:
+            # Islanded: the EVs give way to the other load
+            cut = min(shortfall, node["ev_kw"])
+            shortfall -= cut
+            ev_share = 1.0 - cut / node["ev_kw"]
+        return pv, 0.0, discharge, 0.0, shortfall, -discharge / node["discharge_eff"], ev_share
+
+    def _advance(self, i):
+        # Integrates the node's constant flows from its last update to now
+        node = self.nodes[i]
+        dt = self.now - node["updated"]
+        if dt > 0:
+            pv, charge, discharge, export, shortfall, soc, ev_share = node["rates"]
+            node["generated"] += pv * dt
+            node["load"] += node["load_kw"] * dt
+            if charge:
+                node["charged"] += charge * dt
+            if discharge:
+                node["discharged"] += discharge * dt
+            if node["online"]:
+                node["exported"] += export * dt
+                node["imported"] += shortfall * dt
+            else:
+                node["curtailed"] += export * dt
+                node["unserved"] += shortfall * dt
+            if soc:
+                stored = node["stored_energy"] + soc * dt
+                node["stored_energy"] = min(max(stored, 0.0), node["battery_capacity"])
+            if node["evs"] and ev_share > 0:
+                node["ev_delivered"] += node["ev_kw"] * ev_share * dt
+                for ev_id, kw in node["evs"].items():
+                    self.sessions[ev_id]["delivered"] += kw * ev_share * dt
+        node["updated"] = self.now
+
+    def _refresh(self, i):
+        # New flows after a change, the battery limit they lead to (if any)
+        # and when each EV on the node is full at its new rate
+        node = self.nodes[i]
+        node["version"] += 1
+        node["rates"] = self._flows(node)
+        ev_share = node["rates"][6]
+        if ev_share > 0:
+            for ev_id, kw in node["evs"].items():
+                session = self.sessions[ev_id]
+                hours = max(session["requested"] - session["delivered"], 0.0) / (kw * ev_share)
+                heapq.heappush(self.queue, (self.now + hours, next(self._sequence), "ev_full", i,
+                                            {"ev": ev_id, "version": node["version"]}))
+        soc = node["rates"][5]
+        if soc > 0:
+            hours = (node["battery_capacity"] - node["stored_energy"]) / soc
+            heapq.heappush(self.queue, (self.now + hours, next(self._sequence), "battery_full", i, node["version"]))
+        elif soc < 0:
+            hours = node["stored_energy"] / -soc
+            heapq.heappush(self.queue, (self.now + hours, next(self._sequence), "battery_empty", i, node["version"]))
+
+    def _end_session(self, i, ev_id):
+        node = self.nodes[i]
+        node["ev_kw"] -= node["evs"].pop(ev_id)
+        if not node["evs"]:
+            node["ev_kw"] = 0.0
+        self.sessions[ev_id]["departure"] = self.now
+
+    # --- main loop --------------------------------------------------------
+
+    def _handle(self, kind, i, data):
+        if kind == "ev_full" and data["version"] != self.nodes[i]["version"]:
+            return False
+        if kind in ("battery_full", "battery_empty"):
+            if data != self.nodes[i]["version"]:
+                return False
+            self._advance(i)
+            node = self.nodes[i]
+            node["stored_energy"] = node["battery_capacity"] if kind == "battery_full" else 0.0
+            self._refresh(i)
+            return True
+
+        if kind == "sun" or (kind == "cloud" and i is None):
+            touched = range(len(self.nodes))
+        else:
+            touched = (i,)
+        for j in touched:
+            self._advance(j)
+
+        if kind == "sun":
+            self.sun = data["level"]
+        elif kind == "cloud":
+            for j in touched:
+                self.nodes[j]["cloud"] = data["factor"]
+        elif kind == "outage_start":
+            self.nodes[i]["online"] = False
+        elif kind == "outage_end":
+            self.nodes[i]["online"] = True
+        elif kind == "ev_arrival":
+            session = self.sessions[data["ev"]]
+            if session["requested"] <= 0:
+                return True
+            self.nodes[i]["evs"][data["ev"]] = session["max_kw"]
+            self.nodes[i]["ev_kw"] += session["max_kw"]
+        elif kind in ("ev_departure", "ev_full"):
+            if data["ev"] not in self.nodes[i]["evs"]:
+                return False
+            self._end_session(i, data["ev"])
+        else:
+            raise ValueError(f"unknown event kind '{kind}'")
+
+        for j in touched:
+            self._refresh(j)
+        return True
+
+    def run(self, until):
+        # Processes every event up to `until` (hours), then brings all nodes up
+        # to that time. Returns summary().
+        while self.queue and self.queue[0][0] <= until:
+            time, _, kind, i, data = heapq.heappop(self.queue)
+            self.now = time
+            if self._handle(kind, i, data):
+                self.processed += 1
+                if self.log is not None:
+                    self.log.append((time, kind, None if i is None else self.nodes[i]["id"]))
+        self.now = until
+        for i in range(len(self.nodes)):
+            self._advance(i)
+        return self.summary()
+
+    def summary(self):
+        # Per-node energy totals (kWh) and battery level at the current time
+        return {
+            node["id"]: dict({name: node[name] for name in TOTALS}, stored_energy=node["stored_energy"])
+            for node in self.nodes
+        }
@@ -0,0 +1,17 @@
+# finance.py
+# Loan and payback figures for the simulator's financial block.
+
+
+def loan_annuity_payment(principal, annual_rate_pct, years):
+    r = annual_rate_pct / 100.0
+    n = years
+    if r == 0:
+        return principal / n
+    annuity = principal * (r * (1 + r) ** n) / ((1 + r) ** n - 1)
+    return annuity
+
+def payback_years(principal, annual_revenue, annual_expenses):
+    annual_net_cash_flow = annual_revenue - annual_expenses
+    if annual_net_cash_flow > 0:
+        return principal / annual_net_cash_flow
+    return float('inf')
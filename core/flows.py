@@ -0,0 +1,115 @@
+# flows.py
+# Vectorised surplus/deficit exchange with sparse flow output. Surplus nodes
+# give and deficit nodes receive pro rata (min(supply, demand) changes hands),
+# and the flows are matched in node order: laid end to end, the amounts given
+# and received form two partitions of the traded volume, and every overlap of
+# a giver's interval with a receiver's is one flow. That is at most
+# givers + receivers - 1 flows, found with one merge of the two cumulative
+# sums instead of a givers x receivers loop.
+
+import numpy as np
+
+
+class FlowMatrix:
+    # Sparse node x node flow matrix (kWh from row to column), stored as COO
+    # sorted by row and column, which is also CSR (indptr) for free.
+    def __init__(self, ids, row, col, data):
+        self.ids = list(ids)
+        self.position = {node_id: i for i, node_id in enumerate(self.ids)}
+        self.shape = (len(self.ids), len(self.ids))
+        self.row = np.asarray(row, dtype=np.int64)
+        self.col = np.asarray(col, dtype=np.int64)
+        self.data = np.asarray(data, dtype=float)
+        order = np.lexsort((self.col, self.row))
+        if np.any(order[1:] < order[:-1]):
+            self.row, self.col, self.data = self.row[order], self.col[order], self.data[order]
+        self.indptr = np.searchsorted(self.row, np.arange(self.shape[0] + 1))
+
+    @property
+    def nnz(self):
+        return self.data.size
+
+    def outflow(self):
+        # kWh leaving each node
+        return np.bincount(self.row, self.data, minlength=self.shape[0])
+
+    def inflow(self):
+        # kWh arriving at each node
+        return np.bincount(self.col, self.data, minlength=self.shape[1])
+
+    def flows_from(self, node_id, ndigits=3):
+        # {to_id: kWh} for one node, from its CSR row
+        i = self.position[node_id]
+        start, stop = self.indptr[i], self.indptr[i + 1]
+        return {
+            self.ids[j]: round(float(f), ndigits)
+            for j, f in zip(self.col[start:stop].tolist(), self.data[start:stop].tolist())
+        }
+
+    def to_dict(self, ndigits=3):
+        # {(from_id, to_id): kWh}, the shape simulate_energy_exchange returns
+        flows = {}
+        for i, j, f in zip(self.row.tolist(), self.col.tolist(), self.data.tolist()):
+            amount = round(f, ndigits)
+            if amount > 0:
+                key = (self.ids[i], self.ids[j])
+                flows[key] = round(flows.get(key, 0) + amount, ndigits)
+        return flows
+
+    def toarray(self):
+        dense = np.zeros(self.shape)
+        np.add.at(dense, (self.row, self.col), self.data)
+        return dense
+
+    def to_scipy(self, fmt="csr"):
+        # scipy.sparse matrix of the same flows (scipy is optional)
+        from scipy import sparse
+
+        return sparse.coo_matrix((self.data, (self.row, self.col)), shape=self.shape).asformat(fmt)
+
+
+def exchange_flows(net, ids=None):
+    # net: kWh per node (positive = surplus). Returns (net_after, FlowMatrix).
+    net = np.asarray(net, dtype=float)
+    n = net.size
+    if ids is None:
+        ids = range(n)
+    givers = np.flatnonzero(net > 0)
+    receivers = np.flatnonzero(net < 0)
+    total_surplus = net[givers].sum()
+    total_deficit = -net[receivers].sum()
+    if total_surplus <= 0 or total_deficit <= 0:
+        return net.copy(), FlowMatrix(ids, [], [], [])
+
+    volume = min(total_surplus, total_deficit)
+    given = net[givers] * (volume / total_surplus)
+    received = -net[receivers] * (volume / total_deficit)
+
+    # Interval ends of each giver and receiver along [0, volume]; every
+    # breakpoint of either partition starts a new flow.
+    given_end = np.cumsum(given)
+    received_end = np.cumsum(received)
+    cuts = np.union1d(given_end[:-1], received_end[:-1])
+    cuts = cuts[cuts < volume]
+    starts = np.concatenate(([0.0], cuts))
+    amounts = np.diff(np.append(starts, volume))
+    source = np.minimum(np.searchsorted(given_end, starts, side="right"), givers.size - 1)
+    target = np.minimum(np.searchsorted(received_end, starts, side="right"), receivers.size - 1)
+    keep = amounts > 0
+
+    after = net.copy()
+    after[givers] -= given
+    after[receivers] += received
+    return after, FlowMatrix(ids, givers[source[keep]], receivers[target[keep]], amounts[keep])
+
+
+def simulate_energy_exchange_sparse(nodes):
+    # simulate_energy_exchange with the flows as a FlowMatrix indexed by node
+    # name (flows.to_dict() gives the {(from, to): kWh} view).
+    net = [round(node.get("generation_kwh", 0) - node.get("demand_kwh", 0), 3) for node in nodes]
+    after, flows = exchange_flows(net, [node["name"] for node in nodes])
+    for node, value in zip(nodes, after.tolist()):
+        node["net"] = round(value, 3)
+        node["surplus_kwh"] = round(max(0.0, node["net"]), 3)
+        node["deficit_kwh"] = round(max(0.0, -node["net"]), 3)
+    return nodes, flows
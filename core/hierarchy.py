@@ -0,0 +1,111 @@
+# hierarchy.py
+# Hierarchical redistribution, following how energy is metered: nodes first
+# balance inside their terraza, what is left is pooled per district, and only
+# district residuals meet at city level. Each pass shares pro rata inside its
+# group and moves min(surplus, deficit), so no energy is created or lost.
+# Districts are independent until the city pass, so they are sharded over a
+# process pool.
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+LEVELS = ("terraza", "district", "city")
+
+
+def _pool_pass(residual, groups, count, given, received):
+    # One level, in place: residual is (steps, nodes), groups (nodes,) codes
+    # < count. What each node gave and received is written to given/received.
+    # Step by step keeps the temporaries one row long.
+    for t in range(residual.shape[0]):
+        row = residual[t]
+        offered = np.maximum(row, 0.0)
+        wanted = np.maximum(-row, 0.0)
+        supply = np.bincount(groups, offered, count)
+        demand = np.bincount(groups, wanted, count)
+        moved = np.minimum(supply, demand)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            give_ratio = np.where(supply > 0, moved / supply, 0.0)
+            take_ratio = np.where(demand > 0, moved / demand, 0.0)
+        np.multiply(offered, give_ratio[groups], out=given[t])
+        np.multiply(wanted, take_ratio[groups], out=received[t])
+        row -= given[t]
+        row += received[t]
+
+
+def _balance_districts(residual, terraza_codes, district_codes):
+    # Terraza then district pass over a block of whole districts.
+    terrazas, terraza_codes = np.unique(terraza_codes, return_inverse=True)
+    districts, district_codes = np.unique(district_codes, return_inverse=True)
+    given = (np.empty_like(residual), np.empty_like(residual))
+    received = (np.empty_like(residual), np.empty_like(residual))
+    _pool_pass(residual, terraza_codes, len(terrazas), given[0], received[0])
+    _pool_pass(residual, district_codes, len(districts), given[1], received[1])
+    return residual, given, received
+
+
+def _shards(district_codes, workers):
+    # Whole districts per shard, largest first onto the least loaded shard.
+    sizes = np.bincount(district_codes)
+    loads = np.zeros(workers, dtype=np.int64)
+    owner = np.empty(sizes.size, dtype=np.int64)
+    for district in np.argsort(-sizes, kind="stable"):
+        owner[district] = np.argmin(loads)
+        loads[owner[district]] += sizes[district]
+    node_owner = owner[district_codes]
+    return [np.flatnonzero(node_owner == shard) for shard in range(workers) if loads[shard]]
+
+
+def hierarchical_exchange(surplus, terraza, district=None, workers=None):
+    # surplus: (nodes,) or (steps, nodes) kWh after the battery phase, negative
+    # = deficit (e.g. simulate_timesteps(..., record=("net_surplus",))).
+    # terraza/district: per-node labels; a terraza name is local to its
+    # district, and district=None puts every terraza in one district.
+    # Returns the unrounded surplus after the city pass and, per level in
+    # LEVELS, what each node gave and received: {"given": {level: array}, ...}.
+    surplus = np.asarray(surplus, dtype=float)
+    residual = np.atleast_2d(surplus)
+    n = residual.shape[1]
+    terraza = np.broadcast_to(np.asarray(terraza, dtype=object), (n,))
+    district = np.broadcast_to(np.asarray("" if district is None else district, dtype=object), (n,))
+    districts, district_codes = np.unique(district.astype(str), return_inverse=True)
+    terrazas, terraza_codes = np.unique(terraza.astype(str), return_inverse=True)
+    terraza_codes = district_codes.astype(np.int64) * len(terrazas) + terraza_codes
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(districts))
+
+    given, received = {}, {}
+    if workers <= 1:
+        residual, (given["terraza"], given["district"]), (received["terraza"], received["district"]) = (
+            _balance_districts(residual.copy(), terraza_codes, district_codes)
+        )
+    else:
+        residual = residual.copy()
+        for level in LEVELS[:2]:
+            given[level] = np.empty_like(residual)
+            received[level] = np.empty_like(residual)
+        shards = _shards(district_codes, workers)
+        with ProcessPoolExecutor(max_workers=len(shards)) as pool:
+            futures = [
+                (nodes, pool.submit(_balance_districts, residual[:, nodes], terraza_codes[nodes], district_codes[nodes]))
+                for nodes in shards
+            ]
+            for nodes, future in futures:
+                block, shard_given, shard_received = future.result()
+                residual[:, nodes] = block
+                given["terraza"][:, nodes], given["district"][:, nodes] = shard_given
+                received["terraza"][:, nodes], received["district"][:, nodes] = shard_received
+
+    given["city"] = np.empty_like(residual)
+    received["city"] = np.empty_like(residual)
+    _pool_pass(residual, np.zeros(n, dtype=np.int64), 1, given["city"], received["city"])
+
+    shape = surplus.shape
+    return {
+        "surplus": residual.reshape(shape),
+        "given": {level: values.reshape(shape) for level, values in given.items()},
+        "received": {level: values.reshape(shape) for level, values in received.items()},
+    }
@@ -0,0 +1,165 @@
+# incremental.py
+# Incremental distribute_energy for live dashboards where only a few nodes
+# change per tick. Each node's battery phase result and its contribution to the
+# surplus/deficit pools are kept; updating k nodes redoes k battery phases, and
+# allocations are derived from the pool totals when asked for. The totals are
+# running (prefix) sums in node order, the same sequential sums
+# distribute_energy takes, so results match a full recompute bit for bit. An
+# update only marks the prefix sums from its node on as stale; they are redone
+# (one np.cumsum over the stale tail) the next time the totals are needed.
+
+import numpy as np
+
+from core.batch import round_like_builtin
+from core.nodes import battery_phase, redistribution_phase
+
+
+def _refresh_prefix(prefix, values, start):
+    # prefix[start:] = running sum of values from start on, continuing from
+    # prefix[start - 1] as a sequential sum would
+    tail = values[start:].copy()
+    if start and tail.size:
+        tail[0] += prefix[start - 1]
+    np.cumsum(tail, out=prefix[start:])
+
+
+class IncrementalGrid:
+    def __init__(self, state, sunlight_hours):
+        # state: a NodeArrays. Its stored_energy is the battery level at the
+        # start of the tick; updates are applied against it until advance().
+        self.state = state
+        self.position = {node_id: i for i, node_id in enumerate(state.ids)}
+        self.start_energy = state.stored_energy.copy()
+        self.sunlight_hours = sunlight_hours
+        self.recompute()
+
+    def recompute(self):
+        # Full pass over every node (start of a tick or a sunlight change).
+        state = self.state
+        self.generated = self.sunlight_hours * 10
+        self.demand = state.base_energy * state.usage_factor
+        self.surplus, self.stored_energy = battery_phase(
+            np.full(len(state), self.generated, dtype=float), self.demand,
+            state.battery_capacity, self.start_energy,
+        )
+        self.offered = np.maximum(self.surplus, 0.0)
+        self.wanted = np.maximum(-self.surplus, 0.0)
+        self._offered_prefix = np.cumsum(self.offered)
+        self._wanted_prefix = np.cumsum(self.wanted)
+        self._stale_from = len(state)
+
+    def set_sunlight(self, sunlight_hours):
+        # Generation is the same for every node, so this is a full recompute.
+        self.sunlight_hours = sunlight_hours
+        self.recompute()
+
+    def update(self, node_id, base_energy=None, usage_factor=None, battery_capacity=None):
+        # O(1): one node's battery phase and its pool contribution.
+        i = self.position[node_id]
+        state = self.state
+        if base_energy is not None:
+            state.base_energy[i] = base_energy
+        if usage_factor is not None:
+            state.usage_factor[i] = usage_factor
+        if battery_capacity is not None:
+            state.battery_capacity[i] = battery_capacity
+
+        demand = float(state.base_energy[i]) * float(state.usage_factor[i])
+        net_energy = self.generated - demand
+        stored_energy = float(self.start_energy[i])
+        if net_energy > 0:
+            stored = min(net_energy, float(state.battery_capacity[i]) - stored_energy)
+            stored_energy += stored
+            surplus = net_energy - stored
+        else:
+            used = min(-net_energy, stored_energy)
+            stored_energy -= used
+            surplus = net_energy + used
+
+        self.demand[i] = demand
+        self.stored_energy[i] = stored_energy
+        self.surplus[i] = surplus
+        self.offered[i] = max(surplus, 0.0)
+        self.wanted[i] = max(-surplus, 0.0)
+        self._stale_from = min(self._stale_from, i)
+
+    def update_many(self, node_ids, base_energy=None, usage_factor=None, battery_capacity=None):
+        # k updates as one vectorised battery phase.
+        index = np.fromiter((self.position[node_id] for node_id in node_ids), dtype=np.int64)
+        state = self.state
+        if base_energy is not None:
+            state.base_energy[index] = base_energy
+        if usage_factor is not None:
+            state.usage_factor[index] = usage_factor
+        if battery_capacity is not None:
+            state.battery_capacity[index] = battery_capacity
+        index = np.unique(index)
+
+        demand = state.base_energy[index] * state.usage_factor[index]
+        surplus, stored_energy = battery_phase(
+            np.full(index.size, self.generated, dtype=float), demand,
+            state.battery_capacity[index], self.start_energy[index],
+        )
+        self.demand[index] = demand
+        self.stored_energy[index] = stored_energy
+        self.surplus[index] = surplus
+        self.offered[index] = np.maximum(surplus, 0.0)
+        self.wanted[index] = np.maximum(-surplus, 0.0)
+        if index.size:
+            self._stale_from = min(self._stale_from, int(index[0]))
+
+    def totals(self):
+        # (total_surplus, total_deficit) as distribute_energy sums them. Redoes
+        # the prefix sums from the first node updated since the last call.
+        n = len(self.state)
+        if n == 0:
+            return 0.0, 0.0
+        if self._stale_from < n:
+            _refresh_prefix(self._offered_prefix, self.offered, self._stale_from)
+            _refresh_prefix(self._wanted_prefix, self.wanted, self._stale_from)
+            self._stale_from = n
+        return float(self._offered_prefix[-1]), float(self._wanted_prefix[-1])
+
+    def allocation(self, node_id):
+        # One node's distribute_energy entry from the current pool totals
+        # (O(1) once they are up to date).
+        i = self.position[node_id]
+        total_surplus, total_deficit = self.totals()
+        surplus = float(self.surplus[i])
+        shared = round(surplus, 2)
+        if total_surplus > 0 and total_deficit > 0:
+            if surplus < 0:
+                shared += round((-surplus / total_deficit) * total_surplus, 2)
+            elif surplus > 0:
+                shared -= round((surplus / total_surplus) * total_deficit, 2)
+        return {
+            "umbrella": self.state.umbrellas[self.state.umbrella_codes[i]],
+            "role": self.state.roles[self.state.role_codes[i]],
+            "generated": round(self.generated, 2),
+            "demand": round(float(self.demand[i]), 2),
+            "surplus": shared,
+            "stored_energy": round(float(self.stored_energy[i]), 2),
+            "battery_capacity": float(self.state.battery_capacity[i]),
+            "energy": round(self.generated, 2),
+        }
+
+    def results(self):
+        # Every node at once, in the distribute_energy_arrays format.
+        generated = round_like_builtin(np.full(len(self.state), self.generated, dtype=float), 2)
+        return {
+            "generated": generated,
+            "demand": round_like_builtin(self.demand, 2),
+            "surplus": redistribution_phase(self.surplus, totals=self.totals()),
+            "stored_energy": round_like_builtin(self.stored_energy, 2),
+            "battery_capacity": self.state.battery_capacity,
+            "energy": generated,
+        }
+
+    def advance(self, sunlight_hours=None):
+        # Closes the tick: battery levels carry over into the state (as
+        # distribute_energy does) and the next tick starts from them.
+        self.state.stored_energy = self.stored_energy.copy()
+        self.start_energy = self.stored_energy.copy()
+        if sunlight_hours is not None:
+            self.sunlight_hours = sunlight_hours
+        self.recompute()
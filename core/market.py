@@ -0,0 +1,119 @@
+# market.py
+# Peer-to-peer double auction. Nodes with a deficit bid for energy, nodes with
+# a surplus ask, and each interval clears at one uniform price from a sorted
+# order book (O(n log n)). Prices are bounded by what the grid offers: nobody
+# pays more than the retail price (the city tariff) or sells for less than the
+# feed-in price. Whatever does not match goes to or comes from the grid.
+
+import numpy as np
+
+# Feed-in tariff as a share of the retail price when none is given
+FEED_IN_SHARE = 0.4
+
+
+def market_orders(surplus, demand=None, generation=None, retail_price=0.25, feed_in_price=None):
+    # Orders derived from each node's position after the battery phase. Any
+    # price between feed-in and retail beats the grid for both sides, so bids
+    # sit in the upper half of that band and asks in the lower half:
+    #   deficit d: bid for d kWh, rising to retail as d approaches the node's
+    #              whole demand (urgency)
+    #   surplus s: ask for s kWh, falling to feed-in as s approaches the node's
+    #              whole generation (eagerness)
+    # Urgent buyers are served first when supply is short, eager sellers first
+    # when it is plentiful. Without demand/generation the shares are taken as
+    # 1. Returns (bid_price, bid_kwh, ask_price, ask_kwh) per node.
+    surplus = np.asarray(surplus, dtype=float)
+    if feed_in_price is None:
+        feed_in_price = retail_price * FEED_IN_SHARE
+    half_spread = 0.5 * (retail_price - feed_in_price)
+    midpoint = feed_in_price + half_spread
+    deficit = np.maximum(-surplus, 0.0)
+    offer = np.maximum(surplus, 0.0)
+    urgency = eagerness = 1.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if demand is not None:
+            urgency = np.clip(np.nan_to_num(deficit / np.asarray(demand, dtype=float), nan=1.0), 0.0, 1.0)
+        if generation is not None:
+            eagerness = np.clip(np.nan_to_num(offer / np.asarray(generation, dtype=float), nan=1.0), 0.0, 1.0)
+    bid_price = np.broadcast_to(midpoint + half_spread * urgency, surplus.shape)
+    ask_price = np.broadcast_to(midpoint - half_spread * eagerness, surplus.shape)
+    return bid_price, deficit, ask_price, offer
+
+
+def _fill(price, quantity, marginal, traded, better):
+    # Orders strictly better than the marginal price fill completely; those at
+    # the marginal price share what is left pro rata.
+    filled = np.where(better, quantity, 0.0)
+    at_margin = price == marginal
+    level = quantity[at_margin].sum()
+    if level > 0:
+        filled[at_margin] = quantity[at_margin] * (max(traded - filled.sum(), 0.0) / level)
+    return filled
+
+
+def clear_market(bid_price, bid_kwh, ask_price, ask_kwh):
+    # Uniform-price clearing: the traded volume is the largest quantity at
+    # which the marginal bid still meets the marginal ask; the price is the
+    # midpoint of the two. Returns {"price", "volume", "bought", "sold"}, with
+    # per-order kWh aligned with the inputs (price is nan when nothing trades).
+    bid_kwh = np.asarray(bid_kwh, dtype=float)
+    ask_kwh = np.asarray(ask_kwh, dtype=float)
+    bids = np.flatnonzero(bid_kwh > 0)
+    asks = np.flatnonzero(ask_kwh > 0)
+    bought = np.zeros(bid_kwh.shape)
+    sold = np.zeros(ask_kwh.shape)
+    if bids.size == 0 or asks.size == 0:
+        return {"price": float("nan"), "volume": 0.0, "bought": bought, "sold": sold}
+
+    # Order book: bids by falling price, asks by rising price
+    bid_price = np.broadcast_to(np.asarray(bid_price, dtype=float), bid_kwh.shape)[bids]
+    ask_price = np.broadcast_to(np.asarray(ask_price, dtype=float), ask_kwh.shape)[asks]
+    bid_order = np.argsort(-bid_price)
+    ask_order = np.argsort(ask_price)
+    demand_curve = np.cumsum(bid_kwh[bids][bid_order])
+    supply_curve = np.cumsum(ask_kwh[asks][ask_order])
+    book_bids = bid_price[bid_order]
+    book_asks = ask_price[ask_order]
+
+    # The marginal ask is the last one whose cheaper asks leave part of it
+    # wanted by bids priced at or above it. That condition only flips once
+    # along the book, so bisection finds it without evaluating every ask.
+    def demand_at(j):
+        willing = np.searchsorted(-book_bids, -book_asks[j], side="right")
+        return demand_curve[willing - 1] if willing else 0.0
+
+    lo, hi = 0, asks.size
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if demand_at(mid) > supply_curve[mid] - ask_kwh[asks[ask_order[mid]]]:
+            lo = mid + 1
+        else:
+            hi = mid
+    if lo == 0:
+        return {"price": float("nan"), "volume": 0.0, "bought": bought, "sold": sold}
+    marginal_ask = lo - 1
+    volume = float(min(demand_at(marginal_ask), supply_curve[marginal_ask]))
+
+    marginal_bid = min(int(np.searchsorted(demand_curve, volume, side="left")), bids.size - 1)
+    ask_limit = book_asks[marginal_ask]
+    bid_limit = book_bids[marginal_bid]
+    bought[bids] = _fill(bid_price, bid_kwh[bids], bid_limit, volume, bid_price > bid_limit)
+    sold[asks] = _fill(ask_price, ask_kwh[asks], ask_limit, volume, ask_price < ask_limit)
+    return {"price": float(0.5 * (ask_limit + bid_limit)), "volume": volume, "bought": bought, "sold": sold}
+
+
+def market_exchange(surplus, demand=None, generation=None, retail_price=0.25, feed_in_price=None):
+    # One interval: orders from market_orders, cleared, and settled against the
+    # grid. Per node: kWh bought/sold on the market and from/to the grid, and
+    # the net cost in the tariff's currency (negative = income).
+    if feed_in_price is None:
+        feed_in_price = retail_price * FEED_IN_SHARE
+    bid_price, bid_kwh, ask_price, ask_kwh = market_orders(surplus, demand, generation, retail_price, feed_in_price)
+    cleared = clear_market(bid_price, bid_kwh, ask_price, ask_kwh)
+    price = cleared["price"] if cleared["volume"] > 0 else 0.0
+    grid_import = bid_kwh - cleared["bought"]
+    grid_export = ask_kwh - cleared["sold"]
+    cleared["grid_import"] = grid_import
+    cleared["grid_export"] = grid_export
+    cleared["cost"] = (cleared["bought"] - cleared["sold"]) * price + grid_import * retail_price - grid_export * feed_in_price
+    return cleared
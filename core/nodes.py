@@ -0,0 +1,165 @@
+# nodes.py
+# Columnar node state for large microgrids. NodeArrays keeps one contiguous
+# NumPy array per field instead of a list of dicts, and distribute_energy_arrays
+# runs both phases of core.microgrid.distribute_energy as array operations,
+# giving the same numbers (rounding and summation order included).
+
+import numpy as np
+
+from core.batch import round_like_builtin
+
+DEFAULT_UMBRELLA = "Type B"
+DEFAULT_ROLE = "Consumer"
+
+
+def _categorical(values):
+    # Labels -> (int32 codes, list of categories)
+    categories, codes = np.unique(np.asarray(values, dtype=object).astype(str), return_inverse=True)
+    return codes.astype(np.int32), categories.tolist()
+
+
+class NodeArrays:
+    def __init__(self, ids, base_energy, usage_factor, battery_capacity=0.0, stored_energy=0.0,
+                 role=DEFAULT_ROLE, umbrella=DEFAULT_UMBRELLA):
+        self.ids = list(ids)
+        n = len(self.ids)
+        self.base_energy = np.array(np.broadcast_to(np.asarray(base_energy, dtype=float), (n,)))
+        self.usage_factor = np.array(np.broadcast_to(np.asarray(usage_factor, dtype=float), (n,)))
+        self.battery_capacity = np.array(np.broadcast_to(np.asarray(battery_capacity, dtype=float), (n,)))
+        self.stored_energy = np.array(np.broadcast_to(np.asarray(stored_energy, dtype=float), (n,)))
+        self.role_codes, self.roles = _categorical(np.broadcast_to(np.asarray(role, dtype=object), (n,)))
+        self.umbrella_codes, self.umbrellas = _categorical(np.broadcast_to(np.asarray(umbrella, dtype=object), (n,)))
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_dicts(cls, nodes):
+        return cls(
+            [node["id"] for node in nodes],
+            [node["base_energy"] for node in nodes],
+            [node["usage_factor"] for node in nodes],
+            [node.get("battery_capacity", 0) for node in nodes],
+            [node.get("stored_energy", 0) for node in nodes],
+            [node.get("role", DEFAULT_ROLE) for node in nodes],
+            [node.get("umbrella", DEFAULT_UMBRELLA) for node in nodes],
+        )
+
+    def role(self):
+        return np.asarray(self.roles, dtype=object)[self.role_codes]
+
+    def umbrella(self):
+        return np.asarray(self.umbrellas, dtype=object)[self.umbrella_codes]
+
+    def to_dicts(self):
+        return [
+            {
+                "id": node_id,
+                "role": role,
+                "umbrella": umbrella,
+                "base_energy": float(base),
+                "usage_factor": float(usage),
+                "battery_capacity": float(capacity),
+                "stored_energy": float(stored),
+            }
+            for node_id, role, umbrella, base, usage, capacity, stored in zip(
+                self.ids, self.role(), self.umbrella(), self.base_energy, self.usage_factor,
+                self.battery_capacity, self.stored_energy,
+            )
+        ]
+
+
+def battery_phase(generated, demand, battery_capacity, stored_energy):
+    # Phase 1 of distribute_energy for every node at once. Returns the unrounded
+    # surplus (negative = deficit) and the new stored energy.
+    net_energy = generated - demand
+    charging = net_energy > 0
+    stored = np.minimum(net_energy, battery_capacity - stored_energy)
+    used = np.minimum(-net_energy, stored_energy)
+    new_stored = np.where(charging, stored_energy + stored, stored_energy - used)
+    surplus = np.where(charging, net_energy - stored, net_energy + used)
+    return surplus, new_stored
+
+
+def redistribution_phase(surplus, totals=None):
+    # Phase 2: pro-rata peer-to-peer sharing. Returns the rounded surplus after
+    # redistribution, following distribute_energy's rounding of each transfer.
+    # `surplus` is (nodes,) or (steps, nodes); each row is an independent pool.
+    # Works on full-length rows with zeros for non-participants (adding 0.0
+    # changes nothing) instead of gathering givers and takers. `totals` is an
+    # optional precomputed (total_surplus, total_deficit) for 1-D input.
+    offered = np.maximum(surplus, 0.0)
+    wanted = np.maximum(-surplus, 0.0)
+    if totals is not None:
+        total_surplus, total_deficit = (np.asarray([total], dtype=float) for total in totals)
+    else:
+        # Sequential (cumulative) sums reproduce Python's sum() bit for bit
+        total_surplus = np.cumsum(offered, axis=-1)[..., -1:]
+        total_deficit = np.cumsum(wanted, axis=-1)[..., -1:]
+    active = (total_surplus > 0) & (total_deficit > 0)
+
+    rounded = round_like_builtin(surplus, 2)
+    if active.any():
+        with np.errstate(divide="ignore", invalid="ignore"):
+            received = np.where(active, (wanted / total_deficit) * total_surplus, 0.0)
+            given = np.where(active, (offered / total_surplus) * total_deficit, 0.0)
+        rounded += round_like_builtin(received, 2)
+        rounded -= round_like_builtin(given, 2)
+    return rounded
+
+
+def distribute_step(base_energy, usage_factor, battery_capacity, stored_energy, sunlight_hours, network=None):
+    # Both phases over plain arrays without touching them. Returns the results
+    # dict and the new stored energy.
+    generated = np.full(len(base_energy), sunlight_hours * 10, dtype=float)
+    demand = base_energy * usage_factor
+    surplus, new_stored = battery_phase(generated, demand, battery_capacity, stored_energy)
+
+    if network is None:
+        shared = redistribution_phase(surplus)
+    else:
+        shared = round_like_builtin(network.exchange(surplus)["surplus"], 2)
+
+    generated_rounded = round_like_builtin(generated, 2)
+    results = {
+        "generated": generated_rounded,
+        "demand": round_like_builtin(demand, 2),
+        "surplus": shared,
+        "stored_energy": round_like_builtin(new_stored, 2),
+        "battery_capacity": battery_capacity,
+        "energy": generated_rounded,
+    }
+    return results, new_stored
+
+
+def distribute_energy_arrays(state, sunlight_hours, network=None):
+    # Same model as core.microgrid.distribute_energy over a NodeArrays state.
+    # Like the dict version, the new stored energy is written back into the
+    # state. Returns a dict of per-node arrays aligned with state.ids. With a
+    # core.network.GridNetwork (same ids), phase 2 routes surplus over its lines
+    # instead of sharing it pro rata.
+    results, state.stored_energy = distribute_step(
+        state.base_energy, state.usage_factor, state.battery_capacity, state.stored_energy, sunlight_hours, network,
+    )
+    return results
+
+
+def results_to_dicts(state, results):
+    # The {node_id: {...}} shape returned by distribute_energy, for callers and
+    # charts that still expect it.
+    roles = state.role()
+    umbrellas = state.umbrella()
+    columns = {key: values.tolist() for key, values in results.items()}
+    return {
+        node_id: {
+            "umbrella": umbrellas[i],
+            "role": roles[i],
+            "generated": columns["generated"][i],
+            "demand": columns["demand"][i],
+            "surplus": columns["surplus"][i],
+            "stored_energy": columns["stored_energy"][i],
+            "battery_capacity": columns["battery_capacity"][i],
+            "energy": columns["energy"][i],
+        }
+        for i, node_id in enumerate(state.ids)
+    }
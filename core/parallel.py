@@ -0,0 +1,139 @@
+# parallel.py
+# Process-parallel distribute_energy over shared memory. Node arrays live in a
+# multiprocessing.shared_memory block that every worker maps, so slices are
+# read and written in place and nothing but slice bounds and the two pool
+# totals crosses process boundaries. Each step runs in three parts:
+#   1. workers: battery phase for their slice, surplus/deficit contributions
+#   2. parent: pool totals as one sequential sum over the shared contributions
+#      (the same order as the serial path, hence bit-identical totals)
+#   3. workers: pro-rata shares for their slice from those totals
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from core.batch import round_like_builtin
+from core.nodes import battery_phase, redistribution_phase
+
+ROWS = (
+    "base_energy", "usage_factor", "battery_capacity", "stored_energy",
+    "surplus", "offered", "wanted", "demand", "stored_rounded", "shared",
+)
+_ROW = {name: i for i, name in enumerate(ROWS)}
+
+# Rows mapped by the current process (set per worker by _attach)
+_block = None
+_rows = None
+
+
+def _attach(name, n):
+    # Pool workers share the parent's resource tracker, so attaching does not
+    # make them owners; only the parent unlinks the block.
+    global _block, _rows
+    _block = shared_memory.SharedMemory(name=name)
+    _rows = np.ndarray((len(ROWS), n), dtype=np.float64, buffer=_block.buf)
+
+
+def _battery_slice(generated, start, stop):
+    rows = _rows
+    demand = rows[_ROW["base_energy"], start:stop] * rows[_ROW["usage_factor"], start:stop]
+    surplus, stored_energy = battery_phase(
+        np.full(stop - start, generated, dtype=float), demand,
+        rows[_ROW["battery_capacity"], start:stop], rows[_ROW["stored_energy"], start:stop],
+    )
+    rows[_ROW["stored_energy"], start:stop] = stored_energy
+    rows[_ROW["surplus"], start:stop] = surplus
+    np.maximum(surplus, 0.0, out=rows[_ROW["offered"], start:stop])
+    np.maximum(-surplus, 0.0, out=rows[_ROW["wanted"], start:stop])
+    rows[_ROW["demand"], start:stop] = round_like_builtin(demand, 2)
+    rows[_ROW["stored_rounded"], start:stop] = round_like_builtin(stored_energy, 2)
+
+
+def _share_slice(total_surplus, total_deficit, start, stop):
+    _rows[_ROW["shared"], start:stop] = redistribution_phase(
+        _rows[_ROW["surplus"], start:stop], totals=(total_surplus, total_deficit),
+    )
+
+
+class ParallelGrid:
+    # Holds the shared block and the worker pool across steps; use as a context
+    # manager (or call close()) so the block is released.
+    def __init__(self, state, workers=None):
+        self.state = state
+        n = len(state)
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self.workers = max(1, min(workers, n))
+        bounds = np.linspace(0, n, self.workers + 1).astype(np.int64).tolist()
+        self.slices = list(zip(bounds[:-1], bounds[1:]))
+
+        self._memory = shared_memory.SharedMemory(create=True, size=max(1, len(ROWS) * n * 8))
+        self.rows = np.ndarray((len(ROWS), n), dtype=np.float64, buffer=self._memory.buf)
+        for name in ("base_energy", "usage_factor", "battery_capacity", "stored_energy"):
+            self.rows[_ROW[name]] = getattr(state, name)
+
+        if self.workers > 1:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_attach, initargs=(self._memory.name, n),
+            )
+        else:
+            self._pool = None
+            _attach(self._memory.name, n)
+
+    def _map(self, function, *args):
+        if self._pool is None:
+            for start, stop in self.slices:
+                function(*args, start, stop)
+        else:
+            for future in [self._pool.submit(function, *args, start, stop) for start, stop in self.slices]:
+                future.result()
+
+    def step(self, sunlight_hours):
+        # One distribute_energy_arrays step; the new stored energy is written
+        # back into the state, and the results are copies owned by the caller.
+        generated = sunlight_hours * 10
+        self._map(_battery_slice, generated)
+        # Sequential (cumulative) sums, exactly as the serial path takes them
+        total_surplus = float(np.cumsum(self.rows[_ROW["offered"]])[-1]) if len(self.state) else 0.0
+        total_deficit = float(np.cumsum(self.rows[_ROW["wanted"]])[-1]) if len(self.state) else 0.0
+        self._map(_share_slice, total_surplus, total_deficit)
+
+        self.state.stored_energy = self.rows[_ROW["stored_energy"]].copy()
+        generated_rounded = round_like_builtin(np.full(len(self.state), generated, dtype=float), 2)
+        return {
+            "generated": generated_rounded,
+            "demand": self.rows[_ROW["demand"]].copy(),
+            "surplus": self.rows[_ROW["shared"]].copy(),
+            "stored_energy": self.rows[_ROW["stored_rounded"]].copy(),
+            "battery_capacity": self.state.battery_capacity,
+            "energy": generated_rounded,
+        }
+
+    def close(self):
+        global _block, _rows
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        elif _block is not None and _block.name == self._memory.name:
+            _rows = None
+            _block.close()
+            _block = None
+        if self._memory is not None:
+            del self.rows
+            self._memory.close()
+            self._memory.unlink()
+            self._memory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def distribute_energy_parallel(state, sunlight_hours, workers=None):
+    # One-off parallel distribute_energy_arrays(state, sunlight_hours).
+    with ParallelGrid(state, workers) as grid:
+        return grid.step(sunlight_hours)
@@ -0,0 +1,137 @@
+# scenario.py
+# Branchable what-if simulation state. A Scenario never changes the arrays it
+# was built from: every field is stored as fixed-size chunks, forks share all
+# chunks with their parent, and a branch copies a chunk only the first time it
+# writes to it (copy-on-write). step() returns the next state instead of
+# writing stored energy back. Hundreds of branches off one baseline therefore
+# hold only the chunks they actually changed.
+
+import numpy as np
+
+from core.nodes import NodeArrays, distribute_step
+
+FIELDS = ("base_energy", "usage_factor", "battery_capacity", "stored_energy")
+
+CHUNK_SIZE = 4096
+
+
+def _chunked(values):
+    return [values[start:start + CHUNK_SIZE] for start in range(0, len(values), CHUNK_SIZE)]
+
+
+class Scenario:
+    def __init__(self, nodes, fields=None, _position=None):
+        # nodes: NodeArrays (ids, roles and umbrellas are shared by every
+        # branch); fields defaults to a copy of its numeric fields.
+        self.nodes = nodes
+        if fields is None:
+            fields = {name: _chunked(np.array(getattr(nodes, name), dtype=float)) for name in FIELDS}
+        self._fields = fields
+        # Chunk lists and chunks this state may write in place
+        self._owned_lists = set()
+        self._owned_chunks = set()
+        if _position is None:
+            _position = {node_id: i for i, node_id in enumerate(nodes.ids)}
+        self._position = _position
+
+    @classmethod
+    def from_dicts(cls, nodes):
+        return cls(NodeArrays.from_dicts(nodes))
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def field(self, name):
+        # One of FIELDS as a contiguous read-only array
+        chunks = self._fields[name]
+        values = np.concatenate(chunks) if chunks else np.empty(0)
+        values.flags.writeable = False
+        return values
+
+    @property
+    def base_energy(self):
+        return self.field("base_energy")
+
+    @property
+    def usage_factor(self):
+        return self.field("usage_factor")
+
+    @property
+    def battery_capacity(self):
+        return self.field("battery_capacity")
+
+    @property
+    def stored_energy(self):
+        return self.field("stored_energy")
+
+    def _release(self):
+        # Everything this state owned is now shared with a new state
+        self._owned_lists.clear()
+        self._owned_chunks.clear()
+
+    def fork(self):
+        # O(1): the branch shares every chunk with this state. Neither side owns
+        # them any more, so whichever writes first makes its own copy.
+        self._release()
+        return Scenario(self.nodes, dict(self._fields), self._position)
+
+    def _index(self, node_ids):
+        if isinstance(node_ids, (list, tuple, np.ndarray)):
+            return np.fromiter((self._position[node_id] for node_id in node_ids), dtype=np.int64)
+        return np.array([self._position[node_ids]])
+
+    def set(self, node_ids, **values):
+        # Changes fields for one node id or a list of them, in this branch only.
+        # Returns self so edits chain: base.fork().set("Node_B", battery_capacity=30)
+        unknown = set(values) - set(FIELDS)
+        if unknown:
+            raise KeyError(f"unknown field(s): {', '.join(sorted(unknown))}; choose from {', '.join(FIELDS)}")
+        index = self._index(node_ids)
+        chunk_of = index // CHUNK_SIZE
+        for name, value in values.items():
+            value = np.broadcast_to(np.asarray(value, dtype=float), index.shape)
+            if name not in self._owned_lists:
+                self._fields[name] = list(self._fields[name])
+                self._owned_lists.add(name)
+            chunks = self._fields[name]
+            for chunk in np.unique(chunk_of).tolist():
+                if (name, chunk) not in self._owned_chunks:
+                    chunks[chunk] = chunks[chunk].copy()
+                    self._owned_chunks.add((name, chunk))
+                selected = chunk_of == chunk
+                chunks[chunk][index[selected] - chunk * CHUNK_SIZE] = value[selected]
+        return self
+
+    def shared_chunks(self, other, name):
+        # How many chunks of `name` both states still hold in common.
+        return sum(a is b for a, b in zip(self._fields[name], other._fields[name]))
+
+    def step(self, sunlight_hours, network=None):
+        # One distribute_energy step. Returns (next_state, results); this state
+        # is left as it was. The next state shares every field except
+        # stored_energy with this one.
+        results, stored_energy = distribute_step(
+            self.field("base_energy"), self.field("usage_factor"), self.field("battery_capacity"),
+            self.field("stored_energy"), sunlight_hours, network,
+        )
+        self._release()
+        following = Scenario(self.nodes, dict(self._fields, stored_energy=_chunked(stored_energy)), self._position)
+        following._owned_lists.add("stored_energy")
+        following._owned_chunks.update(("stored_energy", chunk) for chunk in range(len(following._fields["stored_energy"])))
+        return following, results
+
+    def run(self, sunlight_hours, network=None):
+        # Steps through a sequence of sunlight hours. Returns the final state and
+        # the per-step results.
+        state, history = self, []
+        for hours in sunlight_hours:
+            state, results = state.step(hours, network)
+            history.append(results)
+        return state, history
+
+    def to_node_arrays(self):
+        nodes = self.nodes
+        return NodeArrays(
+            nodes.ids, self.base_energy, self.usage_factor, self.battery_capacity, self.stored_energy,
+            nodes.role(), nodes.umbrella(),
+        )
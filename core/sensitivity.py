@@ -0,0 +1,183 @@
+# sensitivity.py
+# Global sensitivity analysis for the calculator and loan inputs: Morris
+# elementary effects (cheap screening) and Sobol first-order / total indices
+# (Saltelli sampling, Jansen estimator). Samples come from a scrambled Halton
+# sequence and the model is evaluated as one vectorized pass over all rows.
+
+import numpy as np
+
+from core.batch import (
+    calculate_cost_savings_batch, calculate_energy_output_batch, loan_annuity_payment_batch, unit_yield,
+)
+
+# (low, high) for every input, taken from the sidebar sliders of
+# energy_calculator.py and solar_evolution_simulator.py. Loan amount and the
+# revenue streams are unbounded number inputs there; the ranges below bracket
+# their defaults.
+PARAMETER_RANGES = {
+    "width": (2.0, 10.0),
+    "length": (2.0, 10.0),
+    "coverage_efficiency": (0.5, 1.0),
+    "panel_efficiency": (0.10, 0.25),
+    "solar_irradiance": (3.0, 7.0),
+    "system_losses": (0.6, 1.0),
+    "price_per_kwh": (0.05, 0.50),
+    "loan_amount": (1000.0, 20000.0),
+    "interest_rate": (0.0, 20.0),
+    "loan_term": (1.0, 30.0),
+    "rev_ev_charging": (0.0, 5000.0),
+    "rev_energy_sales": (0.0, 5000.0),
+}
+
+# Payback is infinite when the yearly cash flow is not positive; it is reported
+# as this many years so the variance stays finite.
+PAYBACK_CAP_YEARS = 100.0
+
+OUTPUTS = ("daily_energy_kwh", "annual_loan_payment", "annual_net_cash_flow", "payback_years")
+
+_PRIMES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41, 43, 47, 53, 59, 61, 67, 71,
+           73, 79, 83, 89, 97, 101, 103, 107, 109, 113, 127, 131, 137, 139, 149, 151)
+
+
+def evaluate_model(samples):
+    # samples: dict of equal-length arrays keyed by PARAMETER_RANGES names.
+    # Follows the energy and financial block of solar_evolution_simulator.main(),
+    # except that the daily irradiance is sampled rather than fixed at 5 kWh/m².
+    # Annual energy is the app's hourly annual_yield; hourly_irradiance keeps
+    # the daily mean, so it does not depend on the city.
+    daily = calculate_energy_output_batch(
+        samples["width"], samples["length"], samples["coverage_efficiency"],
+        samples["panel_efficiency"], samples["solar_irradiance"], samples["system_losses"],
+    )
+    unrounded_daily = (np.asarray(samples["width"], dtype=float) * samples["length"] * samples["coverage_efficiency"]
+                       * samples["panel_efficiency"] * samples["solar_irradiance"] * samples["system_losses"])
+    annual_energy = unrounded_daily * unit_yield()["annual"]
+    cost_savings = calculate_cost_savings_batch(annual_energy, samples["price_per_kwh"])
+    annuity = loan_annuity_payment_batch(samples["loan_amount"], samples["interest_rate"], samples["loan_term"])
+    annual_revenue = cost_savings + samples["rev_ev_charging"] + samples["rev_energy_sales"]
+    annual_expenses = annuity * 12
+    net_cash_flow = annual_revenue - annual_expenses
+    with np.errstate(divide="ignore"):
+        payback = np.where(net_cash_flow > 0, samples["loan_amount"] / net_cash_flow, np.inf)
+    return {
+        "daily_energy_kwh": daily,
+        "annual_loan_payment": annuity,
+        "annual_net_cash_flow": net_cash_flow,
+        "payback_years": np.minimum(payback, PAYBACK_CAP_YEARS),
+    }
+
+
+def halton(n, dims, seed=None):
+    # Scrambled Halton points in [0, 1)^dims: each digit position gets its own
+    # random permutation, and points are jittered inside their finest cell.
+    if dims > len(_PRIMES):
+        raise ValueError(f"at most {len(_PRIMES)} dimensions are supported")
+    rng = np.random.default_rng(seed)
+    index = np.arange(1, n + 1, dtype=np.int64)
+    points = np.empty((n, dims))
+    for j, base in enumerate(_PRIMES[:dims]):
+        digits = int(np.ceil(np.log(n + 1) / np.log(base))) + 1
+        remaining = index.copy()
+        value = np.zeros(n)
+        scale = 1.0
+        for _ in range(digits):
+            scale /= base
+            remaining, digit = np.divmod(remaining, base)
+            value += rng.permutation(base)[digit] * scale
+        points[:, j] = value + rng.random(n) * scale
+    return points
+
+
+def _resolve(parameters, fixed):
+    # Returns the varied names with their ranges and the constant inputs.
+    if parameters is None:
+        parameters = PARAMETER_RANGES
+    elif not isinstance(parameters, dict):
+        parameters = {name: PARAMETER_RANGES[name] for name in parameters}
+    unknown = (set(parameters) | set(fixed or {})) - set(PARAMETER_RANGES)
+    if unknown:
+        raise KeyError(f"unknown parameter(s): {', '.join(sorted(unknown))}")
+    names = list(parameters)
+    bounds = np.array([parameters[name] for name in names], dtype=float)
+    constants = {
+        name: (fixed or {}).get(name, 0.5 * (low + high))
+        for name, (low, high) in PARAMETER_RANGES.items() if name not in parameters
+    }
+    return names, bounds, constants
+
+
+def _evaluate(unit_points, names, bounds, constants):
+    scaled = bounds[:, 0] + unit_points * (bounds[:, 1] - bounds[:, 0])
+    samples = {name: scaled[..., i] for i, name in enumerate(names)}
+    samples.update(constants)
+    return evaluate_model(samples)
+
+
+def _ranked(table, sort_by):
+    import pandas as pd
+    return pd.DataFrame(table).sort_values(sort_by, ascending=False).reset_index(drop=True)
+
+
+def sobol_indices(n=2 ** 14, parameters=None, fixed=None, seed=None):
+    # Saltelli design: n base rows, n * (d + 2) model evaluations. Returns
+    # {output: DataFrame[parameter, S1, ST]} ranked by total index. Inputs not in
+    # `parameters` are held at `fixed` values (or mid-range).
+    names, bounds, constants = _resolve(parameters, fixed)
+    d = len(names)
+    points = halton(n, 2 * d, seed)
+    a, b = points[:, :d], points[:, d:]
+    # Row blocks: A, B, then AB_i (A with column i taken from B) for each i
+    stacked = np.repeat(a[None], d + 2, axis=0)
+    stacked[1] = b
+    for i in range(d):
+        stacked[i + 2, :, i] = b[:, i]
+    outputs = _evaluate(stacked, names, bounds, constants)
+
+    tables = {}
+    for output, values in outputs.items():
+        values = np.broadcast_to(values, stacked.shape[:2])
+        f_a, f_b, f_ab = values[0], values[1], values[2:]
+        variance = np.var(np.concatenate([f_a, f_b]))
+        if variance == 0:
+            first = total = np.zeros(d)
+        else:
+            first = np.mean(f_b * (f_ab - f_a), axis=1) / variance
+            total = 0.5 * np.mean((f_a - f_ab) ** 2, axis=1) / variance
+        tables[output] = _ranked({"parameter": names, "S1": first, "ST": total}, "ST")
+    return tables
+
+
+def morris_effects(trajectories=1000, levels=4, parameters=None, fixed=None, seed=None):
+    # Morris screening with random one-at-a-time trajectories on a `levels` grid.
+    # Returns {output: DataFrame[parameter, mu_star, mu, sigma]} ranked by mu_star
+    # (effects are per unit of the normalised 0-1 range).
+    names, bounds, constants = _resolve(parameters, fixed)
+    d = len(names)
+    rng = np.random.default_rng(seed)
+    delta = levels / (2.0 * (levels - 1))
+
+    # Start points on the grid such that x ± delta stays inside [0, 1]
+    direction = rng.choice([-1.0, 1.0], size=(trajectories, d))
+    start_levels = rng.integers(0, levels // 2, size=(trajectories, d)) / (levels - 1)
+    start = np.where(direction > 0, start_levels, start_levels + delta)
+    order = np.argsort(rng.random((trajectories, d)), axis=1)
+
+    steps = np.zeros((trajectories, d + 1, d))
+    rows = np.arange(trajectories)[:, None]
+    steps[rows, np.arange(1, d + 1)[None, :], order] = np.take_along_axis(direction, order, axis=1) * delta
+    points = start[:, None, :] + np.cumsum(steps, axis=1)
+    outputs = _evaluate(points, names, bounds, constants)
+
+    tables = {}
+    for output, values in outputs.items():
+        values = np.broadcast_to(values, points.shape[:2])
+        effects = np.empty((trajectories, d))
+        changes = np.diff(values, axis=1) / (np.take_along_axis(direction, order, axis=1) * delta)
+        effects[rows, order] = changes
+        tables[output] = _ranked({
+            "parameter": names,
+            "mu_star": np.abs(effects).mean(axis=0),
+            "mu": effects.mean(axis=0),
+            "sigma": effects.std(axis=0, ddof=1) if trajectories > 1 else np.zeros(d),
+        }, "mu_star")
+    return tables
@@ -0,0 +1,190 @@
+# shading.py
+# Umbrella-on-umbrella shading for terraza layouts. Canopies are flat,
+# axis-aligned squares (centre x, y and side width in metres, at a height),
+# and a taller canopy j shades a lower canopy i where i's points, looking
+# towards the sun, pass under j. On i's plane j's shadow is j's square moved
+# away from the sun by (h_j - h_i) / tan(elevation), still axis-aligned.
+#
+# Each canopy is sampled on a RASTER x RASTER grid held as the bits of one
+# uint64, so one shadow is a row mask AND a column mask from small tables,
+# the shadows of all occluders are OR-ed together, and the shade fraction is
+# the bit count / RASTER². A uniform grid index, with cells as wide as the
+# longest shadow followed, pairs each canopy only with the neighbours that
+# can reach it.
+
+import json
+
+import numpy as np
+
+from core.solar import city_clear_sky
+
+RASTER = 8                # samples per canopy side (RASTER² bits <= 64)
+MIN_ELEVATION = 5.0       # degrees; shadows of a lower sun are not followed
+DEFAULT_HEIGHT = 2.5      # m
+DEFAULT_WIDTH = 4.0       # m
+BLOCK_STEPS = 256
+
+
+def load_layout(path):
+    # {"x", "y", "height", "width"} arrays (and "ids") from a layout file's
+    # "nodes"; height and width default per canopy.
+    with open(path) as f:
+        nodes = json.load(f)["nodes"]
+    missing = [node.get("id", i) for i, node in enumerate(nodes) if "x" not in node or "y" not in node]
+    if missing:
+        raise ValueError(f"layout nodes without x/y position: {', '.join(map(str, missing))}")
+    return {
+        "ids": [node.get("id", f"node_{i + 1}") for i, node in enumerate(nodes)],
+        "x": np.array([node["x"] for node in nodes], dtype=float),
+        "y": np.array([node["y"] for node in nodes], dtype=float),
+        "height": np.array([node.get("height", DEFAULT_HEIGHT) for node in nodes], dtype=float),
+        "width": np.array([node.get("width", DEFAULT_WIDTH) for node in nodes], dtype=float),
+    }
+
+
+def neighbour_pairs(x, y, height, width, min_elevation=MIN_ELEVATION):
+    # (receiver, occluder) index pairs where the occluder is taller and close
+    # enough for its shadow to reach the receiver with the sun at or above
+    # min_elevation, sorted by receiver. Uses a uniform grid: candidates come
+    # only from the 3 x 3 cells around each canopy.
+    x, y, height, width = (np.asarray(v, dtype=float) for v in np.broadcast_arrays(x, y, height, width))
+    n = x.size
+    empty = np.zeros(0, dtype=np.int64)
+    if n < 2 or np.ptp(height) == 0:
+        return empty, empty
+    reach = np.ptp(height) / np.tan(np.radians(min_elevation)) + width.max()
+    cell_x = np.floor((x - x.min()) / reach).astype(np.int64)
+    cell_y = np.floor((y - y.min()) / reach).astype(np.int64)
+    columns = cell_y.max() + 3
+    key = (cell_x + 1) * columns + (cell_y + 1)
+    order = np.argsort(key, kind="stable")
+    sorted_key = key[order]
+
+    receivers, occluders = [], []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            wanted = key + dx * columns + dy
+            start = np.searchsorted(sorted_key, wanted, side="left")
+            stop = np.searchsorted(sorted_key, wanted, side="right")
+            counts = stop - start
+            receiver = np.repeat(np.arange(n), counts)
+            offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            receivers.append(receiver)
+            occluders.append(order[np.repeat(start, counts) + offset])
+    receiver = np.concatenate(receivers)
+    occluder = np.concatenate(occluders)
+
+    # Keep taller occluders whose square, moved by the longest shadow, can
+    # still overlap the receiver
+    rise = height[occluder] - height[receiver]
+    limit = rise / np.tan(np.radians(min_elevation)) + 0.5 * (width[receiver] + width[occluder])
+    keep = ((rise > 0) & (np.abs(x[occluder] - x[receiver]) < limit)
+            & (np.abs(y[occluder] - y[receiver]) < limit))
+    receiver, occluder = receiver[keep], occluder[keep]
+    order = np.argsort(receiver, kind="stable")
+    return receiver[order], occluder[order]
+
+
+def _mask_tables():
+    # rows[a, b]: bits of raster rows a..b-1; columns[a, b]: bits of
+    # columns a..b-1 in every row. Bit r * RASTER + c is sample (r, c).
+    span = np.zeros((RASTER + 1, RASTER + 1), dtype=np.uint64)
+    for a in range(RASTER + 1):
+        for b in range(a + 1, RASTER + 1):
+            span[a, b] = sum(1 << k for k in range(a, b))
+    every_row = sum(1 << (r * RASTER) for r in range(RASTER))
+    full_row = (1 << RASTER) - 1
+    rows = np.zeros_like(span)
+    columns = np.zeros_like(span)
+    for a in range(RASTER + 1):
+        for b in range(a + 1, RASTER + 1):
+            rows[a, b] = sum(full_row << (r * RASTER) for r in range(a, b))
+            columns[a, b] = int(span[a, b]) * every_row
+    return rows, columns
+
+
+_ROWS, _COLUMNS = _mask_tables()
+_BYTE_BITS = np.array([bin(b).count("1") for b in range(256)], dtype=np.uint8)
+
+
+def _popcount(masks):
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(masks)
+    return _BYTE_BITS[masks[..., None].view(np.uint8)].sum(axis=-1)
+
+
+def _sample_bounds(gap, half_width, receiver_width):
+    # Per pair, the shadow's edges with no sun offset in receiver samples:
+    # samples ceil(low) .. ceil(high) - 1 lie inside it. Also returns
+    # samples per metre.
+    cell = receiver_width / RASTER
+    low = (gap - half_width + 0.5 * receiver_width) / cell - 0.5
+    high = (gap + half_width + 0.5 * receiver_width) / cell - 0.5
+    return low, high, 1.0 / cell
+
+
+def _masks(table, low, high, shift):
+    # Table masks of samples [ceil(low - shift), ceil(high - shift)), clipped
+    # to the raster; shift is (P, S) in samples.
+    start = np.subtract(low, shift)
+    stop = np.subtract(high, shift, out=shift)
+    for edge in (start, stop):
+        np.ceil(edge, out=edge)
+        np.clip(edge, 0, RASTER, out=edge)
+    start *= RASTER + 1
+    start += stop
+    return np.take(table, start.astype(np.intp))
+
+
+def shade_fractions(layout, elevation, azimuth, min_elevation=MIN_ELEVATION, pairs=None):
+    # Share of each canopy in shade at each step: (N, T) float32 for (T,)
+    # sun elevation/azimuth in degrees. Steps with the sun below
+    # min_elevation are left unshaded (their beam is weak and their shadows
+    # run past the pairs found). layout: as from load_layout.
+    x, y, height, width = (np.asarray(layout[k], dtype=float) for k in ("x", "y", "height", "width"))
+    elevation = np.asarray(elevation, dtype=float)
+    azimuth = np.asarray(azimuth, dtype=float)
+    shade = np.zeros((x.size, elevation.size), dtype=np.float32)
+    receiver, occluder = pairs if pairs is not None else neighbour_pairs(x, y, height, width, min_elevation)
+    if receiver.size == 0:
+        return shade
+
+    # Shadow edges relative to the receiver in its samples; the sun moves
+    # them by rise / tan(elevation) metres away from it.
+    targets, starts = np.unique(receiver, return_index=True)
+    half = 0.5 * width[occluder]
+    receiver_width = width[receiver]
+    low_x, high_x, per_metre = _sample_bounds(x[occluder] - x[receiver], half, receiver_width)
+    low_y, high_y, _ = _sample_bounds(y[occluder] - y[receiver], half, receiver_width)
+    rise = ((height[occluder] - height[receiver]) * per_metre)[:, None]
+    low_x, high_x, low_y, high_y = (v[:, None] for v in (low_x, high_x, low_y, high_y))
+    columns, rows = _COLUMNS.ravel(), _ROWS.ravel()
+
+    lit = np.flatnonzero(elevation >= min_elevation)
+    for block in range(0, lit.size, BLOCK_STEPS):
+        steps = lit[block:block + BLOCK_STEPS]
+        reach = 1.0 / np.tan(np.radians(elevation[steps]))
+        sun_x = reach * np.sin(np.radians(azimuth[steps]))
+        sun_y = reach * np.cos(np.radians(azimuth[steps]))
+        masks = _masks(columns, low_x, high_x, rise * sun_x)
+        masks &= _masks(rows, low_y, high_y, rise * sun_y)
+        covered = np.bitwise_or.reduceat(masks, starts, axis=0)
+        shade[targets[:, None], steps] = _popcount(covered) / RASTER ** 2
+    return shade
+
+
+def city_shading(layout, city, step_minutes=60, year=None, min_elevation=MIN_ELEVATION):
+    # Shade over a named city's year: {"shade": (N, T) fractions, and per
+    # canopy the share of the year's direct horizontal irradiation
+    # ("beam_loss") and of its global horizontal irradiation
+    # ("irradiation_loss") lost to the neighbours}.
+    sky = city_clear_sky(city, step_minutes, year)
+    shade = shade_fractions(layout, sky["elevation"], sky["azimuth"], min_elevation)
+    beam = sky["dni"] * np.maximum(np.sin(np.radians(sky["elevation"])), 0.0)
+    lost = shade @ beam
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            "shade": shade,
+            "beam_loss": np.nan_to_num(lost / beam.sum()),
+            "irradiation_loss": np.nan_to_num(lost / sky["ghi"].sum()),
+        }
@@ -0,0 +1,154 @@
+# sizing.py
+# Inverse sizing: finds the cheapest umbrella type / unit count / battery size
+# combinations that meet a daily energy target, a days-of-autonomy requirement
+# and a CO₂ target. Candidates are explored best-first from a heap keyed by a
+# cost lower bound (units plus the least storage autonomy can accept), so only
+# the few configurations that can still beat the current best are evaluated.
+
+import heapq
+from math import ceil
+
+from core.battery import calculate_battery_backup
+from core.calculator import calculate_co2_savings, calculate_energy_output
+
+DEFAULT_BATTERY_SIZES = tuple(float(kwh) for kwh in range(0, 51))
+
+
+def options_from_capacity(umbrella_types, peak_sun_hours=5.0, derate=1.0, unit_costs=None):
+    # Catalog in the app.py format: {"name": {"capacity_kw", "cost"}}. derate is
+    # the product of the season, weather and temperature factors.
+    unit_costs = unit_costs or {}
+    return [
+        {
+            "umbrella": name,
+            "daily_kwh": spec["capacity_kw"] * peak_sun_hours * derate,
+            "unit_cost": unit_costs.get(name, spec.get("cost")),
+            "builtin_battery": spec.get("battery", 0),
+        }
+        for name, spec in umbrella_types.items()
+    ]
+
+
+def options_from_area(umbrella_types, solar_irradiance=5.0, system_losses=0.85, unit_costs=None):
+    # Catalog in the simulator/config.py format: {"name": {"area", "efficiency",
+    # "battery", "cost"}}; unit_costs overrides the per-type "cost" entry.
+    unit_costs = unit_costs or {}
+    return [
+        {
+            "umbrella": name,
+            "daily_kwh": calculate_energy_output(spec["area"], 1, 1, spec["efficiency"], solar_irradiance, system_losses),
+            "unit_cost": unit_costs.get(name, spec.get("cost")),
+            "builtin_battery": spec.get("battery", 0),
+        }
+        for name, spec in umbrella_types.items()
+    ]
+
+
+def _meets_output(option, num_units, target_kwh, co2_factor, co2_target_kg):
+    total_output = round(option["daily_kwh"] * num_units, 2)
+    return total_output >= target_kwh and calculate_co2_savings(total_output, co2_factor) >= co2_target_kg
+
+
+def _first_unit_count(option, target_kwh, co2_factor, co2_target_kg, max_units):
+    # Closed-form estimate, then a short walk to absorb rounding.
+    daily_kwh = option["daily_kwh"]
+    if daily_kwh <= 0:
+        return None
+    needed = target_kwh
+    if co2_target_kg > 0:
+        if co2_factor <= 0:
+            return None
+        needed = max(needed, co2_target_kg / co2_factor)
+    num_units = max(1, ceil(needed / daily_kwh) - 1)
+    while num_units <= max_units and not _meets_output(option, num_units, target_kwh, co2_factor, co2_target_kg):
+        num_units += 1
+    return num_units if num_units <= max_units else None
+
+
+def _smallest_battery(option, num_units, battery_sizes, battery_efficiency, days_autonomy):
+    # Index of the smallest add-on battery that meets the autonomy requirement;
+    # backup days grow with capacity, so bisection applies.
+    total_output = round(option["daily_kwh"] * num_units, 2)
+    builtin = option["builtin_battery"] * num_units
+
+    def meets(i):
+        return calculate_battery_backup(total_output, battery_sizes[i] + builtin, battery_efficiency, days_autonomy)[2]
+
+    lo, hi = 0, len(battery_sizes)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if meets(mid):
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo if lo < len(battery_sizes) else None
+
+
+def _cost_bound(option, num_units, battery_efficiency, days_autonomy, battery_cost_per_kwh):
+    # Lower bound on the cost of `num_units` of this type: the add-on battery must
+    # hold at least (days - rounding slack) of daily output once the built-in
+    # storage is counted.
+    total_output = round(option["daily_kwh"] * num_units, 2)
+    required = (days_autonomy - 0.005) * total_output / battery_efficiency if battery_efficiency else 0.0
+    battery_floor = max(0.0, required - option["builtin_battery"] * num_units) * (1 - 1e-9)
+    return num_units * option["unit_cost"] + battery_floor * battery_cost_per_kwh
+
+
+def cheapest_configurations(options, target_kwh, days_autonomy=0, co2_target_kg=0.0, co2_factor=0.0,
+                            battery_efficiency=0.9, battery_cost_per_kwh=0.0,
+                            battery_sizes=DEFAULT_BATTERY_SIZES, max_units=100, top=5):
+    # Returns up to `top` feasible configurations ordered by total cost. Each
+    # (umbrella, num_units) pair appears once, with the smallest battery that works.
+    battery_sizes = sorted(float(b) for b in battery_sizes)
+    heap = []
+    counter = 0  # tie-breaker so dicts are never compared
+
+    for option in options:
+        if option["unit_cost"] is None:
+            raise ValueError(f"no unit cost for umbrella type '{option['umbrella']}'")
+        num_units = _first_unit_count(option, target_kwh, co2_factor, co2_target_kg, max_units)
+        if num_units is not None:
+            bound = _cost_bound(option, num_units, battery_efficiency, days_autonomy, battery_cost_per_kwh)
+            heapq.heappush(heap, (bound, counter, option, num_units, None))
+            counter += 1
+
+    results = []
+    while heap and len(results) < top:
+        cost, _, option, num_units, battery_index = heapq.heappop(heap)
+
+        if battery_index is None:
+            # Bound node: price the cheapest battery for this unit count, and open
+            # the next unit count with its own lower bound.
+            battery_index = _smallest_battery(option, num_units, battery_sizes, battery_efficiency, days_autonomy)
+            if battery_index is not None:
+                exact = num_units * option["unit_cost"] + battery_sizes[battery_index] * battery_cost_per_kwh
+                heapq.heappush(heap, (exact, counter, option, num_units, battery_index))
+                counter += 1
+            storage_grows = days_autonomy * option["daily_kwh"] > option["builtin_battery"] * battery_efficiency
+            if battery_index is None and storage_grows:
+                # Even the largest battery is too small, and every extra unit
+                # needs more storage than it brings: prune the rest of this type.
+                continue
+            if num_units < max_units:
+                bound = _cost_bound(option, num_units + 1, battery_efficiency, days_autonomy, battery_cost_per_kwh)
+                heapq.heappush(heap, (bound, counter, option, num_units + 1, None))
+                counter += 1
+            continue
+
+        total_output = round(option["daily_kwh"] * num_units, 2)
+        battery_capacity = battery_sizes[battery_index]
+        usable_capacity, backup_days, _ = calculate_battery_backup(
+            total_output, battery_capacity + option["builtin_battery"] * num_units, battery_efficiency, days_autonomy
+        )
+        results.append({
+            "umbrella": option["umbrella"],
+            "num_units": num_units,
+            "battery_capacity": battery_capacity,
+            "total_output": total_output,
+            "usable_capacity": usable_capacity,
+            "backup_days": backup_days,
+            "daily_co2": calculate_co2_savings(total_output, co2_factor),
+            "cost": round(cost, 2),
+        })
+
+    return results
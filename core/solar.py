@@ -0,0 +1,163 @@
+# solar.py
+# Sun position and clear-sky irradiance for any latitude/longitude over a
+# whole year, at hourly or finer steps. Vectorised over locations x time
+# steps: the date terms (declination, equation of time, sun-earth distance)
+# are shared by every location and only the hour angle and the trigonometry
+# are per location.
+#   position   NOAA low-precision formulas (Spencer's Fourier series)
+#   clear sky  Meinel beam model, DNI = I0 * 0.7 ** (AM ** 0.678) with the
+#              Kasten-Young air mass, diffuse taken as 10% of the beam
+# City coordinates come from core.cities; per-city results are cached in
+# memory and, as .npz files, on disk.
+
+import hashlib
+import os
+from calendar import isleap
+
+import numpy as np
+
+from core.annual import DAYS_PER_MONTH
+from core.cities import open_store
+
+SOLAR_CONSTANT = 1361.0  # W/m² at 1 AU
+DIFFUSE_SHARE = 0.1      # clear-sky diffuse horizontal / direct normal
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "solar_cache")
+
+_memory_cache = {}
+
+
+def city_location(city):
+    # (latitude, longitude, standard-time UTC offset in hours) from the city
+    # dataset
+    location = open_store().get(city, ("latitude", "longitude", "utc_offset"))
+    if not np.all(np.isfinite(list(location.values()))):
+        raise KeyError(f"no coordinates for city '{city}'")
+    return location["latitude"], location["longitude"], location["utc_offset"]
+
+
+def time_steps(step_minutes=60, year=None):
+    # Day of year (1-based) and local standard clock hour at the middle of
+    # every step of the year.
+    days = 366 if year is not None and isleap(year) else 365
+    per_day = 24 * 60 // step_minutes
+    if per_day * step_minutes != 24 * 60:
+        raise ValueError(f"step_minutes must divide a day evenly, got {step_minutes}")
+    step = np.arange(days * per_day)
+    day = step // per_day + 1
+    hour = (step % per_day + 0.5) * step_minutes / 60
+    return day, hour
+
+
+def _sun(latitude, longitude, utc_offset, step_minutes, year):
+    # sin(elevation), elevation and azimuth as (L, T) arrays
+    day, hour = time_steps(step_minutes, year)
+    days = 366 if year is not None and isleap(year) else 365
+    gamma = 2 * np.pi / days * (day - 1 + (hour - 12) / 24)
+    declination = (0.006918 - 0.399912 * np.cos(gamma) + 0.070257 * np.sin(gamma)
+                   - 0.006758 * np.cos(2 * gamma) + 0.000907 * np.sin(2 * gamma)
+                   - 0.002697 * np.cos(3 * gamma) + 0.00148 * np.sin(3 * gamma))
+    equation_of_time = 229.18 * (0.000075 + 0.001868 * np.cos(gamma) - 0.032077 * np.sin(gamma)
+                                 - 0.014615 * np.cos(2 * gamma) - 0.040849 * np.sin(2 * gamma))
+
+    latitude = np.radians(np.atleast_1d(np.asarray(latitude, dtype=float)))[:, None]
+    longitude = np.atleast_1d(np.asarray(longitude, dtype=float))[:, None]
+    utc_offset = np.atleast_1d(np.asarray(utc_offset, dtype=float))[:, None]
+
+    # Hour angle from true solar time, (hour * 60 + eot + 4 * lon - 60 * utc) / 4 - 180
+    # degrees. It splits into a time part and a location part, so its sine
+    # and cosine come from angle addition without any (L, T) trigonometry.
+    time_angle = np.radians(hour * 15 + equation_of_time / 4 - 180)
+    place_angle = np.radians(longitude - 15 * utc_offset)
+    cos_time, sin_time = np.cos(time_angle), np.sin(time_angle)
+    cos_place, sin_place = np.cos(place_angle), np.sin(place_angle)
+    cos_hour = cos_time * cos_place - sin_time * sin_place
+    sin_hour = sin_time * cos_place + cos_time * sin_place
+
+    sin_lat, cos_lat = np.sin(latitude), np.cos(latitude)
+    sin_dec, cos_dec = np.sin(declination), np.cos(declination)
+    sin_elevation = np.clip(sin_lat * sin_dec + cos_lat * (cos_dec * cos_hour), -1.0, 1.0)
+    elevation = np.degrees(np.arcsin(sin_elevation))
+    azimuth = np.degrees(np.arctan2(sin_hour, cos_hour * sin_lat - (sin_dec / cos_dec) * cos_lat)) + 180
+    return sin_elevation, elevation, azimuth
+
+
+def _is_scalar(*values):
+    return all(np.ndim(value) == 0 for value in values)
+
+
+def solar_position(latitude, longitude, utc_offset=0.0, step_minutes=60, year=None):
+    # Sun elevation and azimuth (degrees, azimuth clockwise from north) for
+    # every step of the year. Scalars give (T,) arrays; arrays of L locations
+    # give (L, T).
+    _, elevation, azimuth = _sun(latitude, longitude, utc_offset, step_minutes, year)
+    if _is_scalar(latitude, longitude, utc_offset):
+        return elevation[0], azimuth[0]
+    return elevation, azimuth
+
+
+def clear_sky(latitude, longitude, utc_offset=0.0, step_minutes=60, year=None):
+    # Clear-sky irradiance (W/m²) and sun position for every step of the
+    # year: {"ghi", "dni", "dhi", "elevation", "azimuth"}, shaped as in
+    # solar_position.
+    cos_zenith, elevation, azimuth = _sun(latitude, longitude, utc_offset, step_minutes, year)
+    day, _ = time_steps(step_minutes, year)
+    extraterrestrial = SOLAR_CONSTANT * (1 + 0.033 * np.cos(2 * np.pi * day / 365))
+    up = elevation > 0
+    zenith = 90.0 - np.where(up, elevation, 90.0)
+    air_mass = 1.0 / (np.where(up, cos_zenith, 1.0) + 0.50572 * (96.07995 - zenith) ** -1.6364)
+    dni = np.where(up, extraterrestrial * 0.7 ** (air_mass ** 0.678), 0.0)
+    dhi = DIFFUSE_SHARE * dni
+    ghi = dni * np.maximum(cos_zenith, 0.0) + dhi
+    result = {"ghi": ghi, "dni": dni, "dhi": dhi, "elevation": elevation, "azimuth": azimuth}
+    if _is_scalar(latitude, longitude, utc_offset):
+        return {name: values[0] for name, values in result.items()}
+    return result
+
+
+def city_clear_sky(city, step_minutes=60, year=None, cache_dir=CACHE_DIR):
+    # clear_sky for a named city, from memory, then disk, then computed (and
+    # written to disk). cache_dir=None keeps it in memory only. Both caches
+    # are keyed by the coordinates as well as the name, so editing a city in
+    # the dataset never serves its old sky.
+    location = city_location(city)
+    key = (open_store().canonical(city), location, step_minutes, year)
+    if key in _memory_cache:
+        return _memory_cache[key]
+    path = None
+    if cache_dir is not None:
+        digest = hashlib.sha1(repr(location).encode()).hexdigest()[:10]
+        path = os.path.join(cache_dir, f"{key[0]}_{digest}_{step_minutes}min_{year or 'typical'}.npz")
+    if path is not None and os.path.exists(path):
+        with np.load(path) as stored:
+            result = {name: stored[name] for name in stored.files}
+    else:
+        result = clear_sky(*location, step_minutes, year)
+        if path is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            partial = f"{path}.{os.getpid()}.tmp.npz"
+            np.savez(partial, **result)
+            os.replace(partial, path)
+    _memory_cache[key] = result
+    return result
+
+
+def hourly_irradiance(city, daily_kwh_m2=None, year=None):
+    # Hourly kWh/m² over a city's clear-sky year, as core.annual.annual_yield
+    # takes it. With daily_kwh_m2 the series is rescaled to that average
+    # daily irradiation, keeping the clear-sky shape over days and seasons.
+    ghi = city_clear_sky(city, 60, year)["ghi"] / 1000
+    if daily_kwh_m2 is not None:
+        ghi = ghi * (daily_kwh_m2 * ghi.size / 24 / ghi.sum())
+    return ghi
+
+
+def daily_shape(city, month, step_minutes=60):
+    # Share of an average clear day's irradiation in each step of the day for
+    # a city and month (1-12); sums to 1.
+    ghi = city_clear_sky(city, step_minutes)["ghi"]
+    per_day = 24 * 60 // step_minutes
+    month_of_day = np.repeat(np.arange(1, 13), DAYS_PER_MONTH)
+    days = ghi.reshape(-1, per_day)[month_of_day == month]
+    profile = days.mean(axis=0)
+    return profile / profile.sum()
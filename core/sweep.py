@@ -0,0 +1,164 @@
+# sweep.py
+# Design-space sweep: evaluates daily energy over the Cartesian product of
+# umbrella geometry, efficiency and unit-count ranges as an N-dimensional cube.
+# Work is cut into slabs along the leading axes and spread over a process pool;
+# with `out=` the cube is a .npy memmap on disk, so sweeps far larger than RAM
+# only ever hold one slab per worker in memory.
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from core.batch import calculate_energy_output_batch
+
+PARAMETERS = (
+    "width",
+    "length",
+    "coverage_efficiency",
+    "panel_efficiency",
+    "solar_irradiance",
+    "system_losses",
+    "num_units",
+)
+
+DEFAULT_CHUNK_SIZE = 2_000_000
+
+
+class SweepCube:
+    def __init__(self, values, axes):
+        self.values = values
+        self.axes = dict(axes)
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    @property
+    def dims(self):
+        return tuple(self.axes)
+
+    def sel(self, **coords):
+        # Fix one or more parameters at the grid value closest to the one asked
+        # for; the remaining axes are kept, so 1-D/2-D slices feed charts directly.
+        index = []
+        axes = {}
+        for name, grid in self.axes.items():
+            if name in coords:
+                index.append(int(np.abs(grid - coords.pop(name)).argmin()))
+            else:
+                index.append(slice(None))
+                axes[name] = grid
+        if coords:
+            raise KeyError(f"unknown sweep parameter(s): {', '.join(coords)}")
+        return SweepCube(np.asarray(self.values[tuple(index)]), axes)
+
+    def isel(self, **indexers):
+        index = tuple(indexers.pop(name, slice(None)) for name in self.axes)
+        if indexers:
+            raise KeyError(f"unknown sweep parameter(s): {', '.join(indexers)}")
+        axes = {
+            name: grid[i] for (name, grid), i in zip(self.axes.items(), index)
+            if not isinstance(i, (int, np.integer))
+        }
+        return SweepCube(np.asarray(self.values[index]), axes)
+
+    def to_frame(self):
+        import pandas as pd
+        grids = np.meshgrid(*self.axes.values(), indexing="ij")
+        data = {name: grid.ravel() for name, grid in zip(self.axes, grids)}
+        data["energy_kwh"] = np.asarray(self.values).ravel()
+        return pd.DataFrame(data)
+
+
+def _axis_values(value):
+    grid = np.atleast_1d(np.asarray(value, dtype=float))
+    if grid.ndim != 1 or grid.size == 0:
+        raise ValueError("sweep ranges must be scalars or non-empty 1-D sequences")
+    return grid
+
+
+def _split_point(shape, chunk_size):
+    # Smallest k such that the trailing axes shape[k:] fit in one chunk.
+    inner = 1
+    for k in range(len(shape) - 1, -1, -1):
+        if inner * shape[k] > chunk_size:
+            return k + 1, inner
+        inner *= shape[k]
+    return 0, inner
+
+
+def _evaluate_slab(grids, shape, split, start, stop):
+    # Rows start..stop of the leading (outer) axes, broadcast against the full
+    # trailing axes.
+    ndim = len(shape)
+    outer = np.unravel_index(np.arange(start, stop), shape[:split]) if split else ()
+    params = []
+    for axis in range(ndim):
+        if axis < split:
+            values = grids[axis][outer[axis]]
+            params.append(values.reshape((-1,) + (1,) * (ndim - split)))
+        else:
+            values = grids[axis]
+            params.append(values.reshape((1,) + (1,) * (axis - split) + (-1,) + (1,) * (ndim - axis - 1)))
+    *energy_params, num_units = params
+    return calculate_energy_output_batch(*energy_params) * num_units
+
+
+def _fill_slab(grids, shape, split, start, stop, out_path, dtype):
+    slab = _evaluate_slab(grids, shape, split, start, stop).astype(dtype, copy=False)
+    if out_path is None:
+        return slab
+    out = np.load(out_path, mmap_mode="r+")
+    out.reshape((-1,) + shape[split:])[start:stop] = slab.reshape((-1,) + shape[split:])
+    out.flush()
+    del out
+    return None
+
+
+def sweep(width, length, coverage_efficiency, panel_efficiency, solar_irradiance, system_losses,
+          num_units=1, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, out=None, dtype=np.float64):
+    # Each argument is a scalar or a 1-D sequence of grid values. The cube holds
+    # calculate_energy_output(...) * num_units at every grid point, with axes in
+    # PARAMETERS order.
+    grids = [_axis_values(v) for v in (width, length, coverage_efficiency, panel_efficiency,
+                                       solar_irradiance, system_losses, num_units)]
+    shape = tuple(g.size for g in grids)
+    split, inner = _split_point(shape, chunk_size)
+    rows = int(np.prod(shape[:split], dtype=np.int64)) if split else 1
+    rows_per_task = max(1, chunk_size // inner)
+    tasks = [(start, min(start + rows_per_task, rows)) for start in range(0, rows, rows_per_task)]
+
+    if out is None:
+        values = np.empty(shape, dtype=dtype)
+    else:
+        values = np.lib.format.open_memmap(os.fspath(out), mode="w+", dtype=dtype, shape=shape)
+        values.flush()
+    flat = values.reshape((-1,) + shape[split:])
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(tasks))
+    out_path = None if out is None else os.fspath(out)
+
+    if workers <= 1:
+        for start, stop in tasks:
+            flat[start:stop] = _evaluate_slab(grids, shape, split, start, stop).reshape(flat[start:stop].shape)
+        if out is not None:
+            values.flush()
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                (start, stop, pool.submit(_fill_slab, grids, shape, split, start, stop, out_path, dtype))
+                for start, stop in tasks
+            ]
+            for start, stop, future in futures:
+                slab = future.result()
+                if slab is not None:
+                    flat[start:stop] = slab.reshape(flat[start:stop].shape)
+        if out is not None:
+            # Workers wrote straight to disk; reopen so the parent sees their data.
+            del flat, values
+            values = np.load(out_path, mmap_mode="r+")
+
+    return SweepCube(values, zip(PARAMETERS, grids))
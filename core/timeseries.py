@@ -0,0 +1,66 @@
+# timeseries.py
+# Multi-step microgrid simulation. Takes (timesteps x nodes) generation and
+# demand matrices, carries battery state from one step to the next internally
+# (the caller's arrays are never modified) and applies the same battery and
+# pro-rata redistribution phases as distribute_energy at every step, or routes
+# the surplus over a core.network.GridNetwork.
+
+import numpy as np
+
+from core.batch import round_like_builtin
+from core.nodes import battery_phase, redistribution_phase
+
+RECORDABLE = ("surplus", "stored_energy", "net_surplus")
+
+
+def simulate_timesteps(generation, demand, battery_capacity, stored_energy=0.0,
+                       record=("surplus", "stored_energy"), dtype=np.float64, redistribute=True, network=None):
+    # generation/demand: (T, N) kWh per step (a (N,) row is broadcast to every
+    # step of the other matrix). battery_capacity/stored_energy: scalar or (N,).
+    # `record` picks the per-node matrices to keep:
+    #   surplus       -- rounded surplus after redistribution (as distribute_energy)
+    #   stored_energy -- battery state at the end of each step
+    #   net_surplus   -- unrounded surplus after the battery phase, before sharing
+    # Pass dtype=np.float32 to halve the memory of long, wide runs.
+    # With `network`, each step is solved as a line-constrained flow that starts
+    # from the previous step's solution, and line_losses (kWh per step) is added.
+    unknown = set(record) - set(RECORDABLE)
+    if unknown:
+        raise ValueError(f"cannot record {', '.join(sorted(unknown))}; choose from {', '.join(RECORDABLE)}")
+
+    # Rows are converted to float64 one step at a time, so float32 inputs are
+    # never copied whole.
+    generation, demand = np.broadcast_arrays(np.atleast_2d(np.asarray(generation)), np.atleast_2d(np.asarray(demand)))
+    steps, n = generation.shape
+    capacity = np.broadcast_to(np.asarray(battery_capacity, dtype=float), (n,))
+    stored = np.array(np.broadcast_to(np.asarray(stored_energy, dtype=float), (n,)))
+
+    recorded = {name: np.empty((steps, n), dtype=dtype) for name in record}
+    total_surplus = np.zeros(steps)
+    total_deficit = np.zeros(steps)
+    line_losses = np.zeros(steps)
+
+    for t in range(steps):
+        surplus, stored = battery_phase(
+            generation[t].astype(float, copy=False), demand[t].astype(float, copy=False), capacity, stored
+        )
+        total_surplus[t] = np.maximum(surplus, 0.0).sum()
+        total_deficit[t] = np.maximum(-surplus, 0.0).sum()
+        if "net_surplus" in recorded:
+            recorded["net_surplus"][t] = surplus
+        if network is not None and redistribute:
+            exchange = network.exchange(surplus)
+            line_losses[t] = exchange["losses"]
+            if "surplus" in recorded:
+                recorded["surplus"][t] = round_like_builtin(exchange["surplus"], 2)
+        elif "surplus" in recorded:
+            recorded["surplus"][t] = redistribution_phase(surplus) if redistribute else round_like_builtin(surplus, 2)
+        if "stored_energy" in recorded:
+            recorded["stored_energy"][t] = stored
+
+    recorded["total_surplus"] = total_surplus
+    recorded["total_deficit"] = total_deficit
+    recorded["final_stored_energy"] = stored
+    if network is not None:
+        recorded["line_losses"] = line_losses
+    return recorded
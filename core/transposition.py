@@ -0,0 +1,157 @@
+# transposition.py
+# Plane-of-array irradiance: what a tilted, turned canopy receives from the
+# horizontal clear-sky components of core.solar, split into
+#   direct     DNI * cos(angle of incidence), zero when the sun is behind
+#   diffuse    isotropic sky, DHI * (1 + cos tilt) / 2
+#   reflected  ground, GHI * albedo * (1 - cos tilt) / 2
+# Vectorised over canopies x time steps. The angle of incidence is the dot
+# product of the canopy normal and the sun direction, so a whole batch is one
+# (C, 3) @ (3, T) product. Sun directions are memoised per city, and
+# canopies sharing an orientation are worked out once. Canopies that move
+# (folding, rotating, tracking) take (C, T) tilt and azimuth arrays, one
+# orientation per step; tracking_orientation gives the sun-following ones.
+
+import numpy as np
+
+from core.solar import city_clear_sky
+
+ALBEDO = 0.2        # ground reflectance (grass / light paving)
+BLOCK_CANOPIES = 256
+
+_sun_cache = {}
+
+
+def surface_normals(tilt, surface_azimuth):
+    # (C, 3) unit normals (east, north, up); tilt from horizontal and azimuth
+    # clockwise from north, in degrees, scalars or (C,).
+    tilt, surface_azimuth = np.broadcast_arrays(np.radians(np.atleast_1d(np.asarray(tilt, dtype=float))),
+                                                np.radians(np.atleast_1d(np.asarray(surface_azimuth, dtype=float))))
+    return np.column_stack((np.sin(tilt) * np.sin(surface_azimuth),
+                            np.sin(tilt) * np.cos(surface_azimuth),
+                            np.cos(tilt)))
+
+
+def sun_vectors(elevation, azimuth):
+    # (3, T) unit vectors towards the sun for (T,) elevation/azimuth in degrees
+    elevation = np.radians(np.asarray(elevation, dtype=float))
+    azimuth = np.radians(np.asarray(azimuth, dtype=float))
+    cos_elevation = np.cos(elevation)
+    return np.vstack((cos_elevation * np.sin(azimuth), cos_elevation * np.cos(azimuth), np.sin(elevation)))
+
+
+def city_sun_vectors(city, step_minutes=60, year=None):
+    # sun_vectors for a named city's year, memoised
+    key = (city, step_minutes, year)
+    if key not in _sun_cache:
+        sky = city_clear_sky(city, step_minutes, year)
+        _sun_cache[key] = sun_vectors(sky["elevation"], sky["azimuth"])
+    return _sun_cache[key]
+
+
+def _orientations(tilt, surface_azimuth):
+    # Unique (tilt, azimuth) pairs and, per canopy, the index of its pair
+    tilt, surface_azimuth = np.broadcast_arrays(np.atleast_1d(np.asarray(tilt, dtype=float)),
+                                                np.atleast_1d(np.asarray(surface_azimuth, dtype=float)))
+    pairs, inverse = np.unique(np.column_stack((tilt, surface_azimuth)), axis=0, return_inverse=True)
+    return pairs[:, 0], pairs[:, 1], inverse.ravel()
+
+
+def tracking_orientation(elevation, azimuth, max_tilt=90.0, tilt=None):
+    # (tilt, surface_azimuth) per step for a canopy that follows the sun:
+    # facing the sun's azimuth and, unless tilt is fixed, tilted to face it
+    # squarely (up to max_tilt). Flat while the sun is down. Returns (T,)
+    # arrays; pass them as [None] rows (or stacked) to plane_of_array.
+    elevation = np.asarray(elevation, dtype=float)
+    up = elevation > 0
+    surface_azimuth = np.where(up, np.asarray(azimuth, dtype=float), 180.0)
+    if tilt is None:
+        tilt = np.minimum(90.0 - elevation, max_tilt)
+    return np.where(up, np.broadcast_to(tilt, elevation.shape), 0.0), surface_azimuth
+
+
+def _moving_plane_of_array(sky, tilt, surface_azimuth, albedo, sun):
+    # plane_of_array for (C, T) orientations: the incidence is worked out per
+    # canopy and step instead of per orientation
+    tilt = np.radians(np.asarray(tilt, dtype=float))
+    surface_azimuth = np.radians(np.asarray(surface_azimuth, dtype=float))
+    sin_tilt, cos_tilt = np.sin(tilt), np.cos(tilt)
+    cos_incidence = (sin_tilt * (np.sin(surface_azimuth) * sun[0] + np.cos(surface_azimuth) * sun[1])
+                     + cos_tilt * sun[2])
+    direct = np.maximum(cos_incidence, 0.0, out=cos_incidence) * sky["dni"]
+    diffuse = sky["dhi"] * (0.5 * (1 + cos_tilt))
+    albedo = np.asarray(albedo, dtype=float)
+    reflected = sky["ghi"] * (albedo[:, None] if albedo.ndim else albedo) * (0.5 * (1 - cos_tilt))
+    return {"poa": direct + diffuse + reflected, "direct": direct, "diffuse": diffuse, "reflected": reflected}
+
+
+def plane_of_array(sky, tilt, surface_azimuth, albedo=ALBEDO, sun=None):
+    # sky: {"ghi", "dni", "dhi", "elevation", "azimuth"} with (T,) arrays, as
+    # from core.solar.clear_sky for one location. tilt, surface_azimuth and
+    # albedo: scalars or one per canopy, or for moving canopies (C, T) tilt
+    # and azimuth arrays. Returns {"poa", "direct", "diffuse", "reflected"}
+    # in W/m², (C, T), or (T,) when all three are scalars.
+    # sun: precomputed sun_vectors for the same steps.
+    scalar = np.ndim(tilt) == 0 and np.ndim(surface_azimuth) == 0 and np.ndim(albedo) == 0
+    if sun is None:
+        sun = sun_vectors(sky["elevation"], sky["azimuth"])
+    if np.ndim(tilt) == 2 or np.ndim(surface_azimuth) == 2:
+        tilt, surface_azimuth = np.broadcast_arrays(np.atleast_2d(tilt), np.atleast_2d(surface_azimuth))
+        return _moving_plane_of_array(sky, tilt, surface_azimuth, albedo, sun)
+    tilts, azimuths, inverse = _orientations(tilt, surface_azimuth)
+    cos_incidence = surface_normals(tilts, azimuths) @ sun
+    direct = np.maximum(cos_incidence, 0.0, out=cos_incidence)
+    direct *= sky["dni"]
+    cos_tilt = np.cos(np.radians(tilts))[:, None]
+    diffuse = sky["dhi"] * (0.5 * (1 + cos_tilt))
+    if inverse.size != tilts.size or np.any(inverse != np.arange(inverse.size)):
+        direct, diffuse, cos_tilt = direct[inverse], diffuse[inverse], cos_tilt[inverse]
+    albedo = np.broadcast_to(np.asarray(albedo, dtype=float), inverse.shape)[:, None]
+    reflected = sky["ghi"] * (albedo * 0.5 * (1 - cos_tilt))
+    result = {"poa": direct + diffuse + reflected, "direct": direct, "diffuse": diffuse, "reflected": reflected}
+    if scalar:
+        return {name: values[0] for name, values in result.items()}
+    return result
+
+
+def city_plane_of_array(city, tilt, surface_azimuth, albedo=ALBEDO, step_minutes=60, year=None):
+    # plane_of_array over a named city's clear-sky year
+    sky = city_clear_sky(city, step_minutes, year)
+    return plane_of_array(sky, tilt, surface_azimuth, albedo, city_sun_vectors(city, step_minutes, year))
+
+
+def annual_irradiation(city, tilt, surface_azimuth, albedo=ALBEDO, step_minutes=60, year=None):
+    # kWh/m² per year on each canopy's plane, without keeping the (C, T)
+    # series: only the direct part needs the per-step incidence, worked out
+    # BLOCK_CANOPIES orientations at a time; the sky and ground parts are
+    # fixed shares of the yearly DHI and GHI. Moving canopies ((C, T)
+    # orientations) are summed from their series.
+    scalar = np.ndim(tilt) == 0 and np.ndim(surface_azimuth) == 0 and np.ndim(albedo) == 0
+    sky = city_clear_sky(city, step_minutes, year)
+    sun = city_sun_vectors(city, step_minutes, year)
+    if np.ndim(tilt) == 2 or np.ndim(surface_azimuth) == 2:
+        poa = plane_of_array(sky, tilt, surface_azimuth, albedo, sun)["poa"]
+        return poa.sum(axis=1) * step_minutes / 60 / 1000
+    tilts, azimuths, inverse = _orientations(tilt, surface_azimuth)
+    normals = surface_normals(tilts, azimuths)
+    direct = np.empty(tilts.size)
+    for start in range(0, tilts.size, BLOCK_CANOPIES):
+        cos_incidence = normals[start:start + BLOCK_CANOPIES] @ sun
+        direct[start:start + BLOCK_CANOPIES] = np.maximum(cos_incidence, 0.0) @ sky["dni"]
+    cos_tilt = np.cos(np.radians(tilts))
+    albedo = np.broadcast_to(np.asarray(albedo, dtype=float), inverse.shape)
+    sky_part = 0.5 * (1 + cos_tilt) * sky["dhi"].sum()
+    ground_part = 0.5 * (1 - cos_tilt[inverse]) * albedo * sky["ghi"].sum()
+    step_hours = step_minutes / 60
+    total = ((direct + sky_part)[inverse] + ground_part) * step_hours / 1000
+    if scalar:
+        return total[0]
+    return total
+
+
+def orientation_grid(city, tilts, surface_azimuths, albedo=ALBEDO, step_minutes=60, year=None):
+    # Yearly kWh/m² for every tilt x azimuth combination, (len(tilts),
+    # len(surface_azimuths)), e.g. to pick the fold angle of an umbrella.
+    tilt_grid, azimuth_grid = np.meshgrid(np.asarray(tilts, dtype=float), np.asarray(surface_azimuths, dtype=float),
+                                          indexing="ij")
+    totals = annual_irradiation(city, tilt_grid.ravel(), azimuth_grid.ravel(), albedo, step_minutes, year)
+    return totals.reshape(tilt_grid.shape)
@@ -4,22 +4,20 @@ import json
 import pandas as pd
 
 from datetime import datetime
-def calculate_energy_output(width, length, coverage_efficiency, panel_efficiency, solar_irradiance, system_losses):
-    surface_area_m2 = width * length * coverage_efficiency
-    daily_energy_output_kWh = surface_area_m2 * panel_efficiency * solar_irradiance * system_losses
-    return round(daily_energy_output_kWh, 2)
 
-def calculate_co2_savings(kwh, emission_factor):
-    return round(kwh * emission_factor, 2)
-
-def calculate_cost_savings(kwh, price_per_kwh):
-    return round(kwh * price_per_kwh, 2)
-
-def calculate_battery_backup(daily_output, battery_capacity, efficiency, days_autonomy):
-    usable_capacity = battery_capacity * efficiency
-    backup_days = round(usable_capacity / daily_output, 2) if daily_output else 0
-    meets_autonomy = backup_days >= days_autonomy
-    return usable_capacity, backup_days, meets_autonomy
+from core.annual import annual_yield
+from core.battery import calculate_battery_backup
+from core.calculator import (
+    calculate_co2_savings,
+    calculate_cost_savings,
+    calculate_energy_output,
+)
+from core.cities import open_store
+from core.sensitivity import sobol_indices
+from core.sizing import cheapest_configurations, options_from_area
+from core.solar import hourly_irradiance
+from core.sweep import sweep
+from simulator.config import UMBRELLA_TYPES
 
 
 # --- Page Config ---
@@ -39,31 +37,10 @@ system_losses = st.sidebar.slider("System Efficiency After Losses", 0.6, 1.0, 0.
 num_units = st.sidebar.slider(f"Number of {system_type}s", 1, 10, 1)
 
 # --- Location-based Irradiance & CO₂ Factors ---
-location = st.sidebar.selectbox("Location", ["Custom", "Barcelona", "Madrid", "Málaga", "Sevilla", "Amsterdam", "Paris", "Berlin", "Nairobi", "Tokyo", "Los Angeles"])
-irradiance_map = {
-    "Barcelona": 5.0,
-    "Madrid": 5.2,
-    "Málaga": 5.5,
-    "Sevilla": 5.6,
-    "Amsterdam": 3.2,
-    "Paris": 3.5,
-    "Berlin": 3.8,
-    "Nairobi": 5.5,
-    "Tokyo": 4.2,
-    "Los Angeles": 5.8
-}
-co2_map = {
-    "Barcelona": 0.25,
-    "Madrid": 0.23,
-    "Málaga": 0.24,
-    "Sevilla": 0.24,
-    "Amsterdam": 0.35,
-    "Paris": 0.30,
-    "Berlin": 0.32,
-    "Nairobi": 0.15,
-    "Tokyo": 0.35,
-    "Los Angeles": 0.40
-}
+locations = ["Barcelona", "Madrid", "Málaga", "Sevilla", "Amsterdam", "Paris", "Berlin", "Nairobi", "Tokyo", "Los Angeles"]
+irradiance_map = open_store().column_dict("irradiance", locations)
+co2_map = open_store().column_dict("co2_factor", locations)
+location = st.sidebar.selectbox("Location", ["Custom"] + locations)
 
 if location == "Custom":
     solar_irradiance = st.sidebar.slider("Solar Irradiance (kWh/m²/day)", 3.0, 7.0, 5.0)
@@ -87,8 +64,15 @@ days_autonomy = st.sidebar.slider("Required Days of Autonomy", 1, 7, 2)
 energy_output_per = calculate_energy_output(width, length, coverage_efficiency, panel_efficiency, solar_irradiance, system_losses)
 total_output = round(energy_output_per * num_units, 2)
 
-monthly_output = round(total_output * 30, 2)
-yearly_output = round(total_output * 365, 2)
+# Monthly and yearly output from an hourly year: the city's clear-sky curve
+# (Madrid's for Custom) scaled to the daily irradiance above
+yearly_yield = annual_yield(
+    hourly_irradiance("Madrid" if location == "Custom" else location, solar_irradiance),
+    width, length, coverage_efficiency, panel_efficiency, system_losses, num_units, hourly=False,
+)
+this_month = datetime.now().month
+monthly_output = round(float(yearly_yield["monthly"][this_month - 1]), 2)
+yearly_output = round(float(yearly_yield["annual"]), 2)
 
 daily_co2 = calculate_co2_savings(total_output, co2_factor)
 monthly_co2 = calculate_co2_savings(monthly_output, co2_factor)
@@ -106,7 +90,7 @@ st.write(f"**Per {system_type}:** {energy_output_per} kWh/day")
 st.write(f"**Total for {num_units} {system_type}(s):** {total_output} kWh/day")
 
 st.subheader("📅 Projections")
-st.write(f"**Monthly Output:** {monthly_output} kWh")
+st.write(f"**Monthly Output ({datetime(2000, this_month, 1).strftime('%B')}):** {monthly_output} kWh")
 st.write(f"**Yearly Output:** {yearly_output} kWh")
 
 st.subheader("🌱 CO₂ Emissions Avoided")
@@ -126,12 +110,11 @@ st.write(f"**Meets Autonomy Requirement:** {'✅ Yes' if meets_autonomy else '
 
 # --- Interactive Chart ---
 unit_counts = list(range(1, 11))
-outputs = [
-    calculate_energy_output(
-        width, length, coverage_efficiency,
-        panel_efficiency, solar_irradiance, system_losses
-    ) * n for n in unit_counts
-]
+outputs = sweep(
+    width, length, coverage_efficiency,
+    panel_efficiency, solar_irradiance, system_losses,
+    num_units=unit_counts, workers=1
+).values.ravel().tolist()
 
 fig = go.Figure()
 fig.add_trace(go.Scatter(
@@ -155,6 +138,33 @@ target_kwh = st.number_input("🎯 Target Daily Energy (kWh)", value=14.4)
 units_needed = round(target_kwh / energy_output_per, 1) if energy_output_per else 0
 st.write(f"To meet **{target_kwh} kWh/day**, you need approximately **{units_needed} {system_type}(s)**.")
 
+with st.expander("💶 Cheapest catalog configuration for this target"):
+    st.caption("Enter your quoted prices; the catalog carries none.")
+    unit_costs = {
+        name: st.number_input(f"{name} price (€ per unit)", min_value=0.0, value=None, step=100.0)
+        for name in UMBRELLA_TYPES
+    }
+    battery_cost_per_kwh = st.number_input("Add-on battery price (€/kWh)", min_value=0.0, value=None, step=10.0)
+    if all(cost is not None for cost in unit_costs.values()) and battery_cost_per_kwh is not None:
+        cheapest = cheapest_configurations(
+            options_from_area(UMBRELLA_TYPES, solar_irradiance, system_losses, unit_costs),
+            target_kwh, days_autonomy=days_autonomy, co2_factor=co2_factor,
+            battery_efficiency=battery_efficiency, battery_cost_per_kwh=battery_cost_per_kwh,
+        )
+        if cheapest:
+            st.write("Cheapest configurations meeting this target and the autonomy requirement:")
+            st.dataframe(pd.DataFrame(cheapest))
+
+# --- Sensitivity Analysis ---
+with st.expander("🔍 Which parameters drive the output? (global sensitivity)"):
+    st.caption("Sobol indices over the full range of each sidebar slider.")
+    if st.button("Run sensitivity analysis"):
+        indices = sobol_indices(
+            parameters=["width", "length", "coverage_efficiency", "panel_efficiency", "solar_irradiance", "system_losses"],
+            seed=0,
+        )
+        st.dataframe(indices["daily_energy_kwh"])
+
 # --- Export Configuration ---
 config = {
     "timestamp": datetime.now().isoformat(),
@@ -1,4 +1,6 @@
 # solar_evolution_simulator.py
+import os
+import sys
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
@@ -6,20 +8,25 @@ import networkx as nx
 import json
 from math import isfinite
 
-# Hardcoded city electricity prices
-CITIES = {
-    "Madrid": 0.25,
-    "Barcelona": 0.26,
-    "Malaga": 0.24,
-    "Sevilla": 0.23,
-    "Amsterdam": 0.29,
-    "Berlin": 0.30,
-    "Paris": 0.28,
-    "Burkina Faso": 0.22,
-    "Nairobi": 0.21,
-    "Tokyo": 0.32,
-    "Los Angeles": 0.27
-}
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from core.annual import annual_yield
+from core.battery import calculate_battery_backup
+from core.calculator import calculate_co2_savings, calculate_cost_savings, calculate_energy_output
+from core.cities import open_store
+from core.finance import loan_annuity_payment, payback_years
+from core.market import market_exchange
+from core.microgrid import simulate_energy_exchange
+from core.solar import hourly_irradiance
+
+# City electricity prices (€/kWh) from the city dataset
+CITIES = open_store().column_dict(
+    "electricity_price",
+    ["Madrid", "Barcelona", "Malaga", "Sevilla", "Amsterdam", "Berlin", "Paris", "Burkina Faso", "Nairobi", "Tokyo",
+     "Los Angeles"],
+)
+
+# Default grid emission factor (kg CO₂/kWh) for the simulator's CO₂ figures
+CO2_FACTOR = 0.3
 
 LANG = {
     "en": {
@@ -178,66 +185,6 @@ Este enfoque apoya directamente los objetivos de BBVA en sostenibilidad, resilie
     }
 }
 
-def calculate_energy_output(width, length, coverage_eff, panel_eff, irradiance_kwh=5.0, system_losses=1.0):
-    surface_area = width * length
-    effective_area = surface_area * coverage_eff
-    daily_kwh = effective_area * panel_eff * irradiance_kwh * system_losses
-    return round(daily_kwh, 3)
-
-def calculate_co2_savings(kwh, co2_factor=0.3):
-    return round(kwh * co2_factor, 2)
-
-def calculate_cost_savings(kwh, price_per_kwh):
-    return round(kwh * price_per_kwh, 2)
-
-def calculate_battery_backup(daily_output, battery_capacity, efficiency, days_autonomy):
-    usable = battery_capacity * efficiency
-    backup_days = round(usable / daily_output, 2) if daily_output > 0 else 0
-    meets = backup_days >= days_autonomy
-    return usable, backup_days, meets
-
-def loan_annuity_payment(principal, annual_rate_pct, years):
-    r = annual_rate_pct / 100.0
-    n = years
-    if r == 0:
-        return principal / n
-    annuity = principal * (r * (1 + r) ** n) / ((1 + r) ** n - 1)
-    return annuity
-
-def simulate_energy_exchange(nodes):
-    for node in nodes:
-        node['net'] = round(node.get('generation_kwh', 0) - node.get('demand_kwh', 0), 3)
-
-    surplus_nodes = [n for n in nodes if n['net'] > 0]
-    deficit_nodes = [n for n in nodes if n['net'] < 0]
-
-    total_surplus = sum(n['net'] for n in surplus_nodes)
-    total_deficit = sum(-n['net'] for n in deficit_nodes)
-
-    flows = {}
-    if total_surplus <= 0 or total_deficit <= 0:
-        for n in nodes:
-            n['surplus_kwh'] = max(n['net'], 0)
-            n['deficit_kwh'] = max(-n['net'], 0)
-        return nodes, flows
-
-    for s in surplus_nodes:
-        s_available = s['net']
-        for d in deficit_nodes:
-            share = (-d['net']) / total_deficit if total_deficit else 0
-            transfer = round(min(s_available, share * total_surplus), 3)
-            if transfer <= 0:
-                continue
-            s_available -= transfer
-            d['net'] += transfer
-            flows[(s['name'], d['name'])] = flows.get((s['name'], d['name']), 0) + transfer
-
-    for n in nodes:
-        n['surplus_kwh'] = round(max(n['net'], 0), 3)
-        n['deficit_kwh'] = round(max(-n['net'], 0), 3)
-
-    return nodes, flows
-
 def main():
     st.set_page_config(page_title="Solar Evolution Simulator", layout="wide")
 
@@ -292,12 +239,14 @@ def main():
     st.markdown(L["narrative_intro"])
 
     # Compute basic energy output
-    daily_per_umbrella = calculate_energy_output(width, length, coverage_eff, panel_eff, 5.0, system_losses)
-    annual_energy = daily_per_umbrella * 365
+    daily_per_umbrella = calculate_energy_output(width, length, coverage_eff, panel_eff, 5.0, system_losses, ndigits=3)
+    # Year from the city's hourly clear-sky curve at the same 5 kWh/m²/day
+    annual_energy = float(annual_yield(hourly_irradiance(city, 5.0), width, length, coverage_eff, panel_eff,
+                                       system_losses, hourly=False)["annual"])
 
     st.subheader("Energy Output & Savings")
     st.write(f"- Daily energy production per umbrella: **{daily_per_umbrella} kWh**")
-    co2_savings = calculate_co2_savings(annual_energy)
+    co2_savings = calculate_co2_savings(annual_energy, CO2_FACTOR)
     st.write(f"- Annual CO₂ savings: **{co2_savings} kg CO₂**")
     cost_savings = calculate_cost_savings(annual_energy, price_per_kwh)
     st.write(f"- Annual energy cost savings: **€{cost_savings}**")
@@ -313,14 +262,9 @@ def main():
     annuity = loan_annuity_payment(loan_amount, interest_rate, loan_term)
     annual_revenue = cost_savings + rev_ev_charging + rev_energy_sales
     annual_expenses = annuity * 12
-    annual_net_cash_flow = annual_revenue - annual_expenses
-
-    if annual_net_cash_flow > 0:
-        payback_years = loan_amount / annual_net_cash_flow
-    else:
-        payback_years = float('inf')
+    payback = payback_years(loan_amount, annual_revenue, annual_expenses)
 
-    payback_str = f"{payback_years:.1f}" if isfinite(payback_years) else "∞"
+    payback_str = f"{payback:.1f}" if isfinite(payback) else "∞"
 
     st.subheader("Financials")
     st.write(f"- Annual revenue streams: **€{annual_revenue:.2f}**")
@@ -342,7 +286,7 @@ def main():
         cov1 = st.slider("Coverage efficiency", 0.0, 1.0, 0.75, 0.01, key="cov1")
         pan1 = st.slider("Panel efficiency", 0.0, 1.0, 0.18, 0.01, key="pan1")
 
-        energy1 = calculate_energy_output(w1, l1, cov1, pan1, 5.0, system_losses)
+        energy1 = calculate_energy_output(w1, l1, cov1, pan1, 5.0, system_losses, ndigits=3)
 
         # Scenario 2 inputs
         st.markdown(f"### {L['scenario_2']}")
@@ -351,7 +295,7 @@ def main():
         cov2 = st.slider("Coverage efficiency", 0.0, 1.0, 0.60, 0.01, key="cov2")
         pan2 = st.slider("Panel efficiency", 0.0, 1.0, 0.15, 0.01, key="pan2")
 
-        energy2 = calculate_energy_output(w2, l2, cov2, pan2, 5.0, system_losses)
+        energy2 = calculate_energy_output(w2, l2, cov2, pan2, 5.0, system_losses, ndigits=3)
 
         if st.button(L["compare_btn"]):
             st.write(f"Scenario 1 energy output: **{energy1} kWh/day**")
@@ -382,6 +326,20 @@ def main():
         else:
             st.write("- No energy flows")
 
+        market = market_exchange(
+            [n["generation_kwh"] - n["demand_kwh"] for n in nodes],
+            demand=[n["demand_kwh"] for n in nodes],
+            generation=[n["generation_kwh"] for n in nodes],
+            retail_price=price_per_kwh,
+        )
+        st.write("### Peer-to-peer market (uniform clearing price):")
+        if market["volume"] > 0:
+            st.write(f"- Clearing price: **€{market['price']:.3f}/kWh** for {market['volume']:.3f} kWh")
+            for n, bought, sold, cost in zip(nodes, market["bought"], market["sold"], market["cost"]):
+                st.write(f"- {n['name']}: bought {bought:.3f} kWh, sold {sold:.3f} kWh, net cost €{cost:.2f}")
+        else:
+            st.write("- No trades")
+
     # How to use tab
     with tabs[2]:
         st.subheader(L["tabs"][2])
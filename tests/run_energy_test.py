@@ -1,5 +1,9 @@
 import json
-from energy_model import distribute_energy
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from core.microgrid import distribute_energy
 
 with open("data/test_nodes.json") as f:
     test_nodes = json.load(f)
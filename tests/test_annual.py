@@ -0,0 +1,34 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from core.annual import annual_yield
+from core.calculator import calculate_energy_output
+from core.solar import hourly_irradiance
+
+
+def test_annual_yield_matches_daily_formula():
+    # A flat 5 kWh/m²/day year is 365 calculator days
+    hourly = np.full(8760, 5.0 / 24)
+    result = annual_yield(hourly, 4, 4, 0.85, 0.2, 0.85, num_units=3)
+    daily = calculate_energy_output(4, 4, 0.85, 0.2, 5.0, 0.85, ndigits=12) * 3
+    assert np.isclose(result["annual"], daily * 365)
+    assert np.allclose(result["monthly"], daily * np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]))
+    assert np.isclose(result["hourly"].sum(), result["annual"])
+
+
+def test_annual_yield_per_site_matches_single_site():
+    hourly = np.vstack((hourly_irradiance("Madrid", 5.2), hourly_irradiance("Amsterdam", 3.2)))
+    both = annual_yield(hourly, [4, 5], 4, 0.85, 0.2, 0.85, hourly=False)
+    for k, width in enumerate((4, 5)):
+        one = annual_yield(hourly[k], width, 4, 0.85, 0.2, 0.85)
+        assert np.allclose(both["monthly"][k], one["monthly"])
+
+
+def test_scaled_clear_sky_keeps_the_daily_average():
+    madrid = hourly_irradiance("Madrid", 5.2)
+    assert np.isclose(madrid.sum(), 5.2 * 365)
+    monthly = annual_yield(madrid, 1, 1, 1, 1, 1, hourly=False)["monthly"]
+    assert monthly[5] > 2 * monthly[11]
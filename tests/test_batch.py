@@ -0,0 +1,103 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from core.annual import annual_yield
+from core.battery import calculate_battery_backup
+from core.batch import (calculate_battery_backup_batch, calculate_co2_savings_batch, calculate_cost_savings_batch,
+                        calculate_energy_output_batch, evaluate_configurations, loan_annuity_payment_batch,
+                        round_like_builtin)
+from core.calculator import calculate_co2_savings, calculate_cost_savings, calculate_energy_output
+from core.finance import loan_annuity_payment
+from core.solar import hourly_irradiance
+
+# The scalar functions get Python floats, as from the apps: round() on a
+# NumPy scalar rounds half to even instead
+RNG = np.random.default_rng(7)
+N = 2000
+WIDTH = RNG.uniform(1, 10, N)
+LENGTH = RNG.uniform(1, 10, N)
+COVERAGE = RNG.uniform(0.5, 1, N)
+PANEL = RNG.uniform(0.1, 0.25, N)
+IRRADIANCE = RNG.uniform(3, 7, N)
+LOSSES = RNG.uniform(0.6, 1, N)
+ROWS = np.column_stack((WIDTH, LENGTH, COVERAGE, PANEL, IRRADIANCE, LOSSES)).tolist()
+
+
+def test_round_like_builtin_matches_round_on_ties():
+    values = np.array([0.125, 0.375, 2.675, 1.005, -0.125, 1e15 + 0.5, 0.0])
+    expected = [round(float(v), 2) for v in values]
+    assert round_like_builtin(values).tolist() == expected
+    assert round_like_builtin(2.675) == round(2.675, 2)
+
+
+def test_energy_output_batch_matches_scalar():
+    batch = calculate_energy_output_batch(WIDTH, LENGTH, COVERAGE, PANEL, IRRADIANCE, LOSSES)
+    scalar = [calculate_energy_output(*row) for row in ROWS]
+    assert batch.tolist() == scalar
+
+
+def test_shading_loss_matches_scalar():
+    shading = RNG.uniform(0, 0.4, N)
+    batch = calculate_energy_output_batch(WIDTH, LENGTH, COVERAGE, PANEL, IRRADIANCE, LOSSES, shading)
+    scalar = [calculate_energy_output(*row, shading_loss=loss) for row, loss in zip(ROWS, shading.tolist())]
+    assert batch.tolist() == scalar
+    configs = dict(zip(("width", "length", "coverage_efficiency", "panel_efficiency", "solar_irradiance",
+                        "system_losses"), (WIDTH, LENGTH, COVERAGE, PANEL, IRRADIANCE, LOSSES)), shading_loss=shading)
+    assert evaluate_configurations(configs)["energy_output_per"].tolist() == scalar
+
+
+def test_savings_and_co2_batch_match_scalar():
+    kwh = RNG.uniform(0, 100, N).round(2)
+    factor = RNG.uniform(0, 1, N)
+    pairs = list(zip(kwh.tolist(), factor.tolist()))
+    assert calculate_co2_savings_batch(kwh, factor).tolist() == [calculate_co2_savings(k, f) for k, f in pairs]
+    assert calculate_cost_savings_batch(kwh, factor).tolist() == [calculate_cost_savings(k, f) for k, f in pairs]
+
+
+def test_battery_and_loan_batch_match_scalar():
+    daily = np.append(RNG.uniform(0, 20, 200).round(2), 0.0)
+    capacity = RNG.uniform(0, 50, daily.size)
+    usable, days, meets = calculate_battery_backup_batch(daily, capacity, 0.9, 1.5)
+    for i, (d, c) in enumerate(zip(daily.tolist(), capacity.tolist())):
+        assert (usable[i], days[i], meets[i]) == calculate_battery_backup(d, c, 0.9, 1.5)
+
+    principal = RNG.uniform(1000, 20000, 200)
+    rate = np.append(RNG.uniform(0, 20, 199), 0.0)
+    years = RNG.integers(1, 31, 200)
+    batch = loan_annuity_payment_batch(principal, rate, years)
+    assert np.allclose(batch, [loan_annuity_payment(p, r, n) for p, r, n in zip(principal, rate, years)], rtol=1e-12)
+
+
+def test_evaluate_configurations_matches_per_row_calls():
+    configs = {"width": WIDTH[:50], "length": LENGTH[:50], "coverage_efficiency": COVERAGE[:50],
+               "panel_efficiency": PANEL[:50], "solar_irradiance": IRRADIANCE[:50], "system_losses": LOSSES[:50],
+               "num_units": np.arange(1, 51), "co2_factor": 0.3, "price_per_kwh": 0.2}
+    results = evaluate_configurations(configs)
+    for i in range(50):
+        per = calculate_energy_output(*ROWS[i])
+        total = round(per * (i + 1), 2)
+        assert results["energy_output_per"][i] == per
+        assert results["total_output"][i] == total
+        assert results["daily_co2"][i] == calculate_co2_savings(total, 0.3)
+        assert results["daily_savings"][i] == calculate_cost_savings(total, 0.2)
+
+
+def test_monthly_and_yearly_output_match_app_annual_yield():
+    cities = np.array(["Madrid", "Berlin", "Sevilla"])[np.arange(30) % 3]
+    configs = {"width": WIDTH[:30], "length": LENGTH[:30], "coverage_efficiency": COVERAGE[:30],
+               "panel_efficiency": PANEL[:30], "solar_irradiance": IRRADIANCE[:30], "system_losses": LOSSES[:30],
+               "num_units": np.arange(1, 31), "location": cities}
+    results = evaluate_configurations(configs, month=3)
+    default = evaluate_configurations({name: values[:1] for name, values in configs.items() if name != "location"},
+                                      month=3)
+    for i in range(30):
+        width, length, coverage, panel, irradiance, losses = ROWS[i]
+        yields = annual_yield(hourly_irradiance(str(cities[i]), irradiance), width, length, coverage, panel, losses,
+                              i + 1, hourly=False)
+        assert results["monthly_output"][i] == round(float(yields["monthly"][2]), 2)
+        assert results["yearly_output"][i] == round(float(yields["annual"]), 2)
+    # Without a location column the apps' Madrid fallback is used
+    assert default["monthly_output"][0] == results["monthly_output"][0]
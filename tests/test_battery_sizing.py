@@ -0,0 +1,62 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from core.battery_sizing import size_batteries
+from core.dispatch import dispatch_batteries
+
+# Two weeks from 8 AM, PV out-producing each node's load so that every
+# limit below can be met by some battery
+HOURS = np.arange(8, 8 + 24 * 14)
+RNG = np.random.default_rng(21)
+NET = (np.maximum(np.sin((HOURS % 24 - 6) / 12 * np.pi), 0)[:, None] * RNG.uniform(4, 8, 5)
+       - RNG.uniform(0.3, 1.2, (HOURS.size, 5)))
+CHARGE_EFF, DISCHARGE_EFF = 0.95, 0.9
+
+
+def imported(capacity, power=np.inf):
+    # Grid imports of the full dispatch, batteries starting empty. capacity
+    # and power are (nodes,) or (candidates, nodes), all dispatched at once.
+    shape = np.broadcast_shapes(np.shape(capacity), np.shape(power), NET.shape[1:])
+    capacity, power = (np.broadcast_to(np.asarray(v, dtype=float), shape) for v in (capacity, power))
+    net = np.tile(NET, capacity.size // NET.shape[1])
+    result = dispatch_batteries(net, capacity.ravel(), 0.0, CHARGE_EFF, DISCHARGE_EFF, power.ravel(), power.ravel())
+    return result["imported"].reshape(capacity.shape)
+
+
+def smallest(grid, ok):
+    # First grid value that meets the limit, per node
+    return grid[np.argmax(ok, axis=0), np.arange(grid.shape[1])]
+
+
+def test_capacity_matches_grid_search():
+    baseline = imported(0.0)
+    limit = 0.2 * baseline
+    sized = size_batteries(NET, limit, CHARGE_EFF, DISCHARGE_EFF, c_rate=0.5, tolerance=1e-4)
+    assert sized["feasible"].all()
+    assert np.all(imported(sized["capacity"], sized["power"]) <= limit + 1e-6)
+    grid = np.linspace(0, 1.05 * sized["capacity"].max(), 2000)[:, None] * np.ones(5)
+    best = smallest(grid, imported(grid, 0.5 * grid) <= limit + 1e-6)
+    assert np.allclose(sized["capacity"], best, atol=grid[1, 0] + 1e-4 * sized["capacity"].max())
+
+
+def test_power_then_capacity_match_grid_search():
+    limit = 0.3 * imported(0.0)
+    sized = size_batteries(NET, limit, CHARGE_EFF, DISCHARGE_EFF, tolerance=1e-4)
+    assert np.all(imported(sized["capacity"], sized["power"]) <= limit + 1e-6)
+    powers = np.linspace(0, np.abs(NET).max(), 2000)[:, None] * np.ones(5)
+    best_power = smallest(powers, imported(1e4, powers) <= limit + 1e-6)
+    assert np.allclose(sized["power"], best_power, atol=powers[1, 0] + 1e-4 * np.abs(NET).max())
+    capacities = np.linspace(0, 1.05 * sized["capacity"].max(), 2000)[:, None] * np.ones(5)
+    best_capacity = smallest(capacities, imported(capacities, sized["power"]) <= limit + 1e-6)
+    assert np.allclose(sized["capacity"], best_capacity, atol=capacities[1, 0] + 1e-4 * sized["capacity"].max())
+
+
+def test_zero_unserved_needs_the_storage_bound():
+    sized = size_batteries(NET, 0.0, CHARGE_EFF, DISCHARGE_EFF)
+    assert np.all(sized["unserved"] <= 1e-6)
+    assert np.all(imported(sized["capacity"], sized["power"]) <= 1e-6)
+    # A 10% smaller battery leaves something unserved
+    assert np.all(imported(0.9 * sized["capacity"], sized["power"]) > 0)
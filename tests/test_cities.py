@@ -0,0 +1,52 @@
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from core.cities import CityStore, _distance_km, build_store, open_store
+
+
+def test_app_labels_are_kept():
+    store = open_store()
+    prices = store.column_dict("electricity_price", ["Madrid", "Sevilla", "Burkina Faso", "Rome"])
+    assert list(prices) == ["Madrid", "Sevilla", "Burkina Faso"]
+    assert prices["Sevilla"] == store.get("Seville")["electricity_price"]
+    assert "Malaga" in store and store.canonical("Malaga") == "Málaga"
+
+
+def test_unknown_city_and_column():
+    store = open_store()
+    for call in (lambda: store.index("Gotham"), lambda: store.column("rainfall")):
+        try:
+            call()
+        except KeyError:
+            pass
+        else:
+            raise AssertionError("expected KeyError")
+
+
+def test_large_store_lookups_and_nearest():
+    directory = tempfile.mkdtemp()
+    try:
+        rng = np.random.default_rng(0)
+        n = 5000
+        latitude, longitude = rng.uniform(-70, 70, n), rng.uniform(-180, 180, n)
+        source = os.path.join(directory, "cities.csv")
+        with open(source, "w", encoding="utf-8") as f:
+            f.write("city,latitude,longitude,irradiance\n")
+            for i in range(n):
+                f.write(f"Place {i:05d},{latitude[i]},{longitude[i]},{'' if i % 3 else i}\n")
+        build_store(source, os.path.join(directory, "store"))
+        store = CityStore(os.path.join(directory, "store"))
+        assert len(store) == n
+        assert store.get("Place 04242")["latitude"] == latitude[4242]
+        assert np.isnan(store.get("Place 00001")["irradiance"])
+        assert len(store.column_dict("irradiance")) == len(range(0, n, 3))
+        for lat, lon in zip(rng.uniform(-80, 80, 50), rng.uniform(-180, 180, 50)):
+            expected = np.argmin(_distance_km(lat, lon, latitude, longitude))
+            assert store.nearest(lat, lon) == f"Place {expected:05d}"
+    finally:
+        shutil.rmtree(directory)
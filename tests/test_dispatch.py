@@ -0,0 +1,47 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from core.dispatch import RECORDABLE, dispatch_batteries
+
+
+def test_rate_limits_and_efficiencies():
+    # 10 kWh battery, half full: a 5 kWh surplus hour, then a 6 kWh shortfall
+    result = dispatch_batteries([[5.0], [-6.0]], 10.0, charge_eff=0.9, discharge_eff=0.8,
+                                max_charge=2.0, max_discharge=3.0, record=RECORDABLE)
+    assert np.allclose(result["charge"][:, 0], [2.0, 0.0])
+    assert np.allclose(result["export"][:, 0], [3.0, 0.0])
+    assert np.allclose(result["discharge"][:, 0], [0.0, 3.0])
+    assert np.allclose(result["import"][:, 0], [0.0, 3.0])
+    # 2 kWh charged stores 1.8; 3 kWh delivered draws 3 / 0.8
+    assert np.allclose(result["soc"][:, 0], [6.8, 6.8 - 3.75])
+    assert np.allclose(result["cycles"], 3.75 / 10)
+    assert np.allclose(result["final_soc"], result["soc"][-1])
+
+
+def test_soc_stays_within_bounds():
+    # Unlimited rates: the room and the stored energy are the limits
+    result = dispatch_batteries([[8.0], [8.0], [-20.0], [-1.0]], 10.0, soc=0.0, charge_eff=0.8, discharge_eff=0.5,
+                                record=RECORDABLE)
+    assert np.allclose(result["charge"][:, 0], [8.0, 4.5, 0.0, 0.0])
+    assert np.allclose(result["soc"][:, 0], [6.4, 10.0, 0.0, 0.0])
+    assert np.allclose(result["discharge"][:, 0], [0.0, 0.0, 5.0, 0.0])
+    assert np.allclose(result["import"][:, 0], [0.0, 0.0, 15.0, 1.0])
+
+
+def test_totals_balance_over_many_nodes():
+    rng = np.random.default_rng(19)
+    net = rng.normal(0, 3, (24 * 30, 50))
+    capacity = rng.uniform(0, 20, 50)
+    result = dispatch_batteries(net, capacity, charge_eff=0.95, discharge_eff=0.9, max_charge=2.5, max_discharge=2.5,
+                                record=("soc",))
+    assert np.all((result["soc"] >= 0) & (result["soc"] <= capacity + 1e-9))
+    assert np.allclose(result["charged"] + result["exported"], np.maximum(net, 0).sum(axis=0))
+    assert np.allclose(result["discharged"] + result["imported"], np.maximum(-net, 0).sum(axis=0))
+    stored = 0.5 * capacity + result["charged"] * 0.95 - result["discharged"] / 0.9
+    assert np.allclose(result["final_soc"], stored)
+    with pytest.raises(ValueError):
+        dispatch_batteries(net, capacity, record=("voltage",))
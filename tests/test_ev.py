@@ -0,0 +1,50 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from core.ev import _water_fill, fleet_demand, fleet_profiles, fleet_smart_demand, smart_schedule, sample_sessions
+
+SURPLUS = np.sin(np.arange(24) / 24 * np.pi) * 5 - 1
+
+
+def test_fleet_demand_matches_profiles():
+    profiles = fleet_profiles(500, 20, 3.7, seed=3)
+    assert np.allclose(fleet_demand(500, 20, 3.7, seed=3), profiles.sum(axis=0))
+
+
+def test_water_fill_at_full_capacity_rounding():
+    # 7 * 1679.8 rounds to 11758.600000000002, just above the energy
+    load = np.array([-2.0, 1.0, 0.5, -1.0, 3.0, 0.0, 2.0])
+    fill = _water_fill(load, 1679.8, 11758.6)
+    assert not np.isnan(fill).any()
+    assert np.allclose(fill, 1679.8)
+
+
+def test_water_fill_conserves_energy():
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        load = rng.normal(0, 3, rng.integers(1, 12))
+        cap = rng.uniform(0.1, 5)
+        energy = rng.uniform(0, cap * load.size)
+        fill = _water_fill(load, cap, energy)
+        assert np.all((fill >= 0) & (fill <= cap + 1e-12))
+        assert np.isclose(fill.sum(), energy)
+
+
+def test_smart_demand_has_no_nan():
+    assert not np.isnan(fleet_smart_demand(30, 40, 3.7, SURPLUS, seed=43)).any()
+    energy = np.random.default_rng(1).uniform(5, 60, 20000)
+    demand = fleet_smart_demand(20000, energy, 3.7, SURPLUS, seed=0)
+    assert not np.isnan(demand).any()
+
+
+def test_smart_schedule_delivers_same_energy_as_flat():
+    arrival, departure = sample_sessions(200, seed=5)
+    schedule = smart_schedule(SURPLUS, arrival, departure, 20, 3.7)
+    flat = fleet_profiles(200, 20, 3.7, seed=5)
+    assert np.allclose(schedule.sum(axis=1), flat.sum(axis=1))
+    hours = np.arange(24)
+    outside = (hours < arrival[:, None]) | (hours >= departure[:, None])
+    assert np.all(schedule[outside] == 0)
@@ -0,0 +1,86 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from core.events import EventSimulator
+
+
+def balance(totals):
+    # Sources minus uses; unserved is load that never got energy
+    sources = totals["generated"] + totals["imported"] + totals["discharged"]
+    uses = (totals["load"] - totals["unserved"] + totals["ev_delivered"] + totals["charged"]
+            + totals["exported"] + totals["curtailed"])
+    return sources - uses
+
+
+def test_energy_balances_on_every_node():
+    rng = np.random.default_rng(14)
+    nodes = [{"id": f"node_{i}", "pv_kw": rng.uniform(2, 8), "load_kw": rng.uniform(0.5, 2),
+              "battery_capacity": 10.0 * (i % 3 > 0), "stored_energy": 2.0 * (i % 3 == 1),
+              "max_charge_kw": 3.0, "max_discharge_kw": 3.0, "charge_eff": 0.95, "discharge_eff": 0.9}
+             for i in range(20)]
+    start = {node["id"]: node["stored_energy"] for node in nodes}
+    sim = EventSimulator(nodes)
+    sim.add_daylight(3)
+    for _ in range(60):
+        arrival = rng.uniform(0, 60)
+        sim.add_ev(arrival, f"node_{rng.integers(20)}", rng.uniform(5, 40), arrival + rng.uniform(2, 10))
+    for _ in range(10):
+        begin = rng.uniform(0, 60)
+        sim.add_outage(begin, begin + rng.uniform(1, 8), f"node_{rng.integers(20)}")
+    for _ in range(10):
+        sim.set_cloud(rng.uniform(0, 60), rng.uniform(0.2, 1.0), f"node_{rng.integers(20)}")
+    summary = sim.run(72.0)
+
+    delivered = {node["id"]: 0.0 for node in nodes}
+    for session in sim.sessions.values():
+        delivered[session["node"]] += session["delivered"]
+        assert session["delivered"] <= session["requested"] + 1e-9
+    for node in nodes:
+        totals = summary[node["id"]]
+        assert abs(balance(totals)) < 1e-6
+        assert np.isclose(totals["ev_delivered"], delivered[node["id"]])
+        stored = start[node["id"]] + totals["charged"] * 0.95 - totals["discharged"] / 0.9
+        assert np.isclose(totals["stored_energy"], stored)
+        assert -1e-9 <= totals["stored_energy"] <= node["battery_capacity"] + 1e-9
+
+
+def test_islanded_node_does_not_credit_evs():
+    # Night, no battery: the EV gets nothing during the outage and finishes
+    # later, with its full 10 kWh
+    sim = EventSimulator([{"id": "a", "load_kw": 1.0}], keep_log=True)
+    ev = sim.add_ev(0.0, "a", 10.0, 20.0, max_kw=7.0)
+    sim.add_outage(0.5, 2.5, "a")
+    totals = sim.run(24.0)["a"]
+    session = sim.sessions[ev]
+    assert np.isclose(session["delivered"], 10.0)
+    assert np.isclose(session["departure"], 2.5 + 6.5 / 7.0)
+    assert np.isclose(totals["ev_delivered"], 10.0)
+    assert np.isclose(totals["unserved"], 2.0)
+    assert np.isclose(totals["imported"], 24.0 - 2.0 + 10.0)
+    assert [kind for _, kind, _ in sim.log].count("ev_full") == 1
+
+
+def test_islanded_evs_charge_from_what_pv_leaves():
+    sim = EventSimulator([{"id": "a", "pv_kw": 5.0, "load_kw": 1.0}])
+    ev = sim.add_ev(0.0, "a", 8.0, 10.0, max_kw=7.0)
+    sim.add_outage(0.0, 10.0, "a")
+    totals = sim.run(10.0)["a"]
+    assert np.isclose(sim.sessions[ev]["departure"], 2.0)
+    assert np.isclose(totals["ev_delivered"], 8.0)
+    assert totals["unserved"] == 0.0 and totals["imported"] == 0.0
+    assert np.isclose(totals["curtailed"], 4.0 * 8.0)
+
+
+def test_stale_battery_events_are_skipped():
+    sim = EventSimulator([{"id": "a", "pv_kw": 2.0, "battery_capacity": 10.0}], keep_log=True)
+    # Full at 5 h at 2 kW; a cloud at 1 h halves the rate, so the last 8 kWh
+    # take until 9 h
+    sim.set_cloud(1.0, 0.5, "a")
+    totals = sim.run(12.0)["a"]
+    assert [time for time, kind, _ in sim.log if kind == "battery_full"] == [9.0]
+    assert sim.processed == len(sim.log) == 2
+    assert totals["stored_energy"] == 10.0
+    assert np.isclose(totals["exported"], 3 * 1.0)
@@ -0,0 +1,52 @@
+import copy
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from core.flows import exchange_flows, simulate_energy_exchange_sparse
+from core.microgrid import simulate_energy_exchange
+
+
+def random_nodes(n, seed):
+    rng = np.random.default_rng(seed)
+    return [{"name": f"N{i}", "generation_kwh": float(rng.uniform(0, 20)), "demand_kwh": float(rng.uniform(0, 20))}
+            for i in range(n)]
+
+
+def test_sender_and_receiver_totals():
+    for seed in range(5):
+        net = np.random.default_rng(seed).normal(0, 5, 300)
+        after, flows = exchange_flows(net)
+        givers, receivers = net > 0, net < 0
+        volume = min(net[givers].sum(), -net[receivers].sum())
+        assert np.isclose(flows.data.sum(), volume)
+        assert np.allclose(flows.outflow(), np.where(givers, net - after, 0.0))
+        assert np.allclose(flows.inflow(), np.where(receivers, after - net, 0.0))
+        # Pro rata: nobody gives more than it has or gets more than it lacks
+        assert np.all(flows.outflow() <= np.maximum(net, 0) + 1e-9)
+        assert np.all(flows.inflow() <= np.maximum(-net, 0) + 1e-9)
+        assert np.all(givers[flows.row]) and np.all(receivers[flows.col])
+        assert flows.nnz <= givers.sum() + receivers.sum() - 1
+        assert np.allclose(flows.toarray().sum(axis=1), flows.outflow())
+
+
+def test_no_exchange_without_both_sides():
+    after, flows = exchange_flows([1.0, 2.0, 0.0])
+    assert flows.nnz == 0 and after.tolist() == [1.0, 2.0, 0.0]
+
+
+def test_dict_view_matches_sparse_result():
+    nodes = random_nodes(200, 16)
+    sparse_nodes, flows = simulate_energy_exchange_sparse(copy.deepcopy(nodes))
+    dict_nodes, flow_dict = simulate_energy_exchange(copy.deepcopy(nodes))
+    assert dict_nodes == sparse_nodes
+    assert flow_dict == flows.to_dict()
+    dense = flows.toarray()
+    for (source, target), amount in flow_dict.items():
+        assert amount == round(dense[flows.position[source], flows.position[target]], 3)
+    for node in nodes[:20]:
+        i = flows.position[node["name"]]
+        targets = np.flatnonzero(dense[i])
+        assert flows.flows_from(node["name"]) == {flows.ids[j]: round(dense[i, j], 3) for j in targets.tolist()}
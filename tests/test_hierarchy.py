@@ -0,0 +1,44 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from core.hierarchy import LEVELS, hierarchical_exchange
+
+RNG = np.random.default_rng(8)
+SURPLUS = RNG.normal(0, 5, (6, 400))
+DISTRICT = RNG.choice(["north", "south", "east", "west"], 400)
+TERRAZA = RNG.choice(["plaza", "rambla", "puerto"], 400)
+
+
+def test_energy_is_conserved_at_every_level():
+    result = hierarchical_exchange(SURPLUS, TERRAZA, DISTRICT, workers=1)
+    for level in LEVELS:
+        assert np.allclose(result["given"][level].sum(axis=1), result["received"][level].sum(axis=1))
+    given = sum(result["given"].values())
+    received = sum(result["received"].values())
+    assert np.allclose(result["surplus"], SURPLUS - given + received)
+    assert np.allclose(result["surplus"].sum(axis=1), SURPLUS.sum(axis=1))
+
+
+def test_each_pass_leaves_one_side():
+    result = hierarchical_exchange(SURPLUS, TERRAZA, DISTRICT, workers=1)
+    # Inside a terraza only one side is left after its pass
+    for district in np.unique(DISTRICT):
+        for terraza in np.unique(TERRAZA):
+            nodes = (DISTRICT == district) & (TERRAZA == terraza)
+            after = SURPLUS[:, nodes] - result["given"]["terraza"][:, nodes] + result["received"]["terraza"][:, nodes]
+            assert np.all((after.max(axis=1) <= 1e-9) | (after.min(axis=1) >= -1e-9))
+    # The city ends with only the net surplus or deficit
+    total = SURPLUS.sum(axis=1, keepdims=True)
+    assert np.all(np.where(total > 0, result["surplus"] >= -1e-9, result["surplus"] <= 1e-9))
+
+
+def test_sharded_matches_serial():
+    serial = hierarchical_exchange(SURPLUS, TERRAZA, DISTRICT, workers=1)
+    sharded = hierarchical_exchange(SURPLUS, TERRAZA, DISTRICT, workers=2)
+    assert np.array_equal(serial["surplus"], sharded["surplus"])
+    for level in LEVELS:
+        assert np.array_equal(serial["given"][level], sharded["given"][level])
+        assert np.array_equal(serial["received"][level], sharded["received"][level])
@@ -0,0 +1,68 @@
+import copy
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from core.incremental import IncrementalGrid
+from core.microgrid import distribute_energy
+from core.nodes import NodeArrays, distribute_energy_arrays
+from test_nodes import random_nodes
+
+
+def test_updates_match_dicts_recomputed_from_scratch():
+    nodes = random_nodes(60, 11)
+    start = copy.deepcopy(nodes)
+    grid = IncrementalGrid(NodeArrays.from_dicts(copy.deepcopy(nodes)), 4.0)
+    rng = np.random.default_rng(11)
+    for _ in range(40):
+        i = int(rng.integers(60))
+        base, usage = float(rng.uniform(5, 60)), float(rng.uniform(0.5, 1.5))
+        grid.update(nodes[i]["id"], base_energy=base, usage_factor=usage)
+        start[i]["base_energy"], start[i]["usage_factor"] = base, usage
+        expected = distribute_energy(copy.deepcopy(start), 4.0)
+        assert grid.allocation(nodes[i]["id"]) == expected[nodes[i]["id"]]
+    expected = distribute_energy(copy.deepcopy(start), 4.0)
+    assert grid.results()["surplus"].tolist() == [expected[node["id"]]["surplus"] for node in nodes]
+
+
+def test_update_many_and_advance_match_arrays():
+    nodes = random_nodes(500, 12)
+    grid = IncrementalGrid(NodeArrays.from_dicts(nodes), 3.0)
+    reference = NodeArrays.from_dicts(nodes)
+    rng = np.random.default_rng(12)
+    for sunlight in (3.0, 5.0, 1.5):
+        grid.set_sunlight(sunlight)
+        ids = [nodes[i]["id"] for i in rng.integers(500, size=50)]
+        usage = rng.uniform(0.5, 1.5, 50)
+        grid.update_many(ids, usage_factor=usage)
+        reference.usage_factor[[reference.ids.index(node_id) for node_id in ids]] = usage
+        expected = distribute_energy_arrays(reference, sunlight)
+        for key, values in grid.results().items():
+            assert np.array_equal(values, expected[key])
+        grid.advance()
+        assert np.array_equal(grid.state.stored_energy, reference.stored_energy)
+
+
+def test_totals_are_sequential_sums():
+    # An exact (fsum) total rounds node 3's share the other way
+    nodes = [{"id": i, "base_energy": base, "usage_factor": 1.0}
+             for i, base in enumerate([12.7, 10.9, 1.6, 0.0, 9.2])]
+    grid = IncrementalGrid(NodeArrays.from_dicts(nodes), 1.0)
+    expected = distribute_energy(copy.deepcopy(nodes), 1.0)
+    assert grid.allocation(3) == expected[3]
+    assert grid.results()["surplus"].tolist() == [expected[i]["surplus"] for i in range(5)]
+
+
+def test_totals_do_not_drift():
+    nodes = random_nodes(200, 13)
+    grid = IncrementalGrid(NodeArrays.from_dicts(nodes), 5.0)
+    rng = np.random.default_rng(13)
+    for _ in range(2000):
+        grid.update(nodes[int(rng.integers(200))]["id"], base_energy=float(rng.uniform(5, 60)))
+        if rng.random() < 0.1:
+            grid.totals()
+    offered = [value for value in grid.surplus.tolist() if value > 0]
+    wanted = [-value for value in grid.surplus.tolist() if value < 0]
+    assert grid.totals() == (sum(offered), sum(wanted))
@@ -0,0 +1,73 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from core.market import clear_market, market_exchange
+
+
+def brute_force_volume(bid_price, bid_kwh, ask_price, ask_kwh):
+    # Largest min(demand, supply) over every price in the book
+    prices = np.concatenate((bid_price, ask_price))
+    return max(min(bid_kwh[bid_price >= p].sum(), ask_kwh[ask_price <= p].sum()) for p in prices)
+
+
+def test_tie_at_marginal_bid_is_shared_pro_rata():
+    result = clear_market([0.20, 0.18, 0.18], [4.0, 2.0, 2.0], [0.10, 0.15], [5.0, 2.0])
+    assert np.isclose(result["volume"], 7.0)
+    assert np.allclose(result["bought"], [4.0, 1.5, 1.5])
+    assert np.allclose(result["sold"], [5.0, 2.0])
+    assert np.isclose(result["price"], 0.165)
+
+
+def test_tie_at_marginal_ask_is_shared_pro_rata():
+    result = clear_market([0.20], [7.0], [0.10, 0.12, 0.12], [4.0, 3.0, 3.0])
+    assert np.isclose(result["volume"], 7.0)
+    assert np.allclose(result["sold"], [4.0, 1.5, 1.5])
+    assert np.isclose(result["price"], 0.16)
+
+
+def test_no_overlap_trades_nothing():
+    result = clear_market([0.10, 0.12], [3.0, 1.0], [0.15, 0.20], [2.0, 2.0])
+    assert np.isnan(result["price"])
+    assert result["volume"] == 0.0
+    assert not result["bought"].any() and not result["sold"].any()
+    assert np.isnan(clear_market([0.2], [0.0], [0.1], [5.0])["price"])
+
+
+def test_random_books_match_brute_force():
+    rng = np.random.default_rng(15)
+    for _ in range(300):
+        bids, asks = rng.integers(1, 12, 2)
+        # Few price levels, so ties are common
+        bid_price = rng.integers(10, 26, bids) / 100
+        ask_price = rng.integers(5, 21, asks) / 100
+        bid_kwh = rng.integers(0, 6, bids).astype(float)
+        ask_kwh = rng.integers(0, 6, asks).astype(float)
+        result = clear_market(bid_price, bid_kwh, ask_price, ask_kwh)
+        volume = brute_force_volume(bid_price, bid_kwh, ask_price, ask_kwh)
+        assert np.isclose(result["volume"], volume)
+        assert np.isclose(result["bought"].sum(), volume) and np.isclose(result["sold"].sum(), volume)
+        assert np.all(result["bought"] <= bid_kwh + 1e-12) and np.all(result["sold"] <= ask_kwh + 1e-12)
+        if volume > 0:
+            assert np.all(bid_price[result["bought"] > 0] >= result["price"])
+            assert np.all(ask_price[result["sold"] > 0] <= result["price"])
+            # A better order is never filled less than a worse one
+            short = bid_price[(result["bought"] < bid_kwh) & (bid_kwh > 0)].max(initial=-1.0)
+            better = bid_price > short
+            assert np.array_equal(result["bought"][better], bid_kwh[better])
+        else:
+            assert np.isnan(result["price"])
+
+
+def test_market_exchange_settles_against_the_grid():
+    surplus = np.random.default_rng(16).normal(0, 4, 100)
+    result = market_exchange(surplus, retail_price=0.25)
+    assert np.isclose(result["bought"].sum(), result["sold"].sum())
+    assert np.allclose(result["bought"] + result["grid_import"], np.maximum(-surplus, 0))
+    assert np.allclose(result["sold"] + result["grid_export"], np.maximum(surplus, 0))
+    # Market payments cancel out; only the grid is left
+    grid = result["grid_import"].sum() * 0.25 - result["grid_export"].sum() * 0.1
+    assert np.isclose(result["cost"].sum(), grid)
+    assert 0.1 <= result["price"] <= 0.25
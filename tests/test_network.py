@@ -0,0 +1,64 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from core.network import GridNetwork
+
+
+def balance(network, result):
+    # Per node: supplied + what arrives after losses - what leaves - received
+    n = len(network)
+    outgoing = np.bincount(network.arc_from, result["flow"], n)
+    incoming = np.bincount(network.arc_to, result["flow"] * (1 - network.loss), n)
+    return result["supplied"] + incoming - outgoing - result["received"]
+
+
+def random_network(n, lines, seed):
+    rng = np.random.default_rng(seed)
+    # A chain keeps it connected; the rest are random extra lines
+    extra_from = rng.integers(n, size=lines)
+    extra_to = (extra_from + rng.integers(1, n, size=lines)) % n
+    line_from = np.concatenate([np.arange(n - 1), extra_from])
+    line_to = np.concatenate([np.arange(1, n), extra_to])
+    capacity = rng.uniform(1, 8, line_from.size)
+    loss = rng.uniform(0, 0.1, line_from.size)
+    return GridNetwork([f"node_{i}" for i in range(n)], line_from, line_to, capacity, loss), rng
+
+
+def test_flows_balance_and_respect_limits():
+    network, rng = random_network(60, 90, seed=9)
+    for _ in range(5):
+        surplus = rng.normal(0, 5, 60)
+        result = network.exchange(surplus)
+        assert np.allclose(balance(network, result), 0.0, atol=1e-6)
+        assert np.all(result["flow"] <= network.capacity + 1e-9)
+        assert np.all(result["supplied"] <= np.maximum(surplus, 0) + 1e-9)
+        assert np.all(result["received"] <= np.maximum(-surplus, 0) + 1e-9)
+        assert np.isclose(result["losses"], result["supplied"].sum() - result["received"].sum(), atol=1e-6)
+
+
+def test_unlimited_lossless_grid_matches_one_pool():
+    network = GridNetwork(range(5), [0, 1, 2, 3], [1, 2, 3, 4])
+    result = network.exchange([6.0, -1.0, 0.0, -2.0, -4.0])
+    assert np.isclose(result["received"].sum(), 6.0)
+    assert result["losses"] == 0.0
+    assert np.isclose(result["surplus"].sum(), -1.0)
+
+
+def test_bottleneck_line_caps_delivery():
+    # 0 and 1 have surplus, 2 and 3 need it; only line 1-2 joins the halves
+    network = GridNetwork(range(4), [0, 1, 2], [1, 2, 3], capacity=[10.0, 3.0, 10.0], loss=[0.0, 0.1, 0.0])
+    result = network.exchange([5.0, 5.0, -4.0, -4.0])
+    assert np.isclose(result["flow"][1], 3.0)
+    assert np.isclose(result["received"].sum(), 3.0 * 0.9)
+    assert np.isclose(result["losses"], 0.3)
+
+
+def test_warm_start_gives_the_same_delivery():
+    network, rng = random_network(40, 60, seed=10)
+    steps = rng.normal(0, 5, (6, 40))
+    warm = [network.exchange(surplus)["received"].sum() for surplus in steps]
+    cold = [network.exchange(surplus, warm_start=False)["received"].sum() for surplus in steps]
+    assert np.allclose(warm, cold, atol=1e-6)
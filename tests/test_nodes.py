@@ -0,0 +1,50 @@
+import copy
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from core.microgrid import distribute_energy
+from core.nodes import NodeArrays, distribute_energy_arrays, results_to_dicts
+
+
+def random_nodes(n, seed):
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            "id": f"node_{i + 1}",
+            "base_energy": float(rng.uniform(5, 60)),
+            "usage_factor": float(rng.uniform(0.5, 1.5)),
+            "battery_capacity": float(rng.choice([0.0, 10.0, 25.0])),
+            "stored_energy": float(rng.uniform(0, 10)),
+            "role": str(rng.choice(["Consumer", "Producer", "Prosumer"])),
+            "umbrella": str(rng.choice(["Type A", "Type B", "Type C"])),
+        }
+        for i in range(n)
+    ]
+
+
+def test_arrays_match_dicts_exactly():
+    for seed, sunlight in ((0, 2.0), (1, 4.5), (2, 8.0), (3, 0.0)):
+        nodes = random_nodes(300, seed)
+        state = NodeArrays.from_dicts(copy.deepcopy(nodes))
+        expected = distribute_energy(nodes, sunlight)
+        assert results_to_dicts(state, distribute_energy_arrays(state, sunlight)) == expected
+        assert np.array_equal(state.stored_energy, [node["stored_energy"] for node in nodes])
+
+
+def test_arrays_match_dicts_over_repeated_calls():
+    nodes = random_nodes(100, 4)
+    state = NodeArrays.from_dicts(copy.deepcopy(nodes))
+    for sunlight in (6.0, 1.0, 3.5, 7.0, 0.5):
+        assert results_to_dicts(state, distribute_energy_arrays(state, sunlight)) == distribute_energy(nodes, sunlight)
+
+
+def test_node_arrays_round_trip():
+    nodes = random_nodes(20, 5)
+    assert NodeArrays.from_dicts(nodes).to_dicts() == [
+        {key: node[key] for key in ("id", "role", "umbrella", "base_energy", "usage_factor",
+                                    "battery_capacity", "stored_energy")}
+        for node in nodes
+    ]
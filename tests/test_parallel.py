@@ -0,0 +1,36 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from core.nodes import NodeArrays, distribute_energy_arrays
+from core.parallel import ParallelGrid, distribute_energy_parallel
+from test_nodes import random_nodes
+
+SUNLIGHT = [6.0, 0.5, 3.0, 8.0, 2.0]
+
+
+def test_parallel_matches_serial():
+    nodes = random_nodes(5000, 13)
+    serial = NodeArrays.from_dicts(nodes)
+    parallel = NodeArrays.from_dicts(nodes)
+    with ParallelGrid(parallel, workers=3) as grid:
+        assert grid.workers == 3
+        for sunlight in SUNLIGHT:
+            expected = distribute_energy_arrays(serial, sunlight)
+            results = grid.step(sunlight)
+            for key, values in expected.items():
+                assert np.array_equal(results[key], values)
+            assert np.array_equal(parallel.stored_energy, serial.stored_energy)
+
+
+def test_one_off_parallel_call():
+    nodes = random_nodes(300, 14)
+    serial = NodeArrays.from_dicts(nodes)
+    parallel = NodeArrays.from_dicts(nodes)
+    expected = distribute_energy_arrays(serial, 4.0)
+    results = distribute_energy_parallel(parallel, 4.0, workers=2)
+    for key, values in expected.items():
+        assert np.array_equal(results[key], values)
+    assert np.array_equal(parallel.stored_energy, serial.stored_energy)
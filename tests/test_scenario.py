@@ -0,0 +1,50 @@
+import copy
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from core.microgrid import distribute_energy
+from core.nodes import NodeArrays, results_to_dicts
+from core.scenario import CHUNK_SIZE, Scenario
+from test_nodes import random_nodes
+
+NODES = [
+    {"id": "A", "base_energy": 10.0, "usage_factor": 1.0, "battery_capacity": 5.0, "stored_energy": 0.0},
+    {"id": "B", "base_energy": 40.0, "usage_factor": 1.0, "battery_capacity": 0.0, "stored_energy": 0.0},
+    {"id": "C", "base_energy": 30.0, "usage_factor": 1.0, "battery_capacity": 10.0, "stored_energy": 4.0},
+]
+
+
+def test_hand_checked_step():
+    # 3 h of sun: 30 kWh each. A stores 5 and offers 15, B lacks 10 and C
+    # breaks even. A gives 15 * 10/15 = 10 and B, the only taker, receives
+    # the whole 15 kWh pool (distribute_energy's pro-rata rule), ending at +5.
+    base = Scenario.from_dicts(NODES)
+    following, results = base.step(3.0)
+    assert results["surplus"].tolist() == [5.0, 5.0, 0.0]
+    assert following.stored_energy.tolist() == [5.0, 0.0, 4.0]
+    assert base.stored_energy.tolist() == [0.0, 0.0, 4.0]
+
+    # A what-if branch with a battery on B leaves the baseline alone
+    branch = base.fork().set("B", battery_capacity=20.0, stored_energy=10.0)
+    _, branch_results = branch.step(3.0)
+    assert branch_results["surplus"].tolist() == [15.0, 0.0, 0.0]
+    assert base.battery_capacity.tolist() == [5.0, 0.0, 10.0]
+
+
+def test_run_matches_dict_model_and_shares_chunks():
+    nodes = random_nodes(10000, 12)
+    base = Scenario(NodeArrays.from_dicts(copy.deepcopy(nodes)))
+    final, history = base.run([5.0, 2.0, 7.0])
+    state = NodeArrays.from_dicts(nodes)
+    for sunlight, results in zip([5.0, 2.0, 7.0], history):
+        assert results_to_dicts(state, results) == distribute_energy(nodes, sunlight)
+    assert np.array_equal(final.stored_energy, [node["stored_energy"] for node in nodes])
+
+    branch = base.fork().set(nodes[0]["id"], usage_factor=2.0)
+    chunks = len(base._fields["usage_factor"])
+    assert branch.shared_chunks(base, "usage_factor") == chunks - 1
+    assert branch.shared_chunks(base, "base_energy") == chunks
+    assert chunks == -(-10000 // CHUNK_SIZE)
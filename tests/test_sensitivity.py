@@ -0,0 +1,55 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from core.annual import annual_yield
+from core.calculator import calculate_cost_savings, calculate_energy_output
+from core.finance import loan_annuity_payment, payback_years
+from core.sensitivity import PARAMETER_RANGES, evaluate_model, halton, morris_effects, sobol_indices
+from core.solar import hourly_irradiance
+
+
+def test_evaluate_model_matches_scalar_simulator_block():
+    rng = np.random.default_rng(2)
+    samples = {name: rng.uniform(low, high, 300) for name, (low, high) in PARAMETER_RANGES.items()}
+    outputs = evaluate_model(samples)
+    for i in range(300):
+        row = {name: float(values[i]) for name, values in samples.items()}
+        daily = calculate_energy_output(row["width"], row["length"], row["coverage_efficiency"],
+                                        row["panel_efficiency"], row["solar_irradiance"], row["system_losses"])
+        annuity = loan_annuity_payment(row["loan_amount"], row["interest_rate"], row["loan_term"])
+        # The simulator's annual energy, with the sampled irradiance in place of its fixed 5 kWh/m²
+        annual_energy = float(annual_yield(hourly_irradiance("Berlin", row["solar_irradiance"]), row["width"],
+                                           row["length"], row["coverage_efficiency"], row["panel_efficiency"],
+                                           row["system_losses"], hourly=False)["annual"])
+        revenue = calculate_cost_savings(annual_energy, row["price_per_kwh"]) + row["rev_ev_charging"] + row["rev_energy_sales"]
+        assert outputs["daily_energy_kwh"][i] == daily
+        assert np.isclose(outputs["annual_loan_payment"][i], annuity)
+        assert np.isclose(outputs["annual_net_cash_flow"][i], revenue - annuity * 12)
+        payback = min(payback_years(row["loan_amount"], revenue, annuity * 12), 100.0)
+        assert np.isclose(outputs["payback_years"][i], payback)
+
+
+def test_halton_fills_unit_cube_evenly():
+    points = halton(4096, 5, seed=0)
+    assert points.min() >= 0 and points.max() < 1
+    counts = np.histogram(points[:, 4], bins=8, range=(0, 1))[0]
+    assert counts.min() > 0.9 * 512 and counts.max() < 1.1 * 512
+
+
+def test_sobol_single_input_explains_everything():
+    table = sobol_indices(2 ** 12, parameters=["width"], seed=0)["daily_energy_kwh"]
+    assert np.allclose(table[["S1", "ST"]].to_numpy(), 1.0, atol=0.05)
+
+
+def test_inputs_outside_an_output_have_no_effect():
+    parameters = ["width", "solar_irradiance", "loan_amount", "interest_rate"]
+    sobol = sobol_indices(2 ** 12, parameters=parameters, seed=1)["daily_energy_kwh"].set_index("parameter")
+    assert np.allclose(sobol.loc[["loan_amount", "interest_rate"], ["S1", "ST"]], 0.0)
+    # width spans 2-10 m, irradiance 3-7 kWh/m²: width matters more
+    assert sobol.loc["width", "ST"] > sobol.loc["solar_irradiance", "ST"] > 0.1
+    morris = morris_effects(200, parameters=parameters, seed=1)["annual_loan_payment"].set_index("parameter")
+    assert np.allclose(morris.loc[["width", "solar_irradiance"], "mu_star"], 0.0)
+    assert morris.loc["loan_amount", "mu_star"] > 0
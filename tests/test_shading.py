@@ -0,0 +1,59 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from core.shading import RASTER, city_shading, neighbour_pairs, shade_fractions
+from core.solar import city_clear_sky
+
+RNG = np.random.default_rng(24)
+LAYOUT = {"x": RNG.uniform(0, 30, 40), "y": RNG.uniform(0, 30, 40),
+          "height": RNG.uniform(2.0, 3.2, 40), "width": RNG.choice([3.0, 4.0, 5.0], 40)}
+SKY = city_clear_sky("Madrid")
+STEPS = np.flatnonzero(SKY["elevation"] > 5)[::53]
+
+
+def brute_force(layout, elevation, azimuth):
+    # Every sample of every canopy traced towards the sun against every
+    # taller canopy
+    x, y, height, width = (layout[k] for k in ("x", "y", "height", "width"))
+    shade = np.zeros((x.size, elevation.size))
+    for t in range(elevation.size):
+        reach = 1 / np.tan(np.radians(elevation[t]))
+        sun_x, sun_y = reach * np.sin(np.radians(azimuth[t])), reach * np.cos(np.radians(azimuth[t]))
+        for i in range(x.size):
+            offsets = ((np.arange(RASTER) + 0.5) / RASTER - 0.5) * width[i]
+            px, py = np.meshgrid(x[i] + offsets, y[i] + offsets)
+            hit = np.zeros((RASTER, RASTER), dtype=bool)
+            for j in np.flatnonzero(height > height[i]):
+                rise = height[j] - height[i]
+                hit |= ((np.abs(px + rise * sun_x - x[j]) < width[j] / 2)
+                        & (np.abs(py + rise * sun_y - y[j]) < width[j] / 2))
+            shade[i, t] = hit.mean()
+    return shade
+
+
+def test_matches_brute_force_ray_test():
+    elevation, azimuth = SKY["elevation"][STEPS], SKY["azimuth"][STEPS]
+    shade = shade_fractions(LAYOUT, elevation, azimuth)
+    assert shade.any()
+    assert np.array_equal(shade, brute_force(LAYOUT, elevation, azimuth))
+
+
+def test_grid_index_keeps_every_pair_that_casts_shade():
+    receiver, occluder = np.nonzero(LAYOUT["height"][None, :] > LAYOUT["height"][:, None])
+    elevation, azimuth = SKY["elevation"][STEPS], SKY["azimuth"][STEPS]
+    every_pair = shade_fractions(LAYOUT, elevation, azimuth, pairs=(receiver, occluder))
+    assert np.array_equal(shade_fractions(LAYOUT, elevation, azimuth), every_pair)
+    found = neighbour_pairs(LAYOUT["x"], LAYOUT["y"], LAYOUT["height"], LAYOUT["width"])
+    assert found[0].size < receiver.size
+
+
+def test_equal_heights_cast_no_shade():
+    layout = dict(LAYOUT, height=np.full(40, 2.5))
+    result = city_shading(layout, "Madrid")
+    assert not result["shade"].any()
+    assert not result["beam_loss"].any() and not result["irradiation_loss"].any()
+    losses = city_shading(LAYOUT, "Madrid")
+    assert np.all((losses["irradiation_loss"] <= losses["beam_loss"]) & (losses["beam_loss"] <= 1))
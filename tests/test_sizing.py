@@ -0,0 +1,44 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from core.battery import calculate_battery_backup
+from core.calculator import calculate_co2_savings
+from core.sizing import DEFAULT_BATTERY_SIZES, cheapest_configurations, options_from_area
+from simulator.config import UMBRELLA_TYPES
+
+UNIT_COSTS = {"Foldable": 3000, "Fixed": 5200, "Pod": 6800}
+
+
+def brute_force(options, target_kwh, days_autonomy, co2_target_kg, co2_factor, battery_cost, max_units=40):
+    best = {}
+    for option in options:
+        for num_units in range(1, max_units + 1):
+            total_output = round(option["daily_kwh"] * num_units, 2)
+            if total_output < target_kwh or calculate_co2_savings(total_output, co2_factor) < co2_target_kg:
+                continue
+            for battery in DEFAULT_BATTERY_SIZES:
+                capacity = battery + option["builtin_battery"] * num_units
+                if calculate_battery_backup(total_output, capacity, 0.9, days_autonomy)[2]:
+                    best[(option["umbrella"], num_units)] = round(num_units * option["unit_cost"] + battery * battery_cost, 2)
+                    break
+    return sorted(best.values())
+
+
+def test_cheapest_matches_brute_force():
+    options = options_from_area(UMBRELLA_TYPES, 5.0, 0.85, UNIT_COSTS)
+    for target, days, co2_target in ((14.4, 2, 0.0), (30.0, 1, 5.0), (8.0, 0, 0.0), (50.0, 3, 0.0)):
+        found = cheapest_configurations(options, target, days_autonomy=days, co2_target_kg=co2_target,
+                                        co2_factor=0.25, battery_cost_per_kwh=450, max_units=40)
+        expected = brute_force(options, target, days, co2_target, 0.25, 450)[:5]
+        assert [row["cost"] for row in found] == expected
+
+
+def test_missing_unit_cost_is_an_error():
+    options = options_from_area(UMBRELLA_TYPES)
+    try:
+        cheapest_configurations(options, 10.0)
+    except ValueError as error:
+        assert "no unit cost" in str(error)
+    else:
+        raise AssertionError("expected ValueError")
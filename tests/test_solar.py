@@ -0,0 +1,50 @@
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import core.solar as solar
+from core.cities import open_store
+from core.solar import city_clear_sky, clear_sky, daily_shape, solar_position
+
+
+def test_madrid_midsummer_noon_elevation():
+    elevation, _ = solar_position(40.42, -3.70, 1)
+    june_20 = elevation[170 * 24:171 * 24]
+    assert abs(june_20.max() - 73.0) < 1.0
+    assert june_20[:5].max() < 0 and june_20[-2:].max() < 0
+
+
+def test_many_locations_match_one_by_one():
+    latitudes, longitudes, offsets = [40.42, -12.05, 52.37], [-3.70, -77.04, 4.90], [1, -5, 1]
+    together = clear_sky(latitudes, longitudes, offsets)
+    for k in range(3):
+        alone = clear_sky(latitudes[k], longitudes[k], offsets[k])
+        assert np.allclose(together["ghi"][k], alone["ghi"])
+
+
+def test_daily_shape_is_a_daytime_curve():
+    shape = daily_shape("Sevilla", 6)
+    assert np.isclose(shape.sum(), 1.0)
+    assert shape[0] == 0 and shape[23] == 0
+    assert 11 <= shape.argmax() <= 15
+
+
+def test_disk_cache_follows_coordinate_changes(monkeypatch):
+    cache_dir = tempfile.mkdtemp()
+    solar._memory_cache.clear()
+    try:
+        first = city_clear_sky("Madrid", cache_dir=cache_dir)["ghi"]
+        solar._memory_cache.clear()
+        original = open_store().get
+        moved = lambda city, columns=None: dict(original(city, columns), latitude=60.0)
+        monkeypatch.setattr(open_store(), "get", moved)
+        second = city_clear_sky("Madrid", cache_dir=cache_dir)["ghi"]
+        assert not np.allclose(first, second)
+        assert len(os.listdir(cache_dir)) == 2
+    finally:
+        solar._memory_cache.clear()
+        shutil.rmtree(cache_dir)
@@ -0,0 +1,45 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from core.calculator import calculate_energy_output
+from core.sweep import PARAMETERS, sweep
+
+GRID = dict(width=np.linspace(2, 10, 9), length=np.linspace(2, 10, 7), coverage_efficiency=[0.7, 0.85, 1.0],
+            panel_efficiency=np.linspace(0.1, 0.25, 4), solar_irradiance=[3.0, 5.0, 7.0], system_losses=0.85,
+            num_units=[1, 2, 5])
+
+
+def test_cube_matches_scalar_calculator():
+    cube = sweep(**GRID, workers=1)
+    assert cube.dims == PARAMETERS
+    assert cube.shape == (9, 7, 3, 4, 3, 1, 3)
+    rng = np.random.default_rng(2)
+    for _ in range(100):
+        index = tuple(int(rng.integers(n)) for n in cube.shape)
+        args = [float(grid[i]) for grid, i in zip(cube.axes.values(), index)]
+        assert cube.values[index] == calculate_energy_output(*args[:6]) * args[6]
+
+
+def test_workers_and_memmap_match_serial(tmp_path):
+    serial = sweep(**GRID, workers=1, chunk_size=100)
+    parallel = sweep(**GRID, workers=3, chunk_size=100)
+    assert np.array_equal(parallel.values, serial.values)
+    for workers in (1, 3):
+        path = tmp_path / f"cube_{workers}.npy"
+        on_disk = sweep(**GRID, workers=workers, chunk_size=100, out=path)
+        assert np.array_equal(on_disk.values, serial.values)
+        assert np.array_equal(np.load(path), serial.values)
+
+
+def test_selections():
+    cube = sweep(**GRID, workers=1)
+    line = cube.sel(length=6, coverage_efficiency=0.85, panel_efficiency=0.2, solar_irradiance=5, system_losses=0.85,
+                    num_units=2)
+    assert line.dims == ("width",)
+    assert np.array_equal(line.values, cube.values[:, 3, 1, 2, 1, 0, 1])
+    assert np.array_equal(cube.isel(width=0).values, cube.values[0])
+    frame = cube.sel(width=2, length=2).to_frame()
+    assert len(frame) == 3 * 4 * 3 * 1 * 3
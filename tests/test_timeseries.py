@@ -0,0 +1,40 @@
+import copy
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from core.microgrid import distribute_energy
+from core.timeseries import simulate_timesteps
+from test_nodes import random_nodes
+
+SUNLIGHT = [6.0, 0.0, 2.5, 8.0, 1.0, 4.0, 7.5]
+
+
+def test_steps_match_repeated_distribute_energy():
+    nodes = random_nodes(200, 6)
+    original = copy.deepcopy(nodes)
+    demand = np.array([node["base_energy"] * node["usage_factor"] for node in nodes])
+    generation = np.array(SUNLIGHT)[:, None] * 10 * np.ones(len(nodes))
+    capacity = np.array([node["battery_capacity"] for node in nodes])
+    stored = np.array([node["stored_energy"] for node in nodes])
+    run = simulate_timesteps(generation, demand, capacity, stored)
+    for t, sunlight in enumerate(SUNLIGHT):
+        results = distribute_energy(nodes, sunlight)
+        assert run["surplus"][t].tolist() == [results[node["id"]]["surplus"] for node in original]
+        assert np.array_equal(run["stored_energy"][t], [node["stored_energy"] for node in nodes])
+    assert np.array_equal(run["final_stored_energy"], run["stored_energy"][-1])
+    assert np.array_equal(stored, [node["stored_energy"] for node in original])
+
+
+def test_battery_state_persists_and_totals_balance():
+    generation = np.array([[10.0, 0.0], [0.0, 0.0], [0.0, 0.0]])
+    run = simulate_timesteps(generation, 4.0, 5.0, record=("net_surplus", "stored_energy"))
+    # Node 0 stores 5 of its 6 surplus, then covers 4 and 1 of the next deficits
+    assert run["stored_energy"][:, 0].tolist() == [5.0, 1.0, 0.0]
+    assert run["net_surplus"][:, 0].tolist() == [1.0, 0.0, -3.0]
+    assert np.allclose(run["total_surplus"], np.maximum(run["net_surplus"], 0).sum(axis=1))
+    assert np.allclose(run["total_deficit"], np.maximum(-run["net_surplus"], 0).sum(axis=1))
+    float32 = simulate_timesteps(generation, 4.0, 5.0, dtype=np.float32)
+    assert float32["surplus"].dtype == np.float32
@@ -0,0 +1,46 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from core.solar import city_clear_sky
+from core.transposition import annual_irradiation, city_plane_of_array, plane_of_array, tracking_orientation
+
+SKY = city_clear_sky("Madrid")
+
+
+def reference(tilt, surface_azimuth, albedo=0.2):
+    zenith, beta = np.radians(90 - SKY["elevation"]), np.radians(tilt)
+    cos_incidence = (np.cos(zenith) * np.cos(beta)
+                     + np.sin(zenith) * np.sin(beta) * np.cos(np.radians(SKY["azimuth"] - surface_azimuth)))
+    return (SKY["dni"] * np.maximum(cos_incidence, 0) + SKY["dhi"] * (1 + np.cos(beta)) / 2
+            + SKY["ghi"] * albedo * (1 - np.cos(beta)) / 2)
+
+
+def test_flat_canopy_gets_ghi():
+    assert np.allclose(plane_of_array(SKY, 0, 180)["poa"], SKY["ghi"])
+
+
+def test_fixed_canopies_match_textbook_formula():
+    result = city_plane_of_array("Madrid", [35, 35, 90], [160, 160, 270], albedo=[0.2, 0.3, 0.2])
+    assert np.allclose(result["poa"][0], reference(35, 160))
+    assert np.allclose(result["poa"][1], reference(35, 160, 0.3))
+    assert np.allclose(result["poa"][2], reference(90, 270))
+    annual = annual_irradiation("Madrid", [35, 35, 90], [160, 160, 270], albedo=[0.2, 0.3, 0.2])
+    assert np.allclose(annual, result["poa"].sum(axis=1) / 1000)
+
+
+def test_time_varying_orientation_matches_fixed_per_step():
+    tilt = np.where(np.arange(SKY["ghi"].size) % 24 < 12, 10.0, 40.0)
+    moving = plane_of_array(SKY, tilt[None], 180.0)["poa"][0]
+    fixed = plane_of_array(SKY, [10, 40], 180)["poa"]
+    assert np.allclose(moving, np.where(tilt == 10, fixed[0], fixed[1]))
+
+
+def test_two_axis_tracker_sees_all_the_beam():
+    tilt, surface_azimuth = tracking_orientation(SKY["elevation"], SKY["azimuth"])
+    tracked = plane_of_array(SKY, tilt[None], surface_azimuth[None])
+    assert np.allclose(tracked["direct"][0], SKY["dni"])
+    fixed = annual_irradiation("Madrid", 35, 180)
+    assert annual_irradiation("Madrid", tilt[None], surface_azimuth[None])[0] > 1.2 * fixed